@@ -0,0 +1,112 @@
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from neighbor_table import normalized_query, normalized_rows, top_k_indices
+
+ANN_ARRAYS = ['centroids', 'list_offsets', 'row_ids']
+
+
+def _dense_budget_rows(n_columns: int, block_mb: float) -> int:
+    return max(1, int(block_mb * 1e6 // (8 * max(n_columns, 1))))
+
+def assign_lists(normalized, centroids: np.ndarray, block_mb: float = 256) -> np.ndarray:
+    """Closest centroid (by cosine) of every normalized row, in row blocks."""
+    block_rows = _dense_budget_rows(centroids.shape[0], block_mb)
+    centroids_t = centroids.T.astype(np.float64)
+    return np.concatenate([
+        np.asarray(normalized[start:start + block_rows] @ centroids_t).argmax(axis=1)
+        for start in range(0, normalized.shape[0], block_rows)
+    ]).astype(np.int32)
+
+def train_centroids(normalized, n_lists: int, n_iter: int = 10, sample_rows: int = 100000,
+                    seed: int = 42, block_mb: float = 256) -> np.ndarray:
+    """Spherical k-means on a row sample: centroids are unit vectors and rows join the most similar one."""
+    rng = np.random.default_rng(seed)
+    n_rows = normalized.shape[0]
+    if n_rows > sample_rows:
+        normalized = normalized[np.sort(rng.choice(n_rows, sample_rows, replace=False))]
+        n_rows = sample_rows
+    n_lists = min(n_lists, n_rows)
+    centroids = normalized[rng.choice(n_rows, n_lists, replace=False)].toarray()
+    for _ in range(n_iter):
+        assignment = assign_lists(normalized, centroids, block_mb)
+        members = sparse.csr_matrix((np.ones(n_rows), (assignment, np.arange(n_rows))), shape=(n_lists, n_rows))
+        sums = (members @ normalized).toarray()
+        empty = np.flatnonzero(np.asarray(members.sum(axis=1)).ravel() == 0)
+        # empty lists restart from random rows instead of staying dead
+        sums[empty] = normalized[rng.choice(n_rows, len(empty), replace=False)].toarray()
+        centroids = normalize(sums, norm='l2')
+    return centroids.astype(np.float32)
+
+def build_ann_index(matrix, n_lists: int = 0, n_iter: int = 10, sample_rows: int = 100000,
+                    seed: int = 42, block_mb: float = 256) -> dict:
+    """
+    IVF partitioning of the recommendation matrix.
+
+    Rows are grouped by their closest centroid; `row_ids` lists the rows list
+    by list and `list_offsets` delimits each list. n_lists <= 0 picks
+    about sqrt(n_rows) lists.
+    """
+    normalized = normalized_rows(matrix)
+    n_rows = normalized.shape[0]
+    if n_lists <= 0:
+        n_lists = max(1, int(np.sqrt(n_rows)))
+    centroids = train_centroids(normalized, n_lists, n_iter=n_iter, sample_rows=sample_rows, seed=seed, block_mb=block_mb)
+    assignment = assign_lists(normalized, centroids, block_mb)
+    row_ids = np.argsort(assignment, kind='stable').astype(np.int32)
+    list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=len(centroids)))]).astype(np.int64)
+    return {'centroids' : centroids, 'list_offsets' : list_offsets, 'row_ids' : row_ids}
+
+def save_ann_index(index: dict, path: str):
+    np.savez(path, **{name: index[name] for name in ANN_ARRAYS})
+
+def load_ann_index(path: str) -> dict:
+    with np.load(path) as data:
+        return {name: data[name] for name in ANN_ARRAYS}
+
+
+class IVFIndex:
+    """
+    Approximate cosine search over the recommendation matrix.
+
+    A query is compared with the centroids, the `n_probe` closest lists are
+    scored exactly and the best k of those candidates are returned, in the
+    same order (ties included) as the exact search. Probing every list gives
+    the exact result; more probes trade latency for recall.
+    """
+
+    def __init__(self, index: dict, matrix, n_probe: int = 8):
+        self.centroids = index['centroids']
+        self.list_offsets = index['list_offsets']
+        self.row_ids = index['row_ids']
+        if len(self.row_ids) != matrix.shape[0]:
+            raise ValueError(f'Index covers {len(self.row_ids)} rows but the matrix has {matrix.shape[0]}')
+        # rows stored list by list, so every probed list is one contiguous slice
+        self.rows = normalized_rows(matrix)[self.row_ids]
+        self.n_lists = len(self.centroids)
+        self.n_probe = n_probe
+
+    def search(self, query, k: int, n_probe: int = None) -> tuple:
+        """Top-k row ids and their cosine similarities for one (unnormalized) query row."""
+        query = normalized_query(query)
+        nonzero = np.flatnonzero(query)
+        n_probe = min(self.n_probe if n_probe is None else n_probe, self.n_lists)
+        probed = top_k_indices(self.centroids[:, nonzero] @ query[nonzero], n_probe)
+        ids, candidates = self._candidates(probed)
+        if not len(ids):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        scores = candidates @ query
+        top = top_k_indices(scores, k, ids=ids)
+        return ids[top].astype(np.int64), scores[top]
+
+    def _candidates(self, probed: np.ndarray) -> tuple:
+        # stitch the probed row ranges into one csr matrix, slicing them one by one through scipy is much slower
+        starts, ends = self.list_offsets[probed], self.list_offsets[probed + 1]
+        indptr = self.rows.indptr
+        ids = np.concatenate([self.row_ids[start:end] for start, end in zip(starts, ends)])
+        data = np.concatenate([self.rows.data[indptr[start]:indptr[end]] for start, end in zip(starts, ends)])
+        indices = np.concatenate([self.rows.indices[indptr[start]:indptr[end]] for start, end in zip(starts, ends)])
+        row_nnz = np.concatenate([np.diff(indptr[start:end + 1]) for start, end in zip(starts, ends)])
+        candidate_indptr = np.concatenate([[0], np.cumsum(row_nnz)])
+        candidates = sparse.csr_matrix((data, indices, candidate_indptr), shape=(len(ids), self.rows.shape[1]))
+        return ids, candidates
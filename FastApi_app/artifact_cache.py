@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import BotoCoreError, ClientError
+
+ARTIFACT_DIR = os.getenv('RECOMMENDATION_ARTIFACT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recommendation_artifacts'))
+ARTIFACT_FETCH_WORKERS = int(os.getenv('ARTIFACT_FETCH_WORKERS', 4))
+
+
+def _meta_path(local_path: str) -> str:
+    return f'{local_path}.etag.json'
+
+def _read_meta(local_path: str) -> dict:
+    try:
+        with open(_meta_path(local_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_meta(local_path: str, etag: str):
+    stat = os.stat(local_path)
+    tmp_path = f'{_meta_path(local_path)}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'etag' : etag, 'size' : stat.st_size, 'mtime_ns' : stat.st_mtime_ns, 'fetched_at' : time.time()}, f)
+    os.replace(tmp_path, _meta_path(local_path))
+
+def is_cached(local_path: str) -> bool:
+    # size and mtime recorded when the file was placed, a file changed or truncated since then is not trusted
+    meta = _read_meta(local_path)
+    try:
+        stat = os.stat(local_path)
+    except OSError:
+        return False
+    return bool(meta) and meta.get('size') == stat.st_size and meta.get('mtime_ns') == stat.st_mtime_ns
+
+def is_missing(error: ClientError) -> bool:
+    return error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+def file_md5(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _check_download(path: str, head: dict, etag: str):
+    size = os.path.getsize(path)
+    if 'ContentLength' in head and size != head['ContentLength']:
+        raise IOError(f'Downloaded {size} bytes, expected {head["ContentLength"]}')
+    # a plain ETag is the MD5 of the object, multipart and KMS encrypted objects carry other ETags
+    if len(etag) == 32 and '-' not in etag and head.get('ServerSideEncryption') != 'aws:kms' and file_md5(path) != etag:
+        raise IOError(f'Checksum mismatch for {path}')
+
+def fetch_object(s3, bucket: str, key: str, local_path: str) -> str:
+    """
+    Make `local_path` hold s3://bucket/key and return it.
+
+    A HEAD request compares the object's ETag with the one recorded next to
+    the cached file, the object is only downloaded when they differ. The
+    download lands in a temporary file, is checked against the object size
+    and MD5 ETag and renamed into place. When S3 cannot be reached a cached
+    copy is used as is. A missing object raises the ClientError.
+    """
+    os.makedirs(os.path.dirname(local_path) or '.', exist_ok=True)
+    cached = is_cached(local_path)
+    try:
+        head = s3.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if is_missing(e) or not cached:
+            raise
+        print(f'Could not check s3://{bucket}/{key} ({e}), using cached {local_path}')
+        return local_path
+    except BotoCoreError as e:
+        if not cached:
+            raise
+        print(f'S3 unreachable ({e}), using cached {local_path}')
+        return local_path
+
+    etag = head['ETag'].strip('"')
+    if cached and _read_meta(local_path).get('etag') == etag:
+        return local_path
+
+    tmp_path = f'{local_path}.{os.getpid()}.download'
+    try:
+        s3.download_file(bucket, key, tmp_path)
+        _check_download(tmp_path, head, etag)
+        os.replace(tmp_path, local_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _write_meta(local_path, etag)
+    return local_path
+
+def fetch_objects(s3, bucket: str, objects: dict, workers: int = ARTIFACT_FETCH_WORKERS) -> dict:
+    """fetch_object for every {key: local_path} concurrently, the first failure is raised once all are done."""
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(objects)))) as executor:
+        futures = {key: executor.submit(fetch_object, s3, bucket, key, local_path) for key, local_path in objects.items()}
+    return {key: future.result() for key, future in futures.items()}
+
+def record_upload(s3, bucket: str, key: str, local_path: str):
+    # after uploading `local_path` the cache already holds the new object
+    _write_meta(local_path, s3.head_object(Bucket=bucket, Key=key)['ETag'].strip('"'))
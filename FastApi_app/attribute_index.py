@@ -0,0 +1,116 @@
+import numpy as np
+from functools import reduce
+from scipy import sparse
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+
+FILTER_FIELDS = ['Fuel_Type', 'Stock_Type', 'Brand_Name', 'ST']
+PRICE_FIELD = 'Price'
+
+
+def _key(value) -> str:
+    return str(value).strip().casefold()
+
+def _output_columns(transformer: ColumnTransformer, estimator_type, column: str):
+    # (fitted estimator, position of `column` in its inputs, output slice) of the step that encodes `column`
+    for name, estimator, columns in transformer.transformers_:
+        if isinstance(estimator, estimator_type) and column in list(columns):
+            return estimator, list(columns).index(column), transformer.output_indices_[name]
+    return None, None, None
+
+
+class AttributeIndex:
+    """
+    Inverted indexes over the recommendation matrix rows.
+
+    Every value of the filter fields maps to the sorted row ids holding it,
+    read straight from the one-hot columns of the matrix, and rows are also
+    kept sorted by price so a price range is one searchsorted slice.
+    """
+
+    def __init__(self, postings: dict, price_order: np.ndarray, sorted_prices: np.ndarray, n_rows: int):
+        self.postings = postings
+        self.price_order = price_order
+        self.sorted_prices = sorted_prices
+        self.n_rows = n_rows
+
+    @classmethod
+    def from_matrix(cls, matrix, transformer: ColumnTransformer, prices: np.ndarray = None):
+        """`prices` overrides the per-row prices read back from the matrix, for matrices narrowed to float32."""
+        matrix = sparse.csc_matrix(matrix)
+        postings = {}
+        for field in FILTER_FIELDS:
+            encoder, position, output = _output_columns(transformer, OneHotEncoder, field)
+            if encoder is None:
+                continue
+            first = output.start + sum(len(categories) for categories in encoder.categories_[:position])
+            postings[field] = {}
+            for offset, category in enumerate(encoder.categories_[position]):
+                start, end = matrix.indptr[first + offset], matrix.indptr[first + offset + 1]
+                rows = matrix.indices[start:end][matrix.data[start:end] != 0]
+                postings[field][_key(category)] = np.sort(rows).astype(np.int32)
+
+        if prices is None:
+            prices = cls.matrix_prices(matrix, transformer)
+        if prices is None:
+            price_order, sorted_prices = None, None
+        else:
+            price_order = np.argsort(prices, kind='stable').astype(np.int32)
+            sorted_prices = prices[price_order]
+        return cls(postings, price_order, sorted_prices, matrix.shape[0])
+
+    @staticmethod
+    def matrix_prices(matrix, transformer: ColumnTransformer):
+        scaler, position, output = _output_columns(transformer, MinMaxScaler, PRICE_FIELD)
+        if scaler is None:
+            return None
+        scaled = sparse.csc_matrix(matrix)[:, output.start + position].toarray().ravel()
+        # undo the min-max scaling, rounded to cents so inclusive bounds like 30000 hold exactly
+        return np.round((scaled - scaler.min_[position]) / scaler.scale_[position], 2)
+
+    def row_prices(self):
+        if self.price_order is None:
+            return None
+        prices = np.empty(self.n_rows, dtype=np.float64)
+        prices[self.price_order] = self.sorted_prices
+        return prices
+
+    def candidates(self, filters: dict = None, min_price: float = None, max_price: float = None) -> np.ndarray:
+        """
+        Sorted row ids matching every filter.
+
+        `filters` maps a field to one value or a list of values (any of them
+        matches); price bounds are inclusive.
+        """
+        selections = []
+        for field, values in (filters or {}).items():
+            if field not in self.postings:
+                raise ValueError(f'Cannot filter on {field!r}, indexed fields are {sorted(self.postings)}')
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            empty = np.empty(0, dtype=np.int32)
+            selections.append(reduce(np.union1d, [self.postings[field].get(_key(value), empty) for value in values], empty))
+        if min_price is not None or max_price is not None:
+            if self.price_order is None:
+                raise ValueError('Price is not part of the recommendation matrix')
+            start = 0 if min_price is None else np.searchsorted(self.sorted_prices, min_price, side='left')
+            end = len(self.sorted_prices) if max_price is None else np.searchsorted(self.sorted_prices, max_price, side='right')
+            selections.append(np.sort(self.price_order[start:end]))
+        if not selections:
+            return np.arange(self.n_rows, dtype=np.int32)
+        selections.sort(key=len)
+        return reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), selections).astype(np.int32)
+
+    @staticmethod
+    def matches(attributes: dict, filters: dict = None, min_price: float = None, max_price: float = None) -> bool:
+        """Same test as `candidates` for a single car given as {field: value}, used for rows not in the matrix yet."""
+        for field, values in (filters or {}).items():
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            if _key(attributes.get(field)) not in {_key(value) for value in values}:
+                return False
+        price = attributes.get(PRICE_FIELD)
+        if min_price is not None and (price is None or float(price) < min_price):
+            return False
+        if max_price is not None and (price is None or float(price) > max_price):
+            return False
+        return True
+
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+BATCH_WINDOW_MS = float(os.getenv('PREDICTION_BATCH_WINDOW_MS', 5))
+MAX_BATCH_SIZE = int(os.getenv('PREDICTION_MAX_BATCH_SIZE', 64))
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+
+
+class BatchMetrics:
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.failed_batches = 0
+        self.batch_size_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.batch_size_histogram['+Inf'] = 0
+        self._queue_delays_ms = deque(maxlen=window)
+        self._predict_ms = deque(maxlen=window)
+
+    def record(self, batch_size: int, queue_delays_ms: List[float], predict_ms: float, failed: bool = False):
+        with self._lock:
+            self.batches += 1
+            self.rows += batch_size
+            self.failed_batches += int(failed)
+            bucket = next((b for b in BATCH_SIZE_BUCKETS if batch_size <= b), '+Inf')
+            self.batch_size_histogram[bucket] += 1
+            self._queue_delays_ms.extend(queue_delays_ms)
+            self._predict_ms.append(predict_ms)
+
+    @staticmethod
+    def _percentile(values, q: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            delays, predict_ms = list(self._queue_delays_ms), list(self._predict_ms)
+            return {
+                'batches': self.batches,
+                'rows': self.rows,
+                'failed_batches': self.failed_batches,
+                'mean_batch_size': round(self.rows / self.batches, 2) if self.batches else 0.0,
+                'batch_size_histogram': {str(k): v for k, v in self.batch_size_histogram.items()},
+                'queue_delay_ms': {
+                    'p50': round(self._percentile(delays, 0.50), 3),
+                    'p99': round(self._percentile(delays, 0.99), 3),
+                    'max': round(max(delays, default=0.0), 3),
+                },
+                'predict_ms': {
+                    'p50': round(self._percentile(predict_ms, 0.50), 3),
+                    'p99': round(self._percentile(predict_ms, 0.99), 3),
+                },
+            }
+
+
+class PredictionBatcher:
+    """
+    Coalesces concurrent single-car predictions into one predict call.
+
+    Requests are queued and a background thread drains them as a batch once
+    `max_batch_size` rows are waiting or the oldest one has waited
+    `window_ms`. The window is adaptive: when the previous batch held a
+    single row and nothing else is queued (low traffic) the request is
+    dispatched immediately, so an idle server adds no latency.
+
+    A batch that fails, or returns a result count that does not match its
+    items, is retried row by row, so every caller gets its own result or
+    its own error and none is left waiting.
+    """
+
+    def __init__(self, predict_fn: Callable[[List[Any]], Any],
+                 window_ms: float = BATCH_WINDOW_MS, max_batch_size: int = MAX_BATCH_SIZE):
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.metrics = BatchMetrics()
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._last_batch_size = 1
+        self._worker = None
+        self._worker_pid = None
+
+    def _ensure_worker(self):
+        # started lazily (and restarted after fork) since threads do not survive os.fork
+        if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name='prediction-batcher', daemon=True)
+            self._worker.start()
+
+    def submit(self, item: Any) -> Future:
+        future = Future()
+        with self._cond:
+            self._ensure_worker()
+            self._queue.append((item, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def predict(self, item: Any, timeout: float = None):
+        return self.submit(item).result(timeout=timeout)
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            if not (len(self._queue) == 1 and self._last_batch_size == 1):
+                deadline = self._queue[0][2] + self.window
+                while len(self._queue) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            size = min(len(self._queue), self.max_batch_size)
+            batch = [self._queue.popleft() for _ in range(size)]
+            self._last_batch_size = size
+            return batch
+
+    def _predict_each(self, batch):
+        # one bad row must not fail the unrelated requests it was coalesced with
+        for item, future, _ in batch:
+            try:
+                results = self.predict_fn([item])
+                if len(results) != 1:
+                    raise RuntimeError(f'predict_fn returned {len(results)} results for 1 item')
+                future.set_result(results[0])
+            except Exception as e:
+                future.set_exception(e)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            delays = [(started - enqueued) * 1000 for _, _, enqueued in batch]
+            try:
+                results = self.predict_fn([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f'predict_fn returned {len(results)} results for {len(batch)} items')
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    self._predict_each(batch)
+                self.metrics.record(len(batch), delays, (time.perf_counter() - started) * 1000, failed=True)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+            self.metrics.record(len(batch), delays, (time.perf_counter() - started) * 1000)
@@ -0,0 +1,24 @@
+# helpers for walking a fitted ColumnTransformer, shared by the compiled prediction
+# encoder (fast_encoder.py) and the recommendation query vectorizer (query_vectorizer.py)
+import numpy as np
+from typing import List
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+
+
+def is_passthrough(transformer) -> bool:
+    # sklearn >= 1.5 wraps the remainder in an identity FunctionTransformer
+    return transformer == 'passthrough' or (isinstance(transformer, FunctionTransformer) and transformer.func is None)
+
+def column_names(encoder: ColumnTransformer, columns) -> List[str]:
+    # positional columns of a transformer fitted on a DataFrame map back to their names
+    return [encoder.feature_names_in_[col] if isinstance(col, (int, np.integer)) else col for col in columns]
+
+def one_hot_categories(encoder: ColumnTransformer) -> dict:
+    """{column: categories its one-hot step was fit on} for every one-hot encoded column."""
+    categories = {}
+    for _, transformer, columns in encoder.transformers_:
+        if isinstance(transformer, OneHotEncoder):
+            for column, fitted in zip(column_names(encoder, columns), transformer.categories_):
+                categories[column] = set(fitted.tolist())
+    return categories
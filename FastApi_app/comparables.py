@@ -0,0 +1,67 @@
+from typing import Callable
+
+US_STATE_CODES = {
+    'alabama' : 'AL', 'alaska' : 'AK', 'arizona' : 'AZ', 'arkansas' : 'AR', 'california' : 'CA', 'colorado' : 'CO',
+    'connecticut' : 'CT', 'delaware' : 'DE', 'district of columbia' : 'DC', 'florida' : 'FL', 'georgia' : 'GA',
+    'hawaii' : 'HI', 'idaho' : 'ID', 'illinois' : 'IL', 'indiana' : 'IN', 'iowa' : 'IA', 'kansas' : 'KS',
+    'kentucky' : 'KY', 'louisiana' : 'LA', 'maine' : 'ME', 'maryland' : 'MD', 'massachusetts' : 'MA',
+    'michigan' : 'MI', 'minnesota' : 'MN', 'mississippi' : 'MS', 'missouri' : 'MO', 'montana' : 'MT',
+    'nebraska' : 'NE', 'nevada' : 'NV', 'new hampshire' : 'NH', 'new jersey' : 'NJ', 'new mexico' : 'NM',
+    'new york' : 'NY', 'north carolina' : 'NC', 'north dakota' : 'ND', 'ohio' : 'OH', 'oklahoma' : 'OK',
+    'oregon' : 'OR', 'pennsylvania' : 'PA', 'rhode island' : 'RI', 'south carolina' : 'SC', 'south dakota' : 'SD',
+    'tennessee' : 'TN', 'texas' : 'TX', 'utah' : 'UT', 'vermont' : 'VT', 'virginia' : 'VA', 'washington' : 'WA',
+    'west virginia' : 'WV', 'wisconsin' : 'WI', 'wyoming' : 'WY',
+}
+
+CATEGORY_FIELDS = ['Brand_Name', 'Stock_Type', 'Drivetrain', 'Fuel_Type', 'One_Owner_Vehicle',
+                   'Personal_Use_Only', 'Gear_Spec', 'Cylinder_Config', 'Valves', 'ST']
+
+
+def _spellings(value) -> list:
+    # the prediction form sends booleans and ints where the catalog may hold yes/no and strings
+    if isinstance(value, bool):
+        return [value, *(['yes', 'Yes', 'True', 'true', '1'] if value else ['no', 'No', 'False', 'false', '0'])]
+    if isinstance(value, int):
+        return [value, str(value)]
+    if isinstance(value, str):
+        return [value, value.lower(), value.upper(), value.title()]
+    return [value]
+
+def catalog_value(value, categories: set):
+    """The spelling of `value` the catalog's one-hot encoder knows, `value` itself when it knows none."""
+    return next((spelling for spelling in _spellings(value) if spelling in categories), value)
+
+def spec_car(spec, price: float, categories: Callable[[str], set]) -> dict:
+    """
+    A catalog row for specs entered on the predict page, keyed like `recommend.cars_frame`.
+
+    The predicted price stands in for the listing price and the seller is
+    left blank. STATE names become the catalog's ST codes and categorical
+    values are respelled to the catalog's categories where one matches.
+    """
+    values = {field: getattr(spec, field) for field in CATEGORY_FIELDS if field != 'ST'}
+    state = spec.STATE
+    values['ST'] = US_STATE_CODES.get(state.strip().lower(), state) if state else None
+    car = {field: catalog_value(values[field], categories(field)) for field in CATEGORY_FIELDS}
+
+    def number(value):
+        # unset on the form means 0 there too, a None would turn the whole query into NaN
+        return float(value or 0)
+
+    car.update({
+        'Model_Name' : spec.Model_Name or '',
+        'Seller_Name' : '',
+        'Model_Year' : number(spec.Model_Year),
+        'Mileage' : number(spec.Mileage),
+        'Price' : float(price),
+        'Km_per_l' : number(spec.Km_per_l),
+        'Dc_Fast_Charging' : number(spec.Dc_Fast_Charging),
+        'Battery_Capacity' : number(spec.Battery_Capacity),
+        'Expected_Range' : number(spec.Expected_Range),
+        'Engine_Size' : number(spec.Engine_Size),
+        'Km_L_e_City' : number(spec.Km_L_e_City),
+        'Km_L_e_Hwy' : number(spec.Km_L_e_Hwy),
+        'Accidents_Or_Damage' : bool(spec.Accidents_Or_Damage),
+        'Clean_Title' : bool(spec.Clean_Title),
+    })
+    return car
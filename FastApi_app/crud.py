@@ -1,7 +1,18 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import asc, desc
+from sqlalchemy import asc, desc, func
 import schemas, models
 from typing import List
+import os
+
+# called as hook(action, car_id, car) after a car is created, updated or deleted
+write_hooks = []
+
+def run_write_hooks(action: str, car_id: int, car=None):
+    for hook in write_hooks:
+        try:
+            hook(action, car_id, car)
+        except Exception as e:
+            print(f'Car write hook failed for {action} {car_id}: {type(e).__name__}: {e}')
 
 def get_cars(db: Session,brand_name: str, model_name: str,page : int, limit : int, sortby: str = "id", orderby: str = "asc"):
     sort_column = getattr(models.Car, sortby)
@@ -23,13 +34,15 @@ def get_car(db: Session, id: int):
     )
 
 def create_car(db: Session, new_car: schemas.CarCreate):
+    # the schema carries fields the table does not store
     db_car = models.Car(
-        **new_car.model_dump()
+        **{field: value for field, value in new_car.model_dump().items() if field in models.Car.__table__.columns}
     )
 
     db.add(db_car)
     db.commit()
     db.refresh(db_car)
+    run_write_hooks('create', db_car.id, db_car)
     return db_car
 
 def update_car(db: Session, id: int, update_car: schemas.CarUpdate):
@@ -41,6 +54,7 @@ def update_car(db: Session, id: int, update_car: schemas.CarUpdate):
             setattr(db_car, key, value)
         db.commit()
         db.refresh(db_car)
+        run_write_hooks('update', id, db_car)
     return db_car
 
 def delete_car(db: Session, id: int):
@@ -48,8 +62,46 @@ def delete_car(db: Session, id: int):
     if db_car:
         db.delete(db_car)
         db.commit()
+        run_write_hooks('delete', id)
     return db_car
 
 def recommmended_car_details(db: Session, car_ids: List[int]):
     results = db.query(models.Car).filter(models.Car.id.in_(car_ids)).all()
-    return results
\ No newline at end of file
+    return results
+
+# price windows (share of the price either side) similar_cars tries before sorting the whole model by price
+SIMILAR_PRICE_WINDOWS = [float(window) for window in os.getenv('SIMILAR_PRICE_WINDOWS', '0.05,0.2,0.5').split(',')]
+
+def similar_cars(db: Session, car, k: int = 5, price: float = None):
+    """
+    Cheap stand-in for the recommender: same brand and model nearest in price, then model year.
+
+    Topped up from the same brand when the model has fewer than `k` other
+    listings. `car` is a listing or specs entered for a prediction, `price`
+    overrides its price.
+    """
+    price = getattr(car, 'Price', None) if price is None else price
+    car_id = getattr(car, 'id', None)
+
+    def nearest(query, limit):
+        order = [func.abs(models.Car.Model_Year - car.Model_Year)] if car.Model_Year is not None else []
+        if car_id is not None:
+            query = query.filter(models.Car.id != car_id)
+        if price is None:
+            return query.order_by(*order, models.Car.id).limit(limit).all()
+        order.insert(0, func.abs(models.Car.Price - price))
+        # a Price BETWEEN range is read from ix_car_brand_model_price, once it holds `limit`
+        # listings no listing outside it can be nearer, only wider windows are needed otherwise
+        for window in SIMILAR_PRICE_WINDOWS:
+            low, high = float(price) * (1 - window), float(price) * (1 + window)
+            results = query.filter(models.Car.Price.between(min(low, high), max(low, high))) \
+                .order_by(*order, models.Car.id).limit(limit).all()
+            if len(results) >= limit:
+                return results
+        return query.order_by(*order, models.Car.id).limit(limit).all()
+
+    same_brand = db.query(models.Car).filter(models.Car.Brand_Name == car.Brand_Name)
+    results = nearest(same_brand.filter(models.Car.Model_Name == car.Model_Name), k)
+    if len(results) < k:
+        results += nearest(same_brand.filter(models.Car.Model_Name != car.Model_Name), k - len(results))
+    return results
@@ -0,0 +1,87 @@
+import os
+import shutil
+import time
+import numpy as np
+from scipy import sparse
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+from neighbor_table import normalized_rows, similarity_scores, top_k_indices
+
+EMBEDDING_ARRAYS = ['components', 'embeddings']
+
+
+def build_embedding(matrix, n_components: int = 128, n_iter: int = 5, seed: int = 42) -> dict:
+    """
+    Dense low-rank version of the recommendation matrix.
+
+    TruncatedSVD of the l2 normalized rows; `components` projects a normalized
+    query into the same space and `embeddings` holds the l2 normalized
+    catalog rows, both float32.
+    """
+    normalized = normalized_rows(matrix)
+    n_components = min(n_components, min(normalized.shape) - 1)
+    svd = TruncatedSVD(n_components=n_components, n_iter=n_iter, random_state=seed)
+    embeddings = normalize(svd.fit_transform(normalized), norm='l2')
+    return {'components' : svd.components_.astype(np.float32), 'embeddings' : embeddings.astype(np.float32)}
+
+def save_embedding(embedding: dict, directory: str) -> int:
+    tmp_directory = f'{directory.rstrip(os.sep)}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    for name in EMBEDDING_ARRAYS:
+        np.save(os.path.join(tmp_directory, f'{name}.npy'), embedding[name])
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_directory, directory)
+    return sum(embedding[name].nbytes for name in EMBEDDING_ARRAYS)
+
+
+class EmbeddingIndex:
+    """Cosine search in the dense embedding space: one float32 matrix-vector product per query."""
+
+    def __init__(self, components: np.ndarray, embeddings: np.ndarray):
+        self.components = components
+        self.embeddings = embeddings
+        self.n_rows, self.n_components = embeddings.shape
+
+    @classmethod
+    def load(cls, directory: str):
+        return cls(*(np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in EMBEDDING_ARRAYS))
+
+    def embed(self, query) -> np.ndarray:
+        query = sparse.csr_matrix(normalize(query, norm='l2'))
+        # only the query's non zero columns of the components take part in the projection
+        projected = self.components[:, query.indices] @ query.data.astype(np.float32)
+        norm = np.linalg.norm(projected)
+        return projected / norm if norm > 0 else projected
+
+    def scores(self, query) -> np.ndarray:
+        return self.embeddings @ self.embed(query)
+
+    def search(self, query, k: int) -> np.ndarray:
+        return top_k_indices(self.scores(query), k)
+
+
+def evaluate_embedding(matrix, index: EmbeddingIndex, n_queries: int = 200, k: int = 5, seed: int = 42) -> dict:
+    """Top-k overlap with the exact sparse search and the latency of both, on catalog rows used as queries."""
+    rng = np.random.default_rng(seed)
+    matrix = sparse.csr_matrix(matrix)
+    normalized_t = normalized_rows(matrix).T.tocsr()
+    overlap, exact_times, embedding_times = [], [], []
+    for row in rng.choice(matrix.shape[0], min(n_queries, matrix.shape[0]), replace=False):
+        query = matrix[row:row + 1]
+        start = time.perf_counter()
+        exact = top_k_indices(similarity_scores(query, normalized_t), k + 1)[1:]
+        exact_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        approximate = index.search(query, k + 1)[1:]
+        embedding_times.append(time.perf_counter() - start)
+        overlap.append(len(set(exact) & set(approximate)) / k)
+    exact_ms = float(np.median(exact_times)) * 1000
+    embedding_ms = float(np.median(embedding_times)) * 1000
+    return {
+        'n_components' : index.n_components,
+        f'overlap_at_{k}' : round(float(np.mean(overlap)), 4),
+        'exact_p50_ms' : round(exact_ms, 3),
+        'embedding_p50_ms' : round(embedding_ms, 3),
+        'speedup' : round(exact_ms / embedding_ms, 2),
+    }
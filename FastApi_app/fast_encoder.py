@@ -0,0 +1,74 @@
+import numpy as np
+from typing import List
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OrdinalEncoder
+from feature_engine.encoding import CountFrequencyEncoder
+from column_transformers import column_names, is_passthrough
+
+ORDINAL, FREQUENCY, PASSTHROUGH = 'ordinal', 'frequency', 'passthrough'
+
+
+class CompiledEncoder:
+    """
+    Plain-python version of the fitted prediction ColumnTransformer.
+
+    Every output column becomes one step: an ordinal lookup, a frequency
+    lookup or a passthrough read of a schema field. Validated schema objects
+    go straight to the float32 matrix the forest sees, in the same column
+    order and with the same unseen-category handling as the pandas path.
+    """
+
+    def __init__(self, steps: List[tuple], feature_names: List[str]):
+        self.steps = steps
+        self.feature_names = feature_names
+
+    @classmethod
+    def from_column_transformer(cls, encoder: ColumnTransformer, rename_columns: dict):
+        field_names = {model_col: field for field, model_col in rename_columns.items()}
+        steps = []
+        for name, transformer, columns in encoder.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            columns = column_names(encoder, columns)
+            if isinstance(transformer, OrdinalEncoder):
+                unknown = transformer.unknown_value if transformer.handle_unknown == 'use_encoded_value' else 'raise'
+                for col, categories in zip(columns, transformer.categories_):
+                    lookup = {category: float(code) for code, category in enumerate(categories)}
+                    steps.append((ORDINAL, field_names.get(col, col), lookup, unknown))
+            elif isinstance(transformer, CountFrequencyEncoder):
+                # feature_engine refuses missing values at transform time unless told to ignore them
+                lookup_missing = 'raise' if transformer.missing_values == 'raise' else 'ignore'
+                for col in columns:
+                    lookup = {category: float(freq) for category, freq in transformer.encoder_dict_[col].items()}
+                    steps.append((FREQUENCY, field_names.get(col, col), lookup, (transformer.unseen, lookup_missing)))
+            elif is_passthrough(transformer):
+                for col in columns:
+                    steps.append((PASSTHROUGH, field_names.get(col, col), None, None))
+            else:
+                raise ValueError(f'Cannot compile transformer {name!r} of type {type(transformer).__name__}')
+        return cls(steps=steps, feature_names=list(encoder.get_feature_names_out()))
+
+    @staticmethod
+    def _encode(kind: str, value, lookup: dict, unseen) -> float:
+        if kind == PASSTHROUGH:
+            return np.nan if value is None else float(value)
+        if value in lookup:
+            return lookup[value]
+        if kind == ORDINAL:
+            if unseen == 'raise':
+                raise ValueError(f'Found unknown category {value!r} during transform')
+            return float(unseen)
+        unseen, missing = unseen
+        policy = missing if value is None else unseen
+        if policy == 'raise':
+            raise ValueError(f'Found {"missing" if value is None else "unseen"} category {value!r} during transform')
+        if policy == 'encode':
+            return 0.0
+        return np.nan
+
+    def transform(self, cars: list) -> np.ndarray:
+        out = np.empty((len(cars), len(self.steps)), dtype=np.float64)
+        for i, car in enumerate(cars):
+            for j, (kind, field, lookup, unseen) in enumerate(self.steps):
+                out[i, j] = self._encode(kind, getattr(car, field), lookup, unseen)
+        return out.astype(np.float32)
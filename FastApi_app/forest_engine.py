@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+# flat layout shared by every tree of the forest, node ids are global (tree offset + local id)
+FOREST_ARRAYS = ['feature', 'threshold', 'left', 'right', 'value', 'missing_go_to_left', 'roots']
+# serving layout: children interleaves left/right so the engine can use the mapped arrays without copies
+MMAP_ARRAYS = ['feature', 'threshold', 'children', 'is_leaf', 'value', 'missing_go_to_left', 'roots']
+MMAP_HEADER = 'forest.json'
+# names the published version directory, swapped with one rename so readers never see a missing forest
+MMAP_POINTER = 'current.json'
+MMAP_FORMAT_VERSION = 1
+
+
+def _threshold_as_float32(threshold: np.ndarray) -> np.ndarray:
+    # sklearn compares float32 inputs against float64 thresholds. For a float32 x,
+    # x <= t holds exactly when x <= (largest float32 <= t), so rounding the
+    # thresholds down keeps every split decision identical.
+    threshold32 = threshold.astype(np.float32)
+    too_big = threshold32.astype(np.float64) > threshold
+    threshold32[too_big] = np.nextafter(threshold32[too_big], np.float32(-np.inf))
+    return threshold32
+
+def flatten_forest(forest) -> dict:
+    """Flatten a fitted RandomForestRegressor into contiguous numpy arrays."""
+    trees = [estimator.tree_ for estimator in forest.estimators_]
+    if any(tree.n_outputs != 1 for tree in trees):
+        raise ValueError('Only single output forests can be flattened')
+
+    sizes = np.array([tree.node_count for tree in trees], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    if 2 * sizes.sum() >= np.iinfo(np.int32).max:
+        raise ValueError('Forest has too many nodes for int32 node ids')
+
+    n_features = forest.n_features_in_
+    feature_dtype = np.int16 if n_features < np.iinfo(np.int16).max else np.int32
+
+    feature, threshold, left, right, value, missing_go_to_left = [], [], [], [], [], []
+    for tree, offset in zip(trees, offsets):
+        node_ids = np.arange(tree.node_count, dtype=np.int64) + offset
+        is_leaf = tree.children_left == -1
+        # leaves point at themselves with an +inf threshold, so extra traversal steps are no-ops
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        left.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+        right.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+        value.append(tree.value[:, 0, 0])
+        missing_go_to_left.append(tree.missing_go_to_left.astype(bool) & ~is_leaf)
+
+    return {
+        'feature' : np.concatenate(feature).astype(feature_dtype),
+        'threshold' : _threshold_as_float32(np.concatenate(threshold).astype(np.float64)),
+        'left' : np.concatenate(left).astype(np.int32),
+        'right' : np.concatenate(right).astype(np.int32),
+        'value' : np.concatenate(value).astype(np.float64),
+        'missing_go_to_left' : np.concatenate(missing_go_to_left).astype(np.uint8),
+        'roots' : offsets.astype(np.int32),
+        'n_features' : np.array(n_features, dtype=np.int32),
+    }
+
+def save_forest(arrays: dict, path: str):
+    np.savez(path, **arrays)
+
+def load_forest(path: str) -> dict:
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+def save_forest_mmap(arrays: dict, directory: str, value_dtype=np.float32) -> int:
+    """
+    Write the forest as raw little-endian arrays plus a json header, ready for numpy.memmap.
+
+    Thresholds are already float32 and node ids int32; leaf values are narrowed
+    to `value_dtype` (float32 by default, which moves predictions by at most
+    float32 rounding of the leaf values). The files go to a version directory
+    named after their content and `current.json` is then pointed at it with
+    an atomic rename, so a reader sees the previous forest or this one and a
+    published version is never rewritten. Returns the bytes written.
+    """
+    serving = {
+        'feature' : arrays['feature'],
+        'threshold' : arrays['threshold'].astype(np.float32),
+        'children' : np.stack([arrays['left'], arrays['right']], axis=1).ravel().astype(np.int32),
+        'is_leaf' : (arrays['left'] == np.arange(len(arrays['left']))).astype(np.uint8),
+        'value' : arrays['value'].astype(value_dtype),
+        'missing_go_to_left' : arrays['missing_go_to_left'].astype(np.uint8),
+        'roots' : arrays['roots'].astype(np.int32),
+    }
+    header = {'format_version' : MMAP_FORMAT_VERSION, 'n_features' : int(arrays['n_features']), 'arrays' : {}}
+    serving = {name: np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<')) for name, array in serving.items()}
+    digest = hashlib.sha256(json.dumps(header).encode())
+    for name, array in serving.items():
+        header['arrays'][name] = {'dtype' : array.dtype.str, 'shape' : list(array.shape)}
+        digest.update(f'{name}:{array.dtype.str}:{array.shape}'.encode())
+        digest.update(array.tobytes())
+    version = digest.hexdigest()[:16]
+
+    os.makedirs(directory, exist_ok=True)
+    version_directory = os.path.join(directory, version)
+    if not os.path.exists(os.path.join(version_directory, MMAP_HEADER)):
+        tmp_directory = f'{version_directory}.tmp-{os.getpid()}'
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+        for name, array in serving.items():
+            array.tofile(os.path.join(tmp_directory, f'{name}.bin'))
+        with open(os.path.join(tmp_directory, MMAP_HEADER), 'w') as f:
+            json.dump(header, f, indent=2)
+        try:
+            os.rename(tmp_directory, version_directory)
+        except OSError:
+            # another worker published the same forest first
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            if not os.path.exists(os.path.join(version_directory, MMAP_HEADER)):
+                raise
+
+    tmp_pointer = os.path.join(directory, f'{MMAP_POINTER}.tmp-{os.getpid()}')
+    with open(tmp_pointer, 'w') as f:
+        json.dump({'version' : version}, f)
+    os.replace(tmp_pointer, os.path.join(directory, MMAP_POINTER))
+    return sum(array.nbytes for array in serving.values())
+
+def current_forest_mmap(directory: str):
+    """Version directory `current.json` points at, None before a forest was published."""
+    try:
+        with open(os.path.join(directory, MMAP_POINTER)) as f:
+            return os.path.join(directory, json.load(f)['version'])
+    except FileNotFoundError:
+        # written by a save_forest_mmap that published the files in place
+        return directory if os.path.exists(os.path.join(directory, MMAP_HEADER)) else None
+
+def load_forest_mmap(directory: str) -> dict:
+    version_directory = current_forest_mmap(directory)
+    if version_directory is None:
+        raise FileNotFoundError(f'No forest published under {directory}')
+    with open(os.path.join(version_directory, MMAP_HEADER)) as f:
+        header = json.load(f)
+    if header['format_version'] != MMAP_FORMAT_VERSION:
+        raise ValueError(f'Unsupported forest format version {header["format_version"]}')
+    arrays = {'n_features' : np.array(header['n_features'], dtype=np.int32)}
+    for name, spec in header['arrays'].items():
+        # read-only file mappings are backed by the page cache, so every worker maps the same pages
+        arrays[name] = np.memmap(os.path.join(version_directory, f'{name}.bin'), dtype=np.dtype(spec['dtype']),
+                                 mode='r', shape=tuple(spec['shape']))
+    return arrays
+
+
+class ForestEngine:
+    """
+    Vectorized inference over a flattened forest.
+
+    All (row, tree) pairs are walked down together with numpy gathers, a few
+    levels per pass, and pairs that reached a leaf are dropped between passes. Leaf values are summed tree by
+    tree in estimator order and divided by the tree count, which is exactly how
+    RandomForestRegressor.predict accumulates, so results match bit for bit.
+    """
+
+    def __init__(self, arrays: dict, chunk_rows: int = 2048, steps_per_pass: int = 4):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.value = arrays['value']
+        self.missing_go_to_left = arrays['missing_go_to_left'].view(bool)
+        self.roots = arrays['roots']
+        self.n_features = int(arrays['n_features'])
+        self.n_trees = len(self.roots)
+        # children[2 * node] is the left child and children[2 * node + 1] the right one
+        if 'children' in arrays:
+            self.children = arrays['children']
+            self.is_leaf = arrays['is_leaf'].view(bool)
+        else:
+            self.children = np.stack([arrays['left'], arrays['right']], axis=1).ravel()
+            self.is_leaf = arrays['left'] == np.arange(len(arrays['left']))
+        self.has_missing_splits = bool(self.missing_go_to_left.any())
+        self.chunk_rows = chunk_rows
+        self.steps_per_pass = steps_per_pass
+
+    @classmethod
+    def from_estimator(cls, forest, **kwargs):
+        return cls(flatten_forest(forest), **kwargs)
+
+    @classmethod
+    def load(cls, path: str, **kwargs):
+        return cls(load_forest(path), **kwargs)
+
+    @classmethod
+    def load_mmap(cls, directory: str, **kwargs):
+        return cls(load_forest_mmap(directory), **kwargs)
+
+    def _apply_chunk(self, X: np.ndarray) -> np.ndarray:
+        n_rows = X.shape[0]
+        flat_X = X.ravel()
+        nodes = np.tile(self.roots, n_rows)
+        row_offsets = np.repeat(np.arange(n_rows, dtype=np.int32) * self.n_features, self.n_trees)
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        while active.size:
+            current = nodes[active]
+            offsets = row_offsets[active]
+            # a few levels per pass before dropping finished pairs, leaves loop onto themselves
+            for _ in range(self.steps_per_pass):
+                x = flat_X[offsets + self.feature[current]]
+                go_right = ~(x <= self.threshold[current])
+                if self.has_missing_splits:
+                    missing = np.isnan(x)
+                    go_right[missing] = ~self.missing_go_to_left[current[missing]]
+                current = self.children[2 * current + go_right]
+            nodes[active] = current
+            active = active[~self.is_leaf[current]]
+        return nodes.reshape(n_rows, self.n_trees)
+
+    def apply(self, X) -> np.ndarray:
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f'Expected input of shape (n_rows, {self.n_features}), got {X.shape}')
+        if X.shape[0] <= self.chunk_rows:
+            return self._apply_chunk(X)
+        # row chunks keep the working set of (row, tree) pairs cache sized
+        return np.vstack([self._apply_chunk(X[start:start + self.chunk_rows])
+                          for start in range(0, X.shape[0], self.chunk_rows)])
+
+    def predict(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        y_hat = np.zeros(leaves.shape[0], dtype=np.float64)
+        for tree in range(self.n_trees):
+            y_hat += self.value[leaves[:, tree]]
+        y_hat /= self.n_trees
+        return y_hat
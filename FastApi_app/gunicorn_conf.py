@@ -0,0 +1,85 @@
+# Preload-then-fork serving: gunicorn -c gunicorn_conf.py main:app
+#
+# The master imports the app, loads the model and the recommendation matrix once and
+# only then forks the workers, so every worker starts warm and shares those pages
+# copy-on-write instead of holding its own copy.
+#
+# New Production models are picked up by the master too: it polls the registry, loads
+# and warms the new version, then sends itself SIGHUP. With preload_app gunicorn then
+# forks a fresh set of workers from the master, which share the new model pages, and
+# gracefully stops the old ones. Workers never poll on their own here, so there is
+# one copy of each model per host. Only requests already in flight on an old worker
+# finish on the previous version. A newly published recommendation build (see
+# src/recommendation/publish_index.py) is loaded in the master and swapped in the same way.
+#
+# Everything else the app keeps in memory is per worker and is not shared between
+# workers: the prediction cache, the batcher queue, the recommendation time budgets,
+# the visitor profiles behind "recommended for you" and the catalog writes made through
+# crud since the last build, which re-forked workers start without.
+# A visitor whose requests land on different workers builds a separate profile on
+# each one, and every /metrics/* response carries the worker_pid it describes. Set
+# WEB_CONCURRENCY=1 where one consistent view matters more than throughput.
+import gc
+import multiprocessing
+import os
+import signal
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+# a failed master warmup is not fatal, workers retry on their own through the app lifespan
+MASTER_WARMUP_ATTEMPTS = int(os.getenv('MASTER_WARMUP_ATTEMPTS', 1))
+MODEL_WATCH_ENABLED = os.getenv('MODEL_WATCH_ENABLED', 'true').lower() == 'true'
+
+def refreeze():
+    # the warmup query opened pooled DB connections, children must not share those sockets
+    import database
+    database.engine.dispose()
+    gc.unfreeze()
+    gc.collect()
+    # move everything loaded so far out of the collector's reach, so GC passes in the
+    # workers never write to (and thereby copy) the shared pages
+    gc.freeze()
+
+def master_check():
+    import model_watcher
+    import warmup
+
+    # a master that could not warm up at start keeps trying, the workers are re-forked warm once it does
+    if not warmup.readiness['ready']:
+        return 'warmup' if warmup.warmup(max_attempts=warmup.readiness['attempts'] + 1) else None
+    return model_watcher.check_for_new_version()
+
+def when_ready(server):
+    import model_watcher
+    import recommend
+    import warmup
+
+    # no collections in the master while the big objects are built, they would only churn pages;
+    # refreeze() collects explicitly and the workers turn the collector back on in post_fork
+    gc.disable()
+    if warmup.warmup(max_attempts=MASTER_WARMUP_ATTEMPTS):
+        server.log.info(f"Model and recommendation artifacts loaded in master in {warmup.readiness['warmup_seconds']}s")
+    else:
+        server.log.warning(f"Master warmup failed, workers will load lazily: {warmup.readiness['error']}")
+
+    refreeze()
+
+    def reload_workers(change):
+        refreeze()
+        server.log.info(f"{change} ready in master, re-forking workers")
+        os.kill(server.pid, signal.SIGHUP)
+
+    # inherited by the workers, which then leave the polling to the master
+    model_watcher.watcher_state['owner'] = 'master'
+    if MODEL_WATCH_ENABLED:
+        model_watcher.start_watcher(check=master_check, on_swap=lambda version: reload_workers(f"Model version {version}"))
+    if recommend.RECOMMENDATION_REFRESH_SECONDS > 0:
+        recommend.start_refresher(on_swap=lambda build_id: reload_workers(f"Recommendation build {build_id}"))
+
+def post_fork(server, worker):
+    gc.enable()
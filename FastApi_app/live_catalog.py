@@ -0,0 +1,78 @@
+import threading
+import time
+import numpy as np
+from scipy import sparse
+from neighbor_table import normalized_rows
+
+
+class LiveCatalog:
+    """
+    Catalog writes applied on top of the loaded recommendation matrix.
+
+    Rows are car ids. A created or updated car keeps its freshly transformed
+    row in `rows` and its base row, if any, is tombstoned; a deleted car is
+    only tombstoned. Searches skip tombstoned base rows and score the pending
+    rows exactly, until the process loads a newer build.
+
+    `writes` remembers when each row was last written and what from (None for
+    a delete), so writes the newer build may have missed can be applied again.
+    """
+
+    def __init__(self, base):
+        self.n_base = base.shape[0]
+        self.n_columns = base.shape[1]
+        # all-zero rows (gaps in the ids, deleted cars) never match anything
+        self.empty = set(np.flatnonzero(np.diff(sparse.csr_matrix(base).indptr) == 0).tolist())
+        self.dead = set(self.empty)
+        self.rows = {}
+        self.writes = {}
+        self.lock = threading.Lock()
+        self.version = 0
+        self._snapshot = None
+
+    def upsert(self, row: int, vector, attributes: dict, source=None):
+        vector = sparse.csr_matrix(vector, dtype=np.float64)
+        if vector.shape != (1, self.n_columns):
+            raise ValueError(f'Expected a (1, {self.n_columns}) row, got {vector.shape}')
+        with self.lock:
+            if row < self.n_base:
+                self.dead.add(row)
+            self.rows[row] = (vector, attributes)
+            self.writes[row] = (time.time(), source)
+            self.version += 1
+
+    def delete(self, row: int):
+        with self.lock:
+            if row < self.n_base:
+                self.dead.add(row)
+            self.rows.pop(row, None)
+            self.writes[row] = (time.time(), None)
+            self.version += 1
+
+    def writes_since(self, since) -> list:
+        """(row, source) for rows last written at or after `since`, every write when it is None."""
+        with self.lock:
+            return [(row, source) for row, (written_at, source) in sorted(self.writes.items())
+                    if since is None or written_at >= since]
+
+    @property
+    def changes(self) -> int:
+        return len(self.rows) + len(self.dead - self.empty)
+
+    def snapshot(self) -> dict:
+        """Pending rows (ids, raw and normalized vectors, attributes) and tombstones, cached until the next write."""
+        with self.lock:
+            if self._snapshot is None or self._snapshot['version'] != self.version:
+                ids = np.array(sorted(self.rows), dtype=np.int64)
+                vectors = [self.rows[row][0] for row in ids]
+                matrix = sparse.vstack(vectors, format='csr') if vectors else sparse.csr_matrix((0, self.n_columns), dtype=np.float64)
+                self._snapshot = {
+                    'version' : self.version,
+                    'ids' : ids,
+                    'matrix' : matrix,
+                    'normalized' : normalized_rows(matrix) if vectors else matrix,
+                    'attributes' : [self.rows[row][1] for row in ids],
+                    'dead' : np.array(sorted(self.dead), dtype=np.int64),
+                    'tombstoned' : np.array(sorted(self.dead - self.empty), dtype=np.int64),
+                }
+            return self._snapshot
@@ -1,10 +1,18 @@
 from mlflow.client import MlflowClient
+import json
 import os
+import shutil
+import threading
 import mlflow
 from dotenv import load_dotenv
+import model_cache
 
 load_dotenv()
 
+MODEL_NAME = 'RF_Price_Prediction_Regressor'
+# local directory standing in for the DagsHub registry: <dir>/<model_name>/aliases.json + <dir>/<model_name>/<version>/
+MODEL_REGISTRY_DIR = os.getenv('MODEL_REGISTRY_DIR')
+
 def access_dagshub():
     uri = 'https://dagshub.com/akshatsharma2407/AutoNexusMlOps.mlflow'
     dagshub_token = os.getenv('DAGSHUB_PAT')
@@ -15,23 +23,48 @@ def access_dagshub():
     os.environ['MLFLOW_TRACKING_PASSWORD'] = dagshub_token
     mlflow.set_tracking_uri(uri=uri)
 
-def get_latest_model_version(model_name: str):
+def get_latest_model_version(model_name: str, alias: str = 'Production'):
+    if MODEL_REGISTRY_DIR:
+        with open(os.path.join(MODEL_REGISTRY_DIR, model_name, 'aliases.json')) as f:
+            return json.load(f).get(alias)
     access_dagshub()
     client = MlflowClient()
-    latest_version = client.get_model_version_by_alias(model_name, 'Production')
+    latest_version = client.get_model_version_by_alias(model_name, alias)
     return latest_version.version if latest_version else None
 
+def download_model_version(model_name: str, model_version: str, dst: str):
+    if MODEL_REGISTRY_DIR:
+        shutil.copytree(os.path.join(MODEL_REGISTRY_DIR, model_name, model_version), dst, dirs_exist_ok=True)
+        return
+    access_dagshub()
+    mlflow.artifacts.download_artifacts(artifact_uri=f'models:/{model_name}/{model_version}', dst_path=dst)
+
 model = None
+model_version = None
+model_lock = threading.Lock()
+
+def load_model_version(model_version: str):
+    local_path = model_cache.fetch_model(MODEL_NAME, model_version, downloader=download_model_version)
+    loaded_model = mlflow.pyfunc.load_model(local_path)
+    # where prediction.get_compiled_model publishes the memory-mapped forest for this version
+    loaded_model.native_forest_dir = model_cache.native_dir(MODEL_NAME, model_version)
+    return loaded_model
 
 def load_model():
-    global model
+    global model, model_version
     if model is None:
-        model_name = 'RF_Price_Prediction_Regressor'
-        model_version = get_latest_model_version(model_name=model_name)
-
-        if model_version is None:
-            raise ValueError('No Valid Model Version found in Production')
+        # concurrent first callers wait here instead of each downloading the model
+        with model_lock:
+            if model is None:
+                version = model_cache.resolve_alias(MODEL_NAME, 'Production', resolver=get_latest_model_version)
+                model = load_model_version(version)
+                model_version = version
+    return model
 
-        model_uri = f'models:/{model_name}/{model_version}'
-        model = mlflow.pyfunc.load_model(model_uri)
-    return model
\ No newline at end of file
+def swap_model(new_model, new_version: str):
+    # callers that already hold the old model keep using it until they return
+    global model, model_version
+    with model_lock:
+        old_model = model
+        model, model_version = new_model, new_version
+    return old_model
@@ -1,33 +1,164 @@
 import joblib
 from scipy.sparse import load_npz
 import boto3
+import json
 import os
+import shutil
 from dotenv import load_dotenv
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from artifact_cache import ARTIFACT_DIR, fetch_object, fetch_objects, is_missing
+from neighbor_table import NEIGHBOR_ARRAYS, NeighborTable
+from ann_index import load_ann_index
+from embedding import EMBEDDING_ARRAYS, EmbeddingIndex
+from matrix_store import MATRIX_HEADER, load_matrix_mmap, matrix_files
 
 load_dotenv()
 
-def load_artifacts(
-    BUCKET: str = 'recommendation-system-artifacts',
-    s3_sparse_path: str = 'artifacts/transformed_df.npz',
-    s3_transformer_path: str = 'artifacts/recommendation_transformer.joblib',
-    local_transformer_path: str = 'FastApi_app/recommendation_artifacts/recommendation_transformer.joblib',
-    local_sparse_path: str = 'FastApi_app/recommendation_artifacts/recommendation_matrix.npz'
-):
-    print('Loading artifacts...')
+# short timeouts, an unreachable S3 falls back to the local cache instead of hanging the start
+ARTIFACT_CONNECT_TIMEOUT = float(os.getenv('ARTIFACT_CONNECT_TIMEOUT', 5))
+# builds are published under artifacts/builds/<build_id>/ by the offline pipeline, the pointer names the live one
+ARTIFACT_PREFIX = 'artifacts'
+CURRENT_BUILD_KEY = 'artifacts/current.json'
+CURRENT_BUILD_FILE = 'current.json'
 
-    os.makedirs('FastApi_app/recommendation_artifacts', exist_ok=True)
-
-    s3 = boto3.client( 
+def s3_client():
+    return boto3.client(
         's3',
         aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
         aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-        region_name=os.getenv('REGION_NAME')
+        region_name=os.getenv('REGION_NAME'),
+        config=Config(connect_timeout=ARTIFACT_CONNECT_TIMEOUT, retries={'max_attempts' : 2})
     )
 
-    s3.download_file(BUCKET, s3_sparse_path, local_sparse_path)
-    s3.download_file(BUCKET, s3_transformer_path, local_transformer_path)
+def current_build(BUCKET: str = 'recommendation-system-artifacts', s3_pointer_path: str = CURRENT_BUILD_KEY) -> dict:
+    """
+    The published build the app should serve, read from the pointer the publish stage writes last.
+
+    {'build_id', 'prefix', 'built_at'}: every artifact of the build sits
+    under `prefix`, so a reader never mixes a new matrix with an old
+    neighbor table. Without a pointer the unversioned `artifacts/` layout
+    is served.
+    """
+    local_path = os.path.join(ARTIFACT_DIR, CURRENT_BUILD_FILE)
+    try:
+        fetch_object(s3_client(), BUCKET, s3_pointer_path, local_path)
+    except (ClientError, BotoCoreError) as e:
+        # a cached pointer is used when S3 is unreachable, reaching here there is none to use
+        if isinstance(e, ClientError) and not is_missing(e):
+            raise
+        return {'build_id' : None, 'prefix' : ARTIFACT_PREFIX, 'built_at' : None}
+    with open(local_path) as f:
+        return json.load(f)
+
+def build_dir(build: dict) -> str:
+    # one local directory per build, a process still mapping the previous build keeps its files
+    return ARTIFACT_DIR if build['build_id'] is None else os.path.join(ARTIFACT_DIR, 'builds', build['build_id'])
+
+def prune_builds(keep: list):
+    builds_dir = os.path.join(ARTIFACT_DIR, 'builds')
+    if not os.path.isdir(builds_dir):
+        return
+    for build_id in os.listdir(builds_dir):
+        if build_id not in keep:
+            # open memory maps of a pruned build stay valid until they are closed
+            shutil.rmtree(os.path.join(builds_dir, build_id), ignore_errors=True)
+
+def load_artifacts(
+    build: dict = None,
+    BUCKET: str = 'recommendation-system-artifacts',
+    sparse_name: str = 'transformed_df.npz',
+    transformer_name: str = 'recommendation_transformer.joblib'
+):
+    print('Loading artifacts...')
+    build = build or current_build(BUCKET)
+    local_transformer_path = os.path.join(build_dir(build), 'recommendation_transformer.joblib')
+    local_sparse_path = os.path.join(build_dir(build), 'recommendation_matrix.npz')
+
+    fetch_objects(s3_client(), BUCKET, {f'{build["prefix"]}/{sparse_name}' : local_sparse_path,
+                                        f'{build["prefix"]}/{transformer_name}' : local_transformer_path})
 
     transformed_df = load_npz(local_sparse_path)
     transformer = joblib.load(local_transformer_path)
 
-    return transformed_df, transformer
\ No newline at end of file
+    return transformed_df, transformer
+
+def download_arrays(bucket: str, s3_prefix: str, names: list, local_dir: str):
+    fetch_objects(s3_client(), bucket, {f'{s3_prefix}/{name}.npy' : os.path.join(local_dir, f'{name}.npy') for name in names})
+
+def load_transformer(
+    build: dict = None,
+    BUCKET: str = 'recommendation-system-artifacts',
+    transformer_name: str = 'recommendation_transformer.joblib'
+):
+    build = build or current_build(BUCKET)
+    local_transformer_path = os.path.join(build_dir(build), 'recommendation_transformer.joblib')
+    fetch_object(s3_client(), BUCKET, f'{build["prefix"]}/{transformer_name}', local_transformer_path)
+    return joblib.load(local_transformer_path)
+
+def load_matrix_store(
+    build: dict = None,
+    BUCKET: str = 'recommendation-system-artifacts',
+    store_name: str = 'matrix_mmap'
+):
+    # float32 matrix shared by every worker through the page cache, without it the npz is loaded
+    print('Loading memory-mapped matrix...')
+    try:
+        build = build or current_build(BUCKET)
+        local_store_dir = os.path.join(build_dir(build), store_name)
+        s3 = s3_client()
+        fetch_object(s3, BUCKET, f'{build["prefix"]}/{store_name}/{MATRIX_HEADER}', os.path.join(local_store_dir, MATRIX_HEADER))
+        fetch_objects(s3, BUCKET, {f'{build["prefix"]}/{store_name}/{name}' : os.path.join(local_store_dir, name)
+                                   for name in matrix_files(local_store_dir)})
+        return load_matrix_mmap(local_store_dir)
+    except (ClientError, BotoCoreError, OSError, ValueError) as e:
+        print(f'Memory-mapped matrix not available, loading the npz: {e}')
+        return None
+
+def load_neighbor_table(
+    build: dict = None,
+    BUCKET: str = 'recommendation-system-artifacts',
+    neighbors_name: str = 'neighbors'
+):
+    # the precomputed top-k table is optional, without it recommendations are computed per request
+    print('Loading neighbor table...')
+    try:
+        build = build or current_build(BUCKET)
+        local_neighbors_dir = os.path.join(build_dir(build), neighbors_name)
+        download_arrays(BUCKET, f'{build["prefix"]}/{neighbors_name}', NEIGHBOR_ARRAYS, local_neighbors_dir)
+    except (ClientError, BotoCoreError) as e:
+        print(f'Neighbor table not available, falling back to per request similarities: {e}')
+        return None
+    return NeighborTable.load(local_neighbors_dir)
+
+
+def load_ann_artifact(
+    build: dict = None,
+    BUCKET: str = 'recommendation-system-artifacts',
+    ann_name: str = 'ann_index.npz'
+):
+    # optional as well, large catalogs without an index are searched exactly
+    print('Loading ANN index...')
+    try:
+        build = build or current_build(BUCKET)
+        local_ann_path = os.path.join(build_dir(build), 'ann_index.npz')
+        fetch_object(s3_client(), BUCKET, f'{build["prefix"]}/{ann_name}', local_ann_path)
+    except (ClientError, BotoCoreError) as e:
+        print(f'ANN index not available, using exact search: {e}')
+        return None
+    return load_ann_index(local_ann_path)
+
+def load_embedding_index(
+    build: dict = None,
+    BUCKET: str = 'recommendation-system-artifacts',
+    embedding_name: str = 'embedding'
+):
+    print('Loading embedding...')
+    try:
+        build = build or current_build(BUCKET)
+        local_embedding_dir = os.path.join(build_dir(build), embedding_name)
+        download_arrays(BUCKET, f'{build["prefix"]}/{embedding_name}', EMBEDDING_ARRAYS, local_embedding_dir)
+    except (ClientError, BotoCoreError) as e:
+        print(f'Embedding not available, using the sparse matrix: {e}')
+        return None
+    return EmbeddingIndex.load(local_embedding_dir)
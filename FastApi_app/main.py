@@ -1,26 +1,93 @@
-import crud, schemas
+import crud, schemas, models
 from sqlalchemy.orm import Session
-from fastapi import FastAPI, HTTPException, Depends, Path, Query, Request
+from fastapi import FastAPI, HTTPException, Depends, Path, Query, Request, Body
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse, HTMLResponse
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm, HTTPBearer, HTTPAuthorizationCredentials
 from typing import List
 from database import SessionLocal, Base, engine
-from prediction import prediction
+from prediction import batch_prediction, score_batch, MAX_BATCH_PREDICTION_ROWS
+import load_model as model_store
 from load_model import load_model
-from recommend import recommend_car_idx
+from recommend import artifacts_loaded, comparable_car_idx, get_artifacts, profile_car_idx, profile_row, recommend_car_idx, recommend_batch, on_car_write, artifacts_build, start_refresher, RECOMMENDATION_REFRESH_SECONDS
+from recommendation_budget import RecommendationBudget
+from attribute_index import AttributeIndex, PRICE_FIELD
+from session_profiles import SessionProfiles, is_page_view
+from batcher import PredictionBatcher
+from prediction_cache import PredictionCache
+from warmup import readiness_status, start_warmup
+from model_watcher import start_watcher, watcher_state
+from contextlib import asynccontextmanager
 import json
+import os
+import secrets
+import uuid
 import requests
 
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+# create_all leaves existing tables alone, indexes declared since they were created are added here
+CREATE_MISSING_INDEXES = os.getenv('CREATE_MISSING_INDEXES', 'true').lower() == 'true'
+if CREATE_MISSING_INDEXES:
+    models.create_missing_indexes(engine)
+
+WARMUP_ON_STARTUP = os.getenv('WARMUP_ON_STARTUP', 'true').lower() == 'true'
+MODEL_WATCH_ENABLED = os.getenv('MODEL_WATCH_ENABLED', 'true').lower() == 'true'
+
+# catalog writes made through the /api/cars routes go straight into this process's recommendation matrix, see recommend.py
+crud.write_hooks.append(on_car_write)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # model + recommendation artifacts load off the request path, /healthz/ready reports when done
+    if WARMUP_ON_STARTUP:
+        start_warmup()
+    # hot-swaps the model when the Production alias moves, see model_watcher.py, and the
+    # recommendation artifacts when a new build is published, see recommend.py. Under
+    # gunicorn the master watches instead and re-forks the workers on either
+    watcher_owned = watcher_state['owner'] == 'worker'
+    watcher_stop = start_watcher() if MODEL_WATCH_ENABLED and watcher_owned else None
+    refresher_stop = start_refresher() if RECOMMENDATION_REFRESH_SECONDS > 0 and watcher_owned else None
+    yield
+    if watcher_stop is not None:
+        watcher_stop.set()
+    if refresher_stop is not None:
+        refresher_stop.set()
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 templates = Jinja2Templates(directory="templates")
 
+MAX_BATCH_RECOMMENDATION_CARS = int(os.getenv('MAX_BATCH_RECOMMENDATION_CARS', 200))
+# a whole batch is one search, it gets a longer budget than a single car page
+RECOMMENDATION_BATCH_BUDGET_MS = float(os.getenv('RECOMMENDATION_BATCH_BUDGET_MS', 2000))
+SESSION_COOKIE = os.getenv('SESSION_COOKIE', 'autonexus_session')
+SESSION_COOKIE_MAX_AGE = int(os.getenv('SESSION_COOKIE_MAX_AGE', 30 * 24 * 3600))
+# bearer token the catalog write routes require, they are disabled while it is unset
+CATALOG_WRITE_TOKEN = os.getenv('CATALOG_WRITE_TOKEN')
+# "recommended for you" shows once a visitor has viewed this many cars, one view is just "similar cars"
+FOR_YOU_MIN_VIEWS = int(os.getenv('FOR_YOU_MIN_VIEWS', 2))
+
+prediction_batcher = PredictionBatcher(predict_fn=lambda cars: batch_prediction(cars=cars, model=load_model()))
+prediction_cache = PredictionCache()
+# the car page never waits on an artifact download or a slow search, see recommendation_budget.py
+recommendation_budget = RecommendationBudget(recommend_fn=recommend_car_idx, is_loaded_fn=artifacts_loaded, load_fn=get_artifacts)
+# comparables for the predict page search the same in-memory index, under their own budget and counters
+comparables_budget = RecommendationBudget(recommend_fn=comparable_car_idx, is_loaded_fn=artifacts_loaded, load_fn=get_artifacts)
+batch_budget = RecommendationBudget(recommend_fn=recommend_batch, is_loaded_fn=artifacts_loaded, load_fn=get_artifacts,
+                                   budget_ms=RECOMMENDATION_BATCH_BUDGET_MS)
+# visitor profiles built from the car pages they view, see session_profiles.py
+session_profiles = SessionProfiles()
+
+def for_you_idx(session_id: str, k: int = 5):
+    profile = session_profiles.query(session_id)
+    return [] if profile is None else profile_car_idx(*profile, k=k)
+
+for_you_budget = RecommendationBudget(recommend_fn=for_you_idx, is_loaded_fn=artifacts_loaded, load_fn=get_artifacts)
+
 cars = requests.get('https://raw.githubusercontent.com/akshatsharma2407/Car-Data-API/refs/heads/master/cars.json').json()
 
 def get_db():
@@ -30,6 +97,15 @@ def get_db():
     finally:
         db.close()
 
+@app.get('/healthz/live')
+def liveness():
+    return {'status' : 'alive'}
+
+@app.get('/healthz/ready')
+def readiness_probe():
+    status_code, content = readiness_status()
+    return JSONResponse(status_code=status_code, content={**content, 'model_version' : model_store.model_version})
+
 @app.get('/', response_class=HTMLResponse)
 def home(request: Request):
     category = "electric"
@@ -85,19 +161,42 @@ def get_cars(request: Request,
 @app.get('/cars/{id}', response_class= HTMLResponse)
 def get_car(request: Request, id: int = Path(..., description='id of car you want to fetch', examples=[1,2,3]), db: Session = Depends(get_db)):
     car = crud.get_car(db=db, id=id)
-    idx = recommend_car_idx(car)
-    recommended_cars = crud.recommmended_car_details(car_ids=idx, db=db)
-
     if car is None:
         raise HTTPException(status_code=404, detail='Car not found')
-    return templates.TemplateResponse(
+
+    idx = recommendation_budget.recommend(car)
+    if idx is None:
+        recommended_cars = crud.similar_cars(db=db, car=car)
+    else:
+        recommended_cars = crud.recommmended_car_details(car_ids=idx, db=db)
+
+    # crawlers and HEAD checks see the page but get no cookie and no profile
+    page_view = is_page_view(request.method, request.headers.get('user-agent', ''))
+    session_id = request.cookies.get(SESSION_COOKIE) or (uuid.uuid4().hex if page_view else None)
+    # a view only adds the car's row to the profile, it is skipped until the artifacts are loaded
+    if page_view and artifacts_loaded():
+        try:
+            session_profiles.record_view(session_id, car.id, profile_row(car))
+        except Exception as e:
+            print(f'Could not record the view of car {car.id}: {type(e).__name__}: {e}')
+    for_you_cars = []
+    if session_id is not None and session_profiles.views(session_id) >= FOR_YOU_MIN_VIEWS:
+        for_you = for_you_budget.recommend(session_id) or []
+        for_you_cars = {car.id: car for car in crud.recommmended_car_details(car_ids=for_you, db=db)}
+        for_you_cars = [for_you_cars[id_] for id_ in for_you if id_ in for_you_cars]
+
+    response = templates.TemplateResponse(
         "car_details.html",
         {
             'request' : request,
             'car' : car,
-            'recommended_cars' : recommended_cars
+            'recommended_cars' : recommended_cars,
+            'for_you_cars' : for_you_cars
         }
     )
+    if page_view and request.cookies.get(SESSION_COOKIE) != session_id:
+        response.set_cookie(SESSION_COOKIE, session_id, max_age=SESSION_COOKIE_MAX_AGE, httponly=True, samesite='lax')
+    return response
 
 @app.get('/predict/{cat}', response_class=HTMLResponse)
 def prediction_page(request: Request, cat: str = 'Electric'):
@@ -110,14 +209,148 @@ def prediction_page(request: Request, cat: str = 'Electric'):
     )
 
 @app.post('/prediction', response_class=HTMLResponse)
-def predict_price(request: Request, car_details: schemas.PredictionInputSchema = Depends(schemas.PredictionInputSchema.as_form)):
-    model = load_model()
+def predict_price(request: Request, car_details: schemas.PredictionInputSchema = Depends(schemas.PredictionInputSchema.as_form),
+                  db: Session = Depends(get_db)):
     print(car_details)
-    price = prediction(car=car_details, model=model)
+    price = prediction_cache.get_or_compute(
+        car=car_details,
+        model_version=model_store.model_version,
+        compute=lambda: prediction_batcher.predict(car_details)
+    )
+    idx = comparables_budget.recommend(car_details, price)
+    if idx is None:
+        comparable_cars = crud.similar_cars(db=db, car=car_details, price=price)
+    else:
+        comparable_cars = {car.id: car for car in crud.recommmended_car_details(car_ids=idx, db=db)}
+        comparable_cars = [comparable_cars[id_] for id_ in idx if id_ in comparable_cars]
     return templates.TemplateResponse(
         "predict.html",
         {
             "request" : request,
-            "price" : round(price[0],2)
+            "price" : round(price,2),
+            "comparable_cars" : comparable_cars
         }
-    )
\ No newline at end of file
+    )
+
+@app.post('/api/predict/batch', response_model=schemas.BatchPredictionOutputSchema)
+def predict_price_batch(batch: List[dict] = Body(..., description='list of cars, each following PredictionInputSchema')):
+    # checked before the model is loaded, an oversized batch never costs a download
+    if len(batch) > MAX_BATCH_PREDICTION_ROWS:
+        raise HTTPException(status_code=413, detail=f'batch too large, send at most {MAX_BATCH_PREDICTION_ROWS} cars per request')
+    return schemas.BatchPredictionOutputSchema(predictions=score_batch(batch, model=load_model()))
+
+# declared ahead of /api/recommend/{id}, which would otherwise claim the path
+@app.get('/api/recommend/for-you', response_model=List[schemas.CarOut])
+def recommend_for_you(request: Request,
+                      k: int = Query(default=5, ge=1, le=50, description='number of recommendations'),
+                      db: Session = Depends(get_db)):
+    session_id = request.cookies.get(SESSION_COOKIE)
+    if session_id is None:
+        return []
+    idx = for_you_budget.recommend(session_id, k=k) or []
+    recommended_cars = {car.id: car for car in crud.recommmended_car_details(car_ids=idx, db=db)}
+    return [recommended_cars[id_] for id_ in idx if id_ in recommended_cars]
+
+@app.get('/api/recommend/{id}', response_model=List[schemas.CarOut])
+def recommend_similar_cars(id: int = Path(..., description='id of the car to find similar cars for'),
+                           k: int = Query(default=5, ge=1, le=50, description='number of recommendations'),
+                           fuel_type: List[str] = Query(default=None, description='only these fuel types'),
+                           stock_type: List[str] = Query(default=None, description='only these stock types'),
+                           brand_name: List[str] = Query(default=None, description='only these brands'),
+                           st: List[str] = Query(default=None, description='only these state abbreviations'),
+                           min_price: float = Query(default=None, ge=0, description='minimum price, inclusive'),
+                           max_price: float = Query(default=None, ge=0, description='maximum price, inclusive'),
+                           db: Session = Depends(get_db)):
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail='min_price must not be greater than max_price')
+    car = crud.get_car(db=db, id=id)
+    if car is None:
+        raise HTTPException(status_code=404, detail='Car not found')
+    filters = {field: values for field, values in [('Fuel_Type', fuel_type), ('Stock_Type', stock_type),
+                                                   ('Brand_Name', brand_name), ('ST', st)] if values}
+    # a car the loaded build cannot place gets the car page's fallback, narrowed to the same filters
+    idx = recommendation_budget.recommend(car, k=k, filters=filters, min_price=min_price, max_price=max_price)
+    if idx is None:
+        return [similar for similar in crud.similar_cars(db=db, car=car, k=k)
+                if AttributeIndex.matches({field: getattr(similar, field) for field in [*filters, PRICE_FIELD]}, filters, min_price, max_price)]
+    recommended_cars = {car.id: car for car in crud.recommmended_car_details(car_ids=idx, db=db)}
+    return [recommended_cars[id_] for id_ in idx if id_ in recommended_cars]
+
+@app.post('/api/recommend/batch', response_model=schemas.BatchRecommendationOutputSchema)
+def recommend_similar_cars_batch(request: schemas.BatchRecommendationInputSchema, db: Session = Depends(get_db)):
+    car_ids = list(dict.fromkeys(request.car_ids))
+    if len(car_ids) > MAX_BATCH_RECOMMENDATION_CARS:
+        raise HTTPException(status_code=413, detail=f'batch too large, send at most {MAX_BATCH_RECOMMENDATION_CARS} cars per request')
+
+    found_cars = crud.recommmended_car_details(car_ids=car_ids, db=db)
+    found = {car.id for car in found_cars}
+    idx = batch_budget.recommend(found_cars, k=request.k) or {}
+    # one query for the neighbors of every car
+    neighbors = {car.id: car for car in crud.recommmended_car_details(car_ids=sorted({id_ for ids in idx.values() for id_ in ids}), db=db)}
+    recommendations = {car.id: [neighbors[n] for n in idx[car.id] if n in neighbors] for car in found_cars if car.id in idx}
+    # cars the search left out, or the whole batch when it ran over its budget, get what the car page falls back to
+    for car in found_cars:
+        if car.id not in idx:
+            recommendations[car.id] = crud.similar_cars(db=db, car=car, k=request.k)
+    return {
+        'recommendations' : {id_: recommendations[id_] for id_ in car_ids if id_ in found},
+        'missing' : [id_ for id_ in car_ids if id_ not in found]
+    }
+
+def catalog_writer(credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
+    if not CATALOG_WRITE_TOKEN:
+        raise HTTPException(status_code=403, detail='catalog writes are disabled')
+    if not secrets.compare_digest(credentials.credentials, CATALOG_WRITE_TOKEN):
+        raise HTTPException(status_code=403, detail='invalid token')
+
+# listings change here, the write hooks apply them to the served recommendations until the next build includes them
+@app.post('/api/cars', response_model=schemas.CarOut, status_code=201, dependencies=[Depends(catalog_writer)])
+def create_car(new_car: schemas.CarCreate, db: Session = Depends(get_db)):
+    missing = [field for field in ['Model_Year', 'Brand_Name', 'Model_Name'] if getattr(new_car, field) is None]
+    if missing:
+        raise HTTPException(status_code=422, detail=f'missing required fields: {missing}')
+    return crud.create_car(db=db, new_car=new_car)
+
+@app.put('/api/cars/{id}', response_model=schemas.CarOut, dependencies=[Depends(catalog_writer)])
+def update_car(updated_car: schemas.CarUpdate, id: int = Path(..., description='id of the car to update'), db: Session = Depends(get_db)):
+    car = crud.update_car(db=db, id=id, update_car=updated_car)
+    if car is None:
+        raise HTTPException(status_code=404, detail='Car not found')
+    return car
+
+@app.delete('/api/cars/{id}', status_code=204, dependencies=[Depends(catalog_writer)])
+def delete_car(id: int = Path(..., description='id of the car to delete'), db: Session = Depends(get_db)):
+    if crud.delete_car(db=db, id=id) is None:
+        raise HTTPException(status_code=404, detail='Car not found')
+
+def per_worker(metrics: dict) -> dict:
+    # every gunicorn worker keeps its own caches and counters, a scrape only sees the worker that answered it
+    return {'worker_pid' : os.getpid(), **metrics}
+
+@app.get('/metrics/batching')
+def batching_metrics():
+    return per_worker({
+        'window_ms' : prediction_batcher.window * 1000,
+        'max_batch_size' : prediction_batcher.max_batch_size,
+        **prediction_batcher.metrics.snapshot()
+    })
+
+@app.get('/metrics/model')
+def model_metrics():
+    return per_worker({'model_version' : model_store.model_version, **watcher_state})
+
+@app.get('/metrics/prediction_cache')
+def prediction_cache_metrics():
+    return per_worker(prediction_cache.snapshot())
+
+@app.get('/metrics/recommendation')
+def recommendation_metrics():
+    return per_worker({**recommendation_budget.snapshot(), 'batch' : batch_budget.snapshot(), 'build_id' : artifacts_build()})
+
+@app.get('/metrics/comparables')
+def comparables_metrics():
+    return per_worker(comparables_budget.snapshot())
+
+@app.get('/metrics/sessions')
+def session_metrics():
+    return per_worker({**session_profiles.snapshot(), 'for_you' : for_you_budget.snapshot()})
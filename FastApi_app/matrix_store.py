@@ -0,0 +1,96 @@
+import json
+import os
+import shutil
+import numpy as np
+from scipy import sparse
+from neighbor_table import normalized_rows
+
+MATRIX_HEADER = 'matrix.json'
+MATRIX_FORMAT_VERSION = 1
+
+
+def matrix_nbytes(matrix) -> int:
+    return int(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes)
+
+def save_matrix_mmap(matrix, directory: str, prices: np.ndarray = None) -> int:
+    """
+    Write the recommendation matrix as raw little-endian arrays plus a json header, ready for numpy.memmap.
+
+    `data` holds the rows narrowed to float32 and `normalized` the l2
+    normalized rows (computed in float64, then narrowed) over the same
+    `indices` and `indptr`, int32 unless the matrix is too large for them.
+    `prices`, exact per-row prices for the attribute index, is kept in
+    float64. Returns the bytes written.
+    """
+    matrix = sparse.csr_matrix(matrix, dtype=np.float64)
+    matrix.sum_duplicates()
+    matrix.eliminate_zeros()
+    index_dtype = np.int32 if max(matrix.nnz, matrix.shape[1]) < np.iinfo(np.int32).max else np.int64
+    serving = {
+        'data' : matrix.data.astype(np.float32),
+        'normalized' : normalized_rows(matrix).data.astype(np.float32),
+        'indices' : matrix.indices.astype(index_dtype),
+        'indptr' : matrix.indptr.astype(index_dtype),
+    }
+    if prices is not None:
+        serving['prices'] = np.asarray(prices, dtype=np.float64)
+    header = {'format_version' : MATRIX_FORMAT_VERSION, 'shape' : list(matrix.shape), 'arrays' : {}}
+
+    tmp_directory = f'{directory.rstrip(os.sep)}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    n_bytes = 0
+    for name, array in serving.items():
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+        array.tofile(os.path.join(tmp_directory, f'{name}.bin'))
+        header['arrays'][name] = {'dtype' : array.dtype.str, 'shape' : list(array.shape)}
+        n_bytes += array.nbytes
+    with open(os.path.join(tmp_directory, MATRIX_HEADER), 'w') as f:
+        json.dump(header, f, indent=2)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_directory, directory)
+    return n_bytes
+
+def matrix_files(directory: str) -> list:
+    # array files first, the header last: a reader never sees a header ahead of its arrays
+    with open(os.path.join(directory, MATRIX_HEADER)) as f:
+        header = json.load(f)
+    return [f'{name}.bin' for name in header['arrays']] + [MATRIX_HEADER]
+
+def load_matrix_mmap(directory: str) -> dict:
+    """`matrix` and `normalized` as CSR matrices over read-only memory maps (no copy), and `prices` if saved."""
+    with open(os.path.join(directory, MATRIX_HEADER)) as f:
+        header = json.load(f)
+    if header['format_version'] != MATRIX_FORMAT_VERSION:
+        raise ValueError(f'Unsupported matrix format version {header["format_version"]}')
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        path = os.path.join(directory, f'{name}.bin')
+        dtype, shape = np.dtype(spec['dtype']), tuple(spec['shape'])
+        if os.path.getsize(path) != dtype.itemsize * int(np.prod(shape)):
+            raise ValueError(f'{path} does not match its header')
+        # read-only file mappings are backed by the page cache, so every worker maps the same pages
+        arrays[name] = np.memmap(path, dtype=dtype, mode='r', shape=shape) if shape[0] else np.empty(shape, dtype=dtype)
+    shape = tuple(header['shape'])
+    return {
+        'matrix' : sparse.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=shape, copy=False),
+        'normalized' : sparse.csr_matrix((arrays['normalized'], arrays['indices'], arrays['indptr']), shape=shape, copy=False),
+        'prices' : arrays.get('prices'),
+    }
+
+def storage_report(matrix, npz_path: str, n_bytes: int) -> dict:
+    """Bytes a worker held with the npz (matrix plus float64 normalized copies) against the shared memory-mapped files."""
+    matrix = sparse.csr_matrix(matrix)
+    # the loaded matrix, its normalized copy and the transposed copy used for exact scoring
+    heap_bytes = matrix_nbytes(matrix) + 2 * (matrix.nnz * 8 + matrix.nnz * matrix.indices.itemsize) \
+        + (matrix.shape[0] + 1) * matrix.indptr.itemsize + (matrix.shape[1] + 1) * matrix.indptr.itemsize
+    return {
+        'rows' : int(matrix.shape[0]),
+        'nnz' : int(matrix.nnz),
+        'npz_file_bytes' : os.path.getsize(npz_path),
+        'npz_heap_bytes_per_worker' : int(heap_bytes),
+        'mmap_bytes' : int(n_bytes),
+        'bytes_saved_per_worker' : int(heap_bytes - n_bytes),
+        'saved_pct' : round(100 * (1 - n_bytes / heap_bytes), 1) if heap_bytes else 0.0,
+    }
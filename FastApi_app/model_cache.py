@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Callable, Optional
+
+MODEL_CACHE_DIR = os.getenv('MODEL_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'autonexus', 'models'))
+MODEL_ALIAS_TTL_SECONDS = float(os.getenv('MODEL_ALIAS_TTL_SECONDS', 300))
+MANIFEST_FILE = 'MANIFEST.json'
+
+
+def _model_dir(model_name: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, model_name)
+
+def _write_json_atomic(path: str, payload: dict):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def build_manifest(root: str) -> dict:
+    # hashes of the files as they landed on disk: later changes to the cached copy are caught,
+    # a download that arrived corrupted is not, the registry publishes no checksums to compare with
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            rel_path = os.path.relpath(path, root)
+            if rel_path == MANIFEST_FILE:
+                continue
+            files[rel_path] = file_sha256(path)
+    # digest over every (path, sha256) pair identifies the content of the whole model directory
+    digest = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()
+    return {'files' : files, 'digest' : digest}
+
+def verify_model_dir(path: str) -> bool:
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return False
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        return build_manifest(path)['files'] == manifest['files']
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def resolve_alias(model_name: str, alias: str, resolver: Callable[[str, str], Optional[str]],
+                  cache_dir: str = MODEL_CACHE_DIR, ttl: float = MODEL_ALIAS_TTL_SECONDS) -> str:
+    """
+    Resolve `alias` to a model version, remembering the answer for `ttl` seconds.
+
+    When the registry cannot be reached the last known version is returned,
+    even if it is older than the ttl, so a restart works offline.
+    """
+    os.makedirs(_model_dir(model_name, cache_dir), exist_ok=True)
+    aliases_path = os.path.join(_model_dir(model_name, cache_dir), 'aliases.json')
+    aliases = {}
+    if os.path.exists(aliases_path):
+        try:
+            with open(aliases_path) as f:
+                aliases = json.load(f)
+        except (OSError, ValueError):
+            aliases = {}
+
+    cached = aliases.get(alias)
+    if cached and time.time() - cached['resolved_at'] < ttl:
+        return cached['version']
+
+    try:
+        version = resolver(model_name, alias)
+    except Exception as e:
+        if cached:
+            print(f'Could not resolve {model_name}@{alias} ({e}), using cached version {cached["version"]}')
+            return cached['version']
+        raise
+
+    if version is None:
+        raise ValueError(f'No model version found for {model_name}@{alias}')
+
+    aliases[alias] = {'version' : str(version), 'resolved_at' : time.time()}
+    _write_json_atomic(aliases_path, aliases)
+    return str(version)
+
+def fetch_model(model_name: str, version: str, downloader: Callable[[str, str, str], None],
+                cache_dir: str = MODEL_CACHE_DIR) -> str:
+    """
+    Return a local directory holding `model_name` version `version`.
+
+    `downloader(model_name, version, dst)` is only called on a cache miss or when
+    the cached copy no longer matches the manifest written when it was
+    downloaded. Downloads land in a temporary directory and are moved into
+    place with a rename, so a crash never leaves a half written version behind.
+
+    The cache is keyed by registry version, which the registry never reuses
+    for different files. The manifest is built from the downloaded files
+    themselves, so it does not vouch for the download: a copy that arrived
+    truncated or corrupted is cached as is, and only the downloader's own
+    error handling stands between it and the cache.
+    """
+    dst = os.path.join(_model_dir(model_name, cache_dir), str(version))
+    if verify_model_dir(dst):
+        return dst
+
+    tmp_dst = os.path.join(_model_dir(model_name, cache_dir), f'.tmp-{version}-{os.getpid()}')
+    shutil.rmtree(tmp_dst, ignore_errors=True)
+    os.makedirs(tmp_dst)
+    try:
+        downloader(model_name, str(version), tmp_dst)
+        manifest = build_manifest(tmp_dst)
+        manifest.update({'model_name' : model_name, 'version' : str(version), 'downloaded_at' : time.time()})
+        _write_json_atomic(os.path.join(tmp_dst, MANIFEST_FILE), manifest)
+        shutil.rmtree(dst, ignore_errors=True)
+        try:
+            os.replace(tmp_dst, dst)
+        except OSError:
+            # another worker placed the same version first
+            if not verify_model_dir(dst):
+                raise
+    finally:
+        shutil.rmtree(tmp_dst, ignore_errors=True)
+    return dst
+
+def native_dir(model_name: str, version: str, cache_dir: str = MODEL_CACHE_DIR) -> str:
+    # kept next to (not inside) the version directory so it does not disturb the manifest check
+    return os.path.join(_model_dir(model_name, cache_dir), f'{version}.native')
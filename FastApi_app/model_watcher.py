@@ -0,0 +1,67 @@
+import gc
+import os
+import threading
+import time
+import weakref
+import load_model as model_store
+import model_cache
+from prediction import batch_prediction
+from warmup import WARMUP_CAR
+
+MODEL_POLL_SECONDS = float(os.getenv('MODEL_POLL_SECONDS', 60))
+
+watcher_state = {
+    # 'worker': every process polls and swaps its own copy, 'master': the gunicorn master
+    # polls and re-forks the workers after a swap, see gunicorn_conf.py
+    'owner' : 'worker',
+    'polls' : 0,
+    'swaps' : 0,
+    'last_poll_at' : None,
+    'last_swap_at' : None,
+    'error' : None,
+}
+
+def check_for_new_version():
+    """Load, warm and swap in the Production model if its alias moved. Returns the new version or None."""
+    watcher_state['polls'] += 1
+    watcher_state['last_poll_at'] = time.time()
+    latest_version = model_cache.resolve_alias(
+        model_store.MODEL_NAME, 'Production', resolver=model_store.get_latest_model_version, ttl=0
+    )
+    if model_store.model is None or latest_version == model_store.model_version:
+        return None
+
+    # everything up to the swap runs on this thread, requests keep hitting the old model meanwhile
+    new_model = model_store.load_model_version(latest_version)
+    batch_prediction(cars=[WARMUP_CAR], model=new_model)
+
+    old_version = model_store.model_version
+    old_model = model_store.swap_model(new_model, latest_version)
+    weakref.finalize(old_model, print, f'Model version {old_version} released')
+    del old_model
+    gc.collect()
+
+    watcher_state['swaps'] += 1
+    watcher_state['last_swap_at'] = time.time()
+    print(f'Production model swapped from version {old_version} to {latest_version}')
+    return latest_version
+
+def watch(poll_seconds: float = MODEL_POLL_SECONDS, stop_event: threading.Event = None,
+          check=check_for_new_version, on_swap=None):
+    stop_event = stop_event or threading.Event()
+    while not stop_event.wait(poll_seconds):
+        try:
+            new_version = check()
+            watcher_state['error'] = None
+        except Exception as e:
+            watcher_state['error'] = f'{type(e).__name__}: {e}'
+            print(f'Model watcher poll failed: {watcher_state["error"]}')
+            continue
+        if new_version is not None and on_swap is not None:
+            on_swap(new_version)
+
+def start_watcher(poll_seconds: float = MODEL_POLL_SECONDS, check=check_for_new_version, on_swap=None):
+    stop_event = threading.Event()
+    thread = threading.Thread(target=watch, args=(poll_seconds, stop_event, check, on_swap), name='model-watcher', daemon=True)
+    thread.start()
+    return stop_event
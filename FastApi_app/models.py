@@ -1,8 +1,11 @@
-from sqlalchemy import Column, Integer, String, Boolean, DECIMAL, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DECIMAL, JSON, Index, inspect
+from sqlalchemy.exc import SQLAlchemyError
 from database import Base
 
 class Car(Base):
     __tablename__ = "Car"
+    # model listing pages and the recommendation fallback filter on brand + model
+    __table_args__ = (Index('ix_car_brand_model_price', 'Brand_Name', 'Model_Name', 'Price'),)
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     Model_Year = Column(Integer, nullable=False)
@@ -39,4 +42,30 @@ class Car(Base):
     STATE = Column(String(200))
     ST = Column(String(10))
     lat = Column(DECIMAL(9, 6))
-    LONG = Column(DECIMAL(9, 6))
\ No newline at end of file
+    LONG = Column(DECIMAL(9, 6))
+
+
+def create_missing_indexes(engine):
+    """
+    Create declared indexes missing from tables that already exist.
+
+    create_all only builds indexes together with a new table, so an index
+    declared later is added here. Returns the names of the indexes created.
+    """
+    inspector = inspect(engine)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(bind=engine)
+                created.append(index.name)
+                print(f'Created index {index.name} on {table.name}')
+            except SQLAlchemyError as e:
+                # another container starting at the same time may have created it first
+                print(f'Could not create index {index.name} on {table.name}: {type(e).__name__}: {e}')
+    return created
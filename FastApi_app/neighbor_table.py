@@ -0,0 +1,99 @@
+import os
+import shutil
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+NEIGHBOR_ARRAYS = ['indices', 'scores']
+
+
+def top_k_indices(scores: np.ndarray, k: int, ids: np.ndarray = None) -> np.ndarray:
+    """
+    Positions of the k largest scores, best first.
+
+    Same order as a stable `np.argsort(scores)[-k:][::-1]` (ties go to the
+    higher index, or to the higher entry of `ids` when scores belong to a
+    subset of rows) without sorting the whole row: only the candidates at or
+    above the k-th largest score are sorted.
+    """
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        kth = np.partition(scores, n - k)[n - k]
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(n)
+    tie_break = candidates if ids is None else ids[candidates]
+    order = np.lexsort((-tie_break, -scores[candidates]))
+    return candidates[order[:k]]
+
+def normalized_rows(matrix) -> sparse.csr_matrix:
+    # l2 normalized rows turn the cosine similarity into a plain dot product, as sklearn computes it
+    return normalize(sparse.csr_matrix(matrix, dtype=np.float64), norm='l2', copy=True)
+
+def similarity_scores(query, normalized_t: sparse.csr_matrix) -> np.ndarray:
+    """Cosine similarity of one query row against the catalog, `normalized_t` being normalized_rows(catalog).T as csr."""
+    # the query is normalized in its own format (dense or sparse), exactly as cosine_similarity does
+    scores = normalize(query, norm='l2') @ normalized_t
+    return np.asarray(scores.toarray() if sparse.issparse(scores) else scores, dtype=np.float64).ravel()
+
+def normalized_query(query) -> np.ndarray:
+    """Dense l2 normalized query row; scoring rows of normalized_rows(catalog) against it matches similarity_scores bit for bit."""
+    return np.asarray(sparse.csr_matrix(normalize(query, norm='l2')).toarray(), dtype=np.float64).ravel()
+
+def build_neighbor_table(matrix, k: int, block_mb: float = 256) -> dict:
+    """
+    Top-k cosine neighbors of every row of `matrix`, computed in row blocks.
+
+    Row i keeps the ranks 1..k of its similarity ordering; rank 0 is the row
+    itself, which the online path skips the same way. Each block holds at most
+    `block_mb` of dense similarities.
+    """
+    normalized = normalized_rows(matrix)
+    normalized_t = normalized.T.tocsr()
+    n_rows = normalized.shape[0]
+    k = min(k, max(n_rows - 1, 0))
+    block_rows = max(1, int(block_mb * 1e6 // (8 * max(n_rows, 1))))
+
+    indices = np.empty((n_rows, k), dtype=np.int32)
+    scores = np.empty((n_rows, k), dtype=np.float32)
+    for start in range(0, n_rows, block_rows):
+        similarities = (normalized[start:start + block_rows] @ normalized_t).toarray()
+        for offset, row in enumerate(similarities):
+            top = top_k_indices(row, k + 1)[1:]
+            indices[start + offset] = top
+            scores[start + offset] = row[top]
+    return {'indices' : indices, 'scores' : scores}
+
+def save_neighbor_table(table: dict, directory: str) -> int:
+    tmp_directory = f'{directory.rstrip(os.sep)}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    for name in NEIGHBOR_ARRAYS:
+        np.save(os.path.join(tmp_directory, f'{name}.npy'), table[name])
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_directory, directory)
+    return sum(table[name].nbytes for name in NEIGHBOR_ARRAYS)
+
+
+class NeighborTable:
+    """Read-only top-k neighbor table, memory mapped so forked workers share the pages."""
+
+    def __init__(self, indices: np.ndarray, scores: np.ndarray):
+        if indices.shape != scores.shape:
+            raise ValueError(f'indices {indices.shape} and scores {scores.shape} do not match')
+        self.indices = indices
+        self.scores = scores
+        self.n_rows, self.k = indices.shape
+
+    @classmethod
+    def load(cls, directory: str):
+        return cls(*(np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in NEIGHBOR_ARRAYS))
+
+    def covers(self, row: int, k: int) -> bool:
+        return 0 <= row < self.n_rows and k <= self.k
+
+    def lookup(self, row: int, k: int) -> list:
+        return [int(idx) for idx in self.indices[row, :k]]
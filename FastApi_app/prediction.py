@@ -1,11 +1,117 @@
 import schemas
+import os
+import threading
+import typing
+import weakref
 import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
 from sklearn.pipeline import Pipeline
+from typing import List
+from pydantic import ValidationError
+from fast_encoder import CompiledEncoder
+from forest_engine import ForestEngine, current_forest_mmap, flatten_forest, save_forest_mmap
+
+RENAME_COLUMNS = {'Unnamed': 'Unnamed: 0',
+                  'Km_per_l' : 'Km/L',
+                  'Km_L_e_City' : 'Km/L_e_City',
+                  'Km_L_e_Hwy' : 'Km/L_e_Hwy'}
+
+# 'native' scores small batches with the compiled encoder + flattened forest, 'sklearn' always uses model.predict
+PREDICTION_ENGINE = os.getenv('PREDICTION_ENGINE', 'native')
+# past a few hundred rows sklearn's cython tree loop is faster than the numpy traversal
+NATIVE_MAX_ROWS = int(os.getenv('NATIVE_MAX_ROWS', 256))
+MAX_BATCH_PREDICTION_ROWS = int(os.getenv('MAX_BATCH_PREDICTION_ROWS', 10000))
+# every input field defaults to None, the pipeline only copes with None where the schema lists it as a value
+REQUIRED_FEATURES = [name for name, field in schemas.PredictionInputSchema.model_fields.items()
+                     if field.default is None and None not in typing.get_args(field.annotation)]
+
+class CompiledPipeline:
+    def __init__(self, pipe: Pipeline, forest_dir: str = None):
+        if len(pipe.steps) != 2 or not isinstance(pipe.steps[-1][1], RandomForestRegressor):
+            raise ValueError('Expected an encoder + RandomForestRegressor pipeline')
+        encoder, forest = pipe.steps[0][1], pipe.steps[-1][1]
+        self.encoder = CompiledEncoder.from_column_transformer(encoder, rename_columns=RENAME_COLUMNS)
+        if hasattr(forest, 'feature_names_in_') and list(forest.feature_names_in_) != self.encoder.feature_names:
+            raise ValueError('Compiled encoder columns do not match the forest features')
+        if forest_dir is None:
+            self.engine = ForestEngine.from_estimator(forest)
+        else:
+            # first worker on the host writes the compact forest, every worker maps the same file pages
+            if current_forest_mmap(forest_dir) is None:
+                save_forest_mmap(flatten_forest(forest), forest_dir)
+            self.engine = ForestEngine.load_mmap(forest_dir)
+
+    def predict(self, cars: List[schemas.PredictionInputSchema]):
+        return self.engine.predict(self.encoder.transform(cars))
+
+compiled_models = weakref.WeakKeyDictionary()
+compile_lock = threading.Lock()
+
+def unwrap_pipeline(model) -> Pipeline:
+    # mlflow's PyFuncModel hides the sklearn pipeline it was logged from
+    return model if isinstance(model, Pipeline) else model.get_raw_model()
+
+def get_compiled_model(model):
+    with compile_lock:
+        if model not in compiled_models:
+            try:
+                compiled_models[model] = CompiledPipeline(unwrap_pipeline(model), forest_dir=getattr(model, 'native_forest_dir', None))
+            except Exception as e:
+                print(f'Native prediction path unavailable, using model.predict: {type(e).__name__}: {e}')
+                compiled_models[model] = None
+        return compiled_models[model]
+
+def to_frame(cars: List[schemas.PredictionInputSchema]) -> pd.DataFrame:
+    return pd.DataFrame([car.model_dump() for car in cars]).rename(columns=RENAME_COLUMNS)
 
 def prediction(car: schemas.PredictionInputSchema, model: Pipeline):
-    input_df = pd.DataFrame([car.model_dump()]).rename(columns={'Unnamed': 'Unnamed: 0',
-                                                                 'Km_per_l' : 'Km/L',
-                                                                 'Km_L_e_City' : 'Km/L_e_City',
-                                                                 'Km_L_e_Hwy' : 'Km/L_e_Hwy'})
-    prediction = model.predict(input_df)
-    return prediction
\ No newline at end of file
+    return batch_prediction(cars=[car], model=model)
+
+def batch_prediction(cars: List[schemas.PredictionInputSchema], model: Pipeline):
+    # one predict call for the whole batch, rows stay in input order
+    if not cars:
+        return []
+    if PREDICTION_ENGINE == 'native' and len(cars) <= NATIVE_MAX_ROWS:
+        compiled = get_compiled_model(model)
+        if compiled is not None:
+            return compiled.predict(cars)
+    return model.predict(to_frame(cars))
+
+def missing_features(car: schemas.PredictionInputSchema) -> List[dict]:
+    # same shape as pydantic's errors so a batch row reports both kinds alike
+    return [{'type': 'missing', 'loc': (name,), 'msg': 'Field required'}
+            for name in REQUIRED_FEATURES if getattr(car, name) is None]
+
+def score_batch(batch: List[dict], model: Pipeline) -> List[schemas.BatchPredictionRowSchema]:
+    # rows are validated one by one, a bad row gets its errors back and the rest are still scored
+    if len(batch) > MAX_BATCH_PREDICTION_ROWS:
+        raise ValueError(f'batch too large, send at most {MAX_BATCH_PREDICTION_ROWS} cars per request')
+
+    rows, valid_cars, valid_idx = [], [], []
+    for idx, car in enumerate(batch):
+        try:
+            car = schemas.PredictionInputSchema.model_validate(car)
+        except ValidationError as e:
+            rows.append(schemas.BatchPredictionRowSchema(index=idx, errors=e.errors(include_url=False, include_context=False, include_input=False)))
+            continue
+        errors = missing_features(car)
+        rows.append(schemas.BatchPredictionRowSchema(index=idx, errors=errors or None))
+        if not errors:
+            valid_cars.append(car)
+            valid_idx.append(idx)
+
+    if not valid_cars:
+        return rows
+    try:
+        prices = batch_prediction(cars=valid_cars, model=model)
+    except Exception:
+        # like the batcher: one row the model rejects must not fail the rows it was sent with
+        for idx, car in zip(valid_idx, valid_cars):
+            try:
+                rows[idx].Price = round(float(batch_prediction(cars=[car], model=model)[0]), 2)
+            except Exception as e:
+                rows[idx].errors = [{'type': 'prediction_error', 'loc': (), 'msg': f'{type(e).__name__}: {e}'}]
+        return rows
+    for idx, price in zip(valid_idx, prices):
+        rows[idx].Price = round(float(price), 2)
+    return rows
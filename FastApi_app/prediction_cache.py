@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Optional
+from pydantic import BaseModel
+
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 10000))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv('PREDICTION_CACHE_TTL_SECONDS', 3600))
+
+
+def canonical_key(car: BaseModel, model_version: str) -> str:
+    # car is already validated, so names/colors/years are normalized before hashing
+    payload = json.dumps(car.model_dump(mode='json'), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f'{model_version}|{payload}'.encode()).hexdigest()
+
+
+class PredictionCache:
+    """
+    LRU + TTL cache of predicted prices, scoped to one model version.
+
+    Concurrent misses on the same key are single-flighted: the first caller
+    computes the price and the others wait for its result.
+    """
+
+    def __init__(self, max_entries: int = PREDICTION_CACHE_SIZE, ttl_seconds: float = PREDICTION_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.model_version = None
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits' : 0, 'misses' : 0, 'coalesced' : 0, 'evictions' : 0, 'expirations' : 0, 'invalidations' : 0}
+
+    def _check_version(self, model_version: str):
+        if model_version != self.model_version:
+            if self._entries:
+                self.stats['invalidations'] += 1
+            self._entries.clear()
+            self.model_version = model_version
+
+    def get_or_compute(self, car: BaseModel, model_version: Optional[str], compute: Callable[[], float]):
+        if self.max_entries <= 0 or model_version is None:
+            return compute()
+
+        key = canonical_key(car, model_version)
+        with self._lock:
+            self._check_version(model_version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if time.monotonic() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return value
+                del self._entries[key]
+                self.stats['expirations'] += 1
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                self.stats['misses'] += 1
+                future = self._inflight[key] = Future()
+            else:
+                self.stats['coalesced'] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            if model_version == self.model_version:
+                self._entries[key] = (value, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats['evictions'] += 1
+        future.set_result(value)
+        return value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses'] + self.stats['coalesced']
+            return {
+                'model_version' : self.model_version,
+                'entries' : len(self._entries),
+                'max_entries' : self.max_entries,
+                'ttl_seconds' : self.ttl,
+                'hit_ratio' : round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+                **self.stats,
+            }
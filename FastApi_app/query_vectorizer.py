@@ -0,0 +1,133 @@
+import math
+import numpy as np
+from typing import List
+from scipy import sparse
+from sklearn.compose import ColumnTransformer
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+from column_transformers import column_names, is_passthrough
+
+ONE_HOT, TFIDF, MIN_MAX, PASSTHROUGH = 'one_hot', 'tfidf', 'min_max', 'passthrough'
+# one-hot categories can hold NaN, which is not usable as a dict key
+_NAN = object()
+
+
+def _category_key(value):
+    return _NAN if isinstance(value, float) and math.isnan(value) else value
+
+def _field(car, name: str):
+    return car.get(name) if isinstance(car, dict) else getattr(car, name)
+
+
+class QueryVectorizer:
+    """
+    Plain-python version of the fitted recommendation ColumnTransformer.
+
+    One-hot columns become category -> output column dicts, tf-idf columns
+    the analyzer, vocabulary and idf array, min-max columns their scale and
+    offset. A `models.Car` or a dict goes straight to the sparse row
+    `transformer.transform` returns for it, without building a DataFrame.
+    """
+
+    def __init__(self, steps: List[tuple], n_features: int):
+        self.steps = steps
+        self.n_features = n_features
+
+    @classmethod
+    def from_column_transformer(cls, transformer: ColumnTransformer):
+        steps = []
+        for name, estimator, columns in transformer.transformers_:
+            if estimator == 'drop' or (not isinstance(columns, str) and len(columns) == 0):
+                continue
+            columns = column_names(transformer, [columns] if isinstance(columns, str) else columns)
+            start = transformer.output_indices_[name].start
+            if isinstance(estimator, OneHotEncoder):
+                infrequent = getattr(estimator, 'infrequent_categories_', None) or []
+                if estimator.drop is not None or any(categories is not None for categories in infrequent):
+                    raise ValueError(f'Cannot compile one-hot step {name!r} with dropped or infrequent categories')
+                offset = start
+                for column, categories in zip(columns, estimator.categories_):
+                    lookup = {_category_key(category): offset + i for i, category in enumerate(categories)}
+                    steps.append((ONE_HOT, column, lookup, estimator.handle_unknown))
+                    offset += len(categories)
+            elif isinstance(estimator, TfidfVectorizer):
+                if estimator.binary or estimator.norm not in ('l2', None):
+                    raise ValueError(f'Cannot compile tf-idf step {name!r} with binary={estimator.binary}, norm={estimator.norm}')
+                idf = estimator.idf_ if estimator.use_idf else None
+                steps.append((TFIDF, columns[0], (start, estimator.build_analyzer(), estimator.vocabulary_, idf,
+                                                  estimator.norm, estimator.sublinear_tf), None))
+            elif isinstance(estimator, MinMaxScaler):
+                clip = estimator.feature_range if estimator.clip else None
+                for i, column in enumerate(columns):
+                    steps.append((MIN_MAX, column, (start + i, estimator.scale_[i], estimator.min_[i]), clip))
+            elif is_passthrough(estimator):
+                for i, column in enumerate(columns):
+                    steps.append((PASSTHROUGH, column, start + i, None))
+            else:
+                raise ValueError(f'Cannot compile transformer {name!r} of type {type(estimator).__name__}')
+        return cls(steps=steps, n_features=int(sum(s.stop - s.start for s in transformer.output_indices_.values())))
+
+    @staticmethod
+    def _tfidf(text, params) -> tuple:
+        start, analyzer, vocabulary, idf, norm, sublinear_tf = params
+        if text is None:
+            raise ValueError('np.nan is an invalid document, expected byte or unicode string.')
+        counts = {}
+        for token in analyzer(text):
+            if token in vocabulary:
+                counts[vocabulary[token]] = counts.get(vocabulary[token], 0) + 1
+        terms = sorted(counts)
+        values = [float(counts[term]) for term in terms]
+        if sublinear_tf:
+            values = [math.log(value) + 1.0 for value in values]
+        if idf is not None:
+            values = [value * idf[term] for value, term in zip(values, terms)]
+        if norm == 'l2':
+            # accumulated in column order like sklearn's inplace_csr_row_normalize_l2
+            total = 0.0
+            for value in values:
+                total += value * value
+            if total != 0.0:
+                total = math.sqrt(total)
+                values = [value / total for value in values]
+        return [start + term for term in terms], values
+
+    def categories(self, field: str) -> set:
+        """Categories the one-hot step of `field` was fit on, empty when `field` is not one-hot encoded."""
+        return {key for kind, name, params, _ in self.steps if kind == ONE_HOT and name == field for key in params}
+
+    def transform(self, cars: list, ignore_unknown: bool = False) -> sparse.csr_matrix:
+        """`ignore_unknown` leaves unseen categories as all-zero blocks even where the encoder would raise."""
+        indptr, indices, data = [0], [], []
+        for car in cars:
+            for kind, field, params, extra in self.steps:
+                value = _field(car, field)
+                if kind == ONE_HOT:
+                    column = params.get(_category_key(value))
+                    if column is not None:
+                        indices.append(column)
+                        data.append(1.0)
+                    elif extra == 'error' and not ignore_unknown:
+                        raise ValueError(f'Found unknown categories [{value!r}] in column {field!r} during transform')
+                elif kind == TFIDF:
+                    columns, values = self._tfidf(value, params)
+                    indices.extend(columns)
+                    data.extend(values)
+                else:
+                    value = np.nan if value is None else float(value)
+                    if kind == MIN_MAX:
+                        column, scale, offset = params
+                        value = value * scale + offset
+                        if extra is not None:
+                            value = min(max(value, extra[0]), extra[1])
+                    else:
+                        column = params
+                    # zeros are not stored, as in the hstack of the dense blocks
+                    if value != 0.0:
+                        indices.append(column)
+                        data.append(value)
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix((np.array(data, dtype=np.float64), np.array(indices, dtype=np.int32), np.array(indptr)),
+                                   shape=(len(cars), self.n_features))
+        matrix.sort_indices()
+        return matrix
@@ -1,40 +1,388 @@
-import pandas as pd
+import os
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from load_recommendation_artifacts import load_artifacts
-
-df, transformer = None, None
-
-def recommend_car_idx(input_car, k=5):
-    input_car = pd.DataFrame(data=[{
-        'Brand_Name' : input_car.Brand_Name,
-        'Stock_Type' : input_car.Stock_Type,
-        'Drivetrain' : input_car.Drivetrain,
-        'Fuel_Type' : input_car.Fuel_Type,
-        'One_Owner_Vehicle' : input_car.One_Owner_Vehicle,
-        'Personal_Use_Only' : input_car.Personal_Use_Only,
-        'Gear_Spec' : input_car.Gear_Spec,
-        'Cylinder_Config': input_car.Cylinder_Config,
-        'Valves' : input_car.Valves,
-        'ST' : input_car.ST,
-        'Model_Name' : input_car.Model_Name,
-        'Seller_Name' : input_car.Seller_Name,
-        'Model_Year' : input_car.Model_Year,
-        'Mileage' : input_car.Mileage,
-        'Price' : input_car.Price,
-        'Km_per_l' : input_car.Km_per_l,
-        'Dc_Fast_Charging' : input_car.Dc_Fast_Charging,
-        'Battery_Capacity' : input_car.Battery_Capacity,
-        'Expected_Range' : input_car.Expected_Range,
-        'Engine_Size' : input_car.Engine_Size,
-        'Km_L_e_City' : input_car.Km_L_e_City,
-        'Km_L_e_Hwy' : input_car.Km_L_e_Hwy,
-        'Accidents_Or_Damage' : input_car.Accidents_Or_Damage,
-        'Clean_Title' : input_car.Clean_Title
-    }])
-    global df, transformer
-    if (df == None) & (transformer == None):
-        df, transformer = load_artifacts()
-    similarity_matrix = cosine_similarity(transformer.transform(input_car), df)
-    idx = np.argsort(similarity_matrix.ravel())[-k-1:][::-1][1:]
-    return [int(id_) for id_ in idx] # convert np.int to int
\ No newline at end of file
+import pandas as pd
+import threading
+from types import SimpleNamespace
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from ann_index import IVFIndex
+from attribute_index import FILTER_FIELDS, PRICE_FIELD, AttributeIndex
+from column_transformers import one_hot_categories
+from comparables import spec_car
+from live_catalog import LiveCatalog
+from load_recommendation_artifacts import current_build, load_ann_artifact, load_artifacts, load_embedding_index, load_matrix_store, load_neighbor_table, load_transformer, prune_builds
+from query_vectorizer import QueryVectorizer
+from neighbor_table import normalized_query, normalized_rows, similarity_scores, top_k_indices
+
+# catalogs smaller than this are always searched exactly
+ANN_MIN_ROWS = int(os.getenv('ANN_MIN_ROWS', 200000))
+ANN_NPROBE = int(os.getenv('ANN_NPROBE', 16))
+# 'sparse' scores the transformer output directly, 'embedding' uses the offline TruncatedSVD embedding
+RECOMMENDATION_MODE = os.getenv('RECOMMENDATION_MODE', 'sparse')
+# how often a process checks for a newly published build, under gunicorn the master checks instead
+RECOMMENDATION_REFRESH_SECONDS = float(os.getenv('RECOMMENDATION_REFRESH_SECONDS', 300))
+# 'mmap' serves the float32 memory-mapped matrix shared by the workers, 'npz' loads a float64 copy per worker
+RECOMMENDATION_MATRIX_FORMAT = os.getenv('RECOMMENDATION_MATRIX_FORMAT', 'mmap')
+# 'compiled' builds query rows with QueryVectorizer, 'pandas' always goes through a DataFrame and the transformer
+QUERY_VECTORIZER = os.getenv('QUERY_VECTORIZER', 'compiled')
+# memory for one block of dense batch scores (block rows x catalog rows, float64)
+RECOMMENDATION_BATCH_BLOCK_MB = float(os.getenv('RECOMMENDATION_BATCH_BLOCK_MB', 64))
+
+df, transformer, neighbor_table = None, None, None
+query_vectorizer = None
+# catalog rows l2 normalized once, transposed a query is scored by a single sparse product,
+# memory-mapped float32 rows are scored in place with a matrix-vector product instead
+normalized, normalized_t = None, None
+ivf_index = None
+embedding_index = None
+attribute_index = None
+# catalog writes made in this process since the build was loaded
+live_catalog = None
+# the published build everything above was loaded from, see load_recommendation_artifacts.current_build
+loaded_build = None
+artifacts_lock = threading.Lock()
+catalog_lock = threading.Lock()
+
+# columns of the recommendation transformer, in the order src/recommendation/build_index.py fits it on
+CAR_FIELDS = ['Brand_Name', 'Stock_Type', 'Drivetrain', 'Fuel_Type', 'One_Owner_Vehicle', 'Personal_Use_Only',
+              'Gear_Spec', 'Cylinder_Config', 'Valves', 'ST', 'Model_Name', 'Seller_Name', 'Model_Year', 'Mileage',
+              'Price', 'Km_per_l', 'Dc_Fast_Charging', 'Battery_Capacity', 'Expected_Range', 'Engine_Size',
+              'Km_L_e_City', 'Km_L_e_Hwy', 'Accidents_Or_Damage', 'Clean_Title']
+
+def load_state(build):
+    """Every in-memory structure for one published build, loaded next to the one being served."""
+    store = load_matrix_store(build) if RECOMMENDATION_MATRIX_FORMAT == 'mmap' else None
+    if store is None:
+        matrix, fitted = load_artifacts(build)
+        matrix_normalized, prices = normalized_rows(matrix), None
+    else:
+        matrix, matrix_normalized, prices = store['matrix'], store['normalized'], store['prices']
+        fitted = load_transformer(build)
+    state = {
+        'build' : build,
+        'df' : matrix,
+        'transformer' : fitted,
+        'normalized' : matrix_normalized,
+        'normalized_t' : None,
+        'neighbor_table' : load_neighbor_table(build),
+        'embedding_index' : load_embedding(matrix, build) if RECOMMENDATION_MODE == 'embedding' else None,
+        'ivf_index' : None,
+        'attribute_index' : AttributeIndex.from_matrix(matrix, fitted, prices=prices),
+        'query_vectorizer' : compile_vectorizer(fitted) if QUERY_VECTORIZER == 'compiled' else None,
+        'live_catalog' : LiveCatalog(matrix),
+    }
+    if state['embedding_index'] is None:
+        state['ivf_index'] = load_ivf_index(matrix, build)
+    if state['embedding_index'] is None and state['ivf_index'] is None and store is None:
+        state['normalized_t'] = matrix_normalized.T.tocsr()
+    return state
+
+def install(state):
+    global df, transformer, query_vectorizer, neighbor_table, normalized, normalized_t, ivf_index, embedding_index, attribute_index, live_catalog, loaded_build
+    df, normalized, normalized_t = state['df'], state['normalized'], state['normalized_t']
+    neighbor_table, ivf_index, embedding_index = state['neighbor_table'], state['ivf_index'], state['embedding_index']
+    attribute_index, query_vectorizer, live_catalog = state['attribute_index'], state['query_vectorizer'], state['live_catalog']
+    loaded_build = state['build']
+    # set last, artifacts_loaded() is true once everything else is in place
+    transformer = state['transformer']
+
+def get_artifacts():
+    if transformer is None:
+        with artifacts_lock:
+            if transformer is None:
+                install(load_state(current_build()))
+    return df, transformer
+
+def artifacts_loaded():
+    return transformer is not None
+
+def artifacts_build():
+    return None if loaded_build is None else loaded_build['build_id']
+
+def check_for_new_build():
+    """Load and swap in the build the pointer names if it is not the one being served. Returns its id or None."""
+    if not artifacts_loaded():
+        return None
+    build = current_build()
+    if build['build_id'] is None or build['build_id'] == artifacts_build():
+        return None
+    # everything is loaded next to the served build, requests keep using the old one meanwhile
+    state = load_state(build)
+    with catalog_lock:
+        # writes made after the build read the catalog may be missing from it, they are applied again
+        for row, source in live_catalog.writes_since(build.get('built_at')):
+            try:
+                if source is None:
+                    state['live_catalog'].delete(row)
+                else:
+                    vector = transform_cars([source], state['query_vectorizer'], state['transformer'])
+                    state['live_catalog'].upsert(row, vector, car_attributes(source), source=source)
+            except Exception as e:
+                print(f'Could not carry car {row} over to build {build["build_id"]}: {type(e).__name__}: {e}')
+        old_build = artifacts_build()
+        install(state)
+    prune_builds(keep=[build['build_id'], old_build])
+    print(f'Recommendation build {old_build} replaced by {build["build_id"]}')
+    return build['build_id']
+
+def refresh_periodically(interval_seconds: float, stop_event: threading.Event, on_swap=None):
+    while not stop_event.wait(interval_seconds):
+        try:
+            build_id = check_for_new_build()
+        except Exception as e:
+            print(f'Recommendation refresh failed: {type(e).__name__}: {e}')
+            continue
+        if build_id is not None and on_swap is not None:
+            on_swap(build_id)
+
+def start_refresher(interval_seconds: float = RECOMMENDATION_REFRESH_SECONDS, on_swap=None):
+    stop_event = threading.Event()
+    thread = threading.Thread(target=refresh_periodically, args=(interval_seconds, stop_event, on_swap), name='recommendation-refresher', daemon=True)
+    thread.start()
+    return stop_event
+
+def load_ivf_index(matrix, build=None):
+    if matrix.shape[0] < ANN_MIN_ROWS:
+        return None
+    index = load_ann_artifact(build)
+    if index is None:
+        return None
+    try:
+        return IVFIndex(index, matrix, n_probe=ANN_NPROBE)
+    except ValueError as e:
+        print(f'ANN index does not match the recommendation matrix, using exact search: {e}')
+        return None
+
+def load_embedding(matrix, build=None):
+    index = load_embedding_index(build)
+    if index is not None and index.n_rows != matrix.shape[0]:
+        print(f'Embedding covers {index.n_rows} rows but the matrix has {matrix.shape[0]}, using the sparse matrix')
+        return None
+    return index
+
+def compile_vectorizer(transformer):
+    try:
+        return QueryVectorizer.from_column_transformer(transformer)
+    except Exception as e:
+        print(f'Compiled query vectorizer unavailable, using the transformer: {type(e).__name__}: {e}')
+        return None
+
+def transform_cars(cars, vectorizer, fitted_transformer):
+    # one sparse row per car, straight from the ORM objects when the transformer could be compiled
+    if vectorizer is not None:
+        return vectorizer.transform(cars)
+    return fitted_transformer.transform(cars_frame(cars))
+
+def vectorize(cars):
+    return transform_cars(cars, query_vectorizer, transformer)
+
+def cars_frame(cars):
+    return pd.DataFrame(data=[{field: getattr(car, field) for field in CAR_FIELDS} for car in cars])
+
+def car_source(car):
+    # plain copy of what the car's row is built from, an ORM object expires once its session is closed
+    return SimpleNamespace(id=car.id, **{field: getattr(car, field) for field in CAR_FIELDS})
+
+def car_attributes(car) -> dict:
+    return {field: getattr(car, field) for field in FILTER_FIELDS + [PRICE_FIELD]}
+
+def merge_top_k(ids_a, scores_a, ids_b, scores_b, k):
+    ids, scores = np.concatenate([ids_a, ids_b]).astype(np.int64), np.concatenate([scores_a, scores_b])
+    return ids[top_k_indices(scores, k, ids=ids)]
+
+def pending_scores(snapshot, query):
+    # rows written since the build was loaded, scored the same way as the base rows
+    if embedding_index is not None:
+        if 'embeddings' not in snapshot:
+            snapshot['embeddings'] = np.array([embedding_index.embed(snapshot['matrix'][i:i + 1]) for i in range(len(snapshot['ids']))],
+                                              dtype=np.float32).reshape(len(snapshot['ids']), embedding_index.n_components)
+        return snapshot['embeddings'] @ embedding_index.embed(query)
+    return snapshot['normalized'] @ normalized_query(query)
+
+def table_idx(row, k, snapshot):
+    # table neighbors minus changed rows, merged with the rewritten rows scored against the car's stored vector
+    neighbors = np.asarray(neighbor_table.indices[row], dtype=np.int64)
+    keep = ~np.isin(neighbors, snapshot['dead'])
+    ids, scores = neighbors[keep], np.asarray(neighbor_table.scores[row])[keep]
+    if len(ids) < k:
+        return None
+    if not len(snapshot['ids']):
+        return ids[:k]
+    car_vector = normalized[row].toarray().ravel()
+    changed_scores = snapshot['normalized'] @ car_vector
+    return merge_top_k(ids, scores, snapshot['ids'], changed_scores.astype(np.float32), k)
+
+def filtered_idx(query, k, exclude_row, filters, min_price, max_price, snapshot):
+    # similarity is computed over the rows passing the filters only
+    candidates = attribute_index.candidates(filters, min_price=min_price, max_price=max_price)
+    candidates = np.setdiff1d(candidates, snapshot['dead'], assume_unique=True)
+    if exclude_row is not None:
+        candidates = candidates[candidates != exclude_row]
+    if embedding_index is not None:
+        scores = embedding_index.embeddings[candidates] @ embedding_index.embed(query)
+    else:
+        scores = normalized[candidates] @ normalized_query(query).astype(normalized.dtype)
+    pending = np.array([i for i, (row, attributes) in enumerate(zip(snapshot['ids'], snapshot['attributes']))
+                        if row != exclude_row and AttributeIndex.matches(attributes, filters, min_price, max_price)], dtype=np.int64)
+    return merge_top_k(candidates, scores, snapshot['ids'][pending], pending_scores(snapshot, query)[pending], k)
+
+def exact_scores(query):
+    if normalized_t is not None:
+        return similarity_scores(query, normalized_t)
+    # same sums as the transposed product, kept in the matrix dtype so the mapped rows are not copied
+    return normalized @ normalized_query(query).astype(normalized.dtype)
+
+def search_idx(query, k, snapshot):
+    if embedding_index is None and ivf_index is not None:
+        ids, scores = ivf_index.search(query, k + len(snapshot['dead']))
+        keep = ~np.isin(ids, snapshot['dead'])
+        ids, scores = ids[keep][:k], scores[keep][:k]
+    else:
+        scores = embedding_index.scores(query) if embedding_index is not None else exact_scores(query)
+        scores[snapshot['dead']] = -np.inf
+        ids = top_k_indices(scores, k)
+        ids = ids[np.isfinite(scores[ids])]
+        scores = scores[ids]
+    return merge_top_k(ids, scores, snapshot['ids'], pending_scores(snapshot, query), k)
+
+def recommend_car_idx(input_car, k=5, filters=None, min_price=None, max_price=None):
+    get_artifacts()
+    snapshot = live_catalog.snapshot()
+    filtered = bool(filters) or min_price is not None or max_price is not None
+    row = getattr(input_car, 'id', None)
+    if not filtered and table_usable(row, k):
+        idx = table_idx(row, k, snapshot)
+        if idx is not None:
+            return [int(id_) for id_ in idx]
+
+    query = vectorize([input_car])
+    if filtered:
+        idx = filtered_idx(query, k, row, filters, min_price, max_price, snapshot)
+    else:
+        # same order as a stable argsort of the scores, the best match is the car itself
+        idx = without_car(search_idx(query, k + 1, snapshot), row, k)
+    return [int(id_) for id_ in idx] # convert np.int to int
+
+def comparable_car_idx(spec, price, k=5):
+    """Catalog cars closest to specs entered for a price prediction, priced at the predicted `price`."""
+    get_artifacts()
+    if query_vectorizer is not None:
+        # unknown spellings only drop out of the similarity instead of failing the lookup
+        query = query_vectorizer.transform([spec_car(spec, price, query_vectorizer.categories)], ignore_unknown=True)
+    else:
+        # respelled the same way, but the transformer raises on a category it was not fit on and
+        # the predict page then shows crud.similar_cars, see RecommendationBudget
+        categories = one_hot_categories(transformer)
+        query = transformer.transform(pd.DataFrame([spec_car(spec, price, lambda field: categories.get(field, set()))]))
+    return [int(id_) for id_ in search_idx(query, k, live_catalog.snapshot())]
+
+def profile_row(car):
+    """l2 normalized matrix row of a viewed car, so every view adds the same weight to a visitor profile."""
+    get_artifacts()
+    row, kept = query_rows([car], live_catalog.snapshot())
+    if not kept:
+        raise ValueError(f'Car {car.id} has no matrix row in this build')
+    return normalize(row, norm='l2')
+
+def profile_car_idx(profile, viewed, k=5):
+    """Cars closest to a visitor profile row, leaving out the cars already viewed."""
+    get_artifacts()
+    viewed = set(viewed)
+    idx = search_idx(profile, k + len(viewed), live_catalog.snapshot())
+    return [int(id_) for id_ in idx if int(id_) not in viewed][:k]
+
+def table_usable(row, k):
+    # matrix rows line up with car ids, listed cars are answered from the precomputed table
+    return neighbor_table is not None and row is not None and neighbor_table.covers(row, k) \
+        and row not in live_catalog.dead
+
+def without_car(idx, row, k):
+    # a freshly written duplicate can outrank the car, so its own row is dropped when known
+    return idx[idx != row][:k] if row is not None and row in idx else idx[1:]
+
+def query_rows(cars, snapshot):
+    """
+    Matrix rows of the cars, and the positions of the cars they belong to.
+
+    Stored rows are used where the matrix has them and the rest are
+    vectorized together. When the vectorizer rejects that group (a brand or
+    spec the build has not seen) they are vectorized one at a time, and the
+    cars it still rejects are left out.
+    """
+    pending = {int(row): i for i, row in enumerate(snapshot['ids'])}
+    rows, unknown = [None] * len(cars), []
+    for i, car in enumerate(cars):
+        if car.id in pending:
+            rows[i] = snapshot['matrix'][pending[car.id]]
+        elif car.id < df.shape[0] and car.id not in live_catalog.dead:
+            rows[i] = df[car.id]
+        else:
+            unknown.append(i)
+    if unknown:
+        try:
+            transformed = sparse.csr_matrix(vectorize([cars[i] for i in unknown]))
+            for position, i in enumerate(unknown):
+                rows[i] = transformed[position]
+        except Exception:
+            for i in unknown:
+                try:
+                    rows[i] = sparse.csr_matrix(vectorize([cars[i]]))
+                except Exception as e:
+                    print(f'Car {cars[i].id} has no matrix row in this build: {type(e).__name__}: {e}')
+    kept = [i for i, row in enumerate(rows) if row is not None]
+    if not kept:
+        return None, kept
+    return sparse.vstack([sparse.csr_matrix(rows[i]) for i in kept], format='csr'), kept
+
+def search_many(queries, k, snapshot):
+    """search_idx for every row of `queries`, exact scores come from one sparse product per block of rows."""
+    if embedding_index is None and ivf_index is not None:
+        return [search_idx(queries[i:i + 1], k, snapshot) for i in range(queries.shape[0])]
+    n_rows = normalized.shape[0]
+    block_rows = max(1, int(RECOMMENDATION_BATCH_BLOCK_MB * 2 ** 20 // (8 * n_rows)))
+    results = []
+    for start in range(0, queries.shape[0], block_rows):
+        block = queries[start:start + block_rows]
+        if embedding_index is not None:
+            embedded = np.array([embedding_index.embed(block[i:i + 1]) for i in range(block.shape[0])])
+            scores = embedded @ embedding_index.embeddings.T
+        else:
+            # (rows x features) @ (features x block): every query row scored against the whole catalog at once
+            scores = np.ascontiguousarray((normalized @ normalize(block, norm='l2').toarray().T.astype(normalized.dtype)).T)
+        scores[:, snapshot['dead']] = -np.inf
+        for i in range(block.shape[0]):
+            ids = top_k_indices(scores[i], k)
+            ids = ids[np.isfinite(scores[i][ids])]
+            results.append(merge_top_k(ids, scores[i][ids], snapshot['ids'], pending_scores(snapshot, block[i:i + 1]), k))
+    return results
+
+def recommend_batch(cars, k=5) -> dict:
+    """
+    {car id: recommended car ids} for many cars, same results as recommend_car_idx per car.
+
+    A car the vectorizer cannot place has no entry, the caller falls back for it.
+    """
+    get_artifacts()
+    snapshot = live_catalog.snapshot()
+    recommendations, searched = {}, []
+    for car in cars:
+        idx = table_idx(car.id, k, snapshot) if table_usable(car.id, k) else None
+        if idx is None:
+            searched.append(car)
+        else:
+            recommendations[car.id] = [int(id_) for id_ in idx]
+    if searched:
+        queries, kept = query_rows(searched, snapshot)
+        if kept:
+            for i, idx in zip(kept, search_many(queries, k + 1, snapshot)):
+                recommendations[searched[i].id] = [int(id_) for id_ in without_car(idx, searched[i].id, k)]
+    return recommendations
+
+def on_car_write(action, car_id, car=None):
+    # crud write hook: the changed car is transformed alone and overlays the loaded matrix until the next build
+    get_artifacts()
+    with catalog_lock:
+        if action == 'delete':
+            live_catalog.delete(car_id)
+        else:
+            live_catalog.upsert(car_id, vectorize([car]), car_attributes(car), source=car_source(car))
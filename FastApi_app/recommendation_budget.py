@@ -0,0 +1,105 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Callable, Optional
+
+RECOMMENDATION_BUDGET_MS = float(os.getenv('RECOMMENDATION_BUDGET_MS', 150))
+RECOMMENDATION_BUDGET_WORKERS = int(os.getenv('RECOMMENDATION_BUDGET_WORKERS', 4))
+PATHS = ['model', 'not_loaded', 'timeout', 'saturated', 'error']
+
+
+class RecommendationBudget:
+    """
+    Runs `recommend_fn` for a page under a time budget.
+
+    `recommend` returns the recommended ids, or None when the caller should
+    use its cheap fallback instead: the artifacts are not loaded yet (their
+    load is then started in the background, never on the request), the
+    search did not finish within `budget_ms`, every worker is still busy
+    with searches that ran over, or the search failed. A search that ran
+    over is not cancelled, it finishes on its worker and is discarded.
+    """
+
+    def __init__(self, recommend_fn: Callable, is_loaded_fn: Callable[[], bool], load_fn: Callable[[], object],
+                 budget_ms: float = RECOMMENDATION_BUDGET_MS, workers: int = RECOMMENDATION_BUDGET_WORKERS):
+        self.recommend_fn = recommend_fn
+        self.is_loaded_fn = is_loaded_fn
+        self.load_fn = load_fn
+        self.budget = budget_ms / 1000
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._loader = None
+        self._running = 0
+        self.stats = {path: 0 for path in PATHS}
+
+    def _record(self, path: str):
+        with self._lock:
+            self.stats[path] += 1
+
+    def _load(self):
+        try:
+            self.load_fn()
+        except Exception as e:
+            print(f'Background recommendation artifact load failed: {type(e).__name__}: {e}')
+
+    def _start_load(self):
+        with self._lock:
+            if self._loader is None or not self._loader.is_alive():
+                self._loader = threading.Thread(target=self._load, name='recommendation-loader', daemon=True)
+                self._loader.start()
+
+    def _submit(self, *args, **kwargs):
+        with self._lock:
+            # created lazily (and again after fork) since threads do not survive os.fork
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor_pid = os.getpid()
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='recommendation')
+                self._running = 0
+            if self._running >= self.workers:
+                return None
+            self._running += 1
+        future = self._executor.submit(self.recommend_fn, *args, **kwargs)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, _future):
+        with self._lock:
+            self._running -= 1
+
+    def recommend(self, *args, **kwargs) -> Optional[list]:
+        if not self.is_loaded_fn():
+            self._start_load()
+            self._record('not_loaded')
+            return None
+        try:
+            if self.budget <= 0:
+                idx = self.recommend_fn(*args, **kwargs)
+            else:
+                future = self._submit(*args, **kwargs)
+                if future is None:
+                    self._record('saturated')
+                    return None
+                idx = future.result(timeout=self.budget)
+        except TimeoutError:
+            self._record('timeout')
+            return None
+        except Exception as e:
+            print(f'Recommendation failed, using the fallback: {type(e).__name__}: {e}')
+            self._record('error')
+            return None
+        self._record('model')
+        return idx
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            requests = sum(self.stats.values())
+            return {
+                'budget_ms' : self.budget * 1000,
+                'workers' : self.workers,
+                'running' : self._running,
+                'requests' : requests,
+                'fallback_ratio' : round(1 - self.stats['model'] / requests, 4) if requests else 0.0,
+                **self.stats,
+            }
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field, field_validator, computed_field, StrictInt, EmailStr, Json
 from fastapi import Form
 from typing import Annotated, Optional, Literal
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class CarBase(BaseModel):
@@ -55,8 +55,44 @@ class CarBase(BaseModel):
     LONG: Annotated[Optional[float], Field(default=None, description='Longitude of dealer location')]
 
 
-class CarOut(CarBase):
+class CarOut(BaseModel):
+    # a Car row as stored, typed like the table columns rather than the stricter CarBase input checks
     id: Annotated[int, Field(..., description='id of Car')]
+    Model_Year: Annotated[Optional[int], Field(default=None)]
+    Brand_Name: Annotated[Optional[str], Field(default=None)]
+    Model_Name: Annotated[Optional[str], Field(default=None)]
+    Image_List: Annotated[Optional[List[str]], Field(default=None)]
+    Stock_Type: Annotated[Optional[str], Field(default=None)]
+    Mileage: Annotated[Optional[float], Field(default=None)]
+    Price: Annotated[Optional[float], Field(default=None)]
+    Exterior_Color: Annotated[Optional[str], Field(default=None)]
+    Interior_Color: Annotated[Optional[str], Field(default=None)]
+    Drivetrain: Annotated[Optional[str], Field(default=None)]
+    Km_per_l: Annotated[Optional[float], Field(default=None)]
+    Fuel_Type: Annotated[Optional[str], Field(default=None)]
+    Accidents_Or_Damage: Annotated[Optional[bool], Field(default=None)]
+    Clean_Title: Annotated[Optional[bool], Field(default=None)]
+    One_Owner_Vehicle: Annotated[Optional[str], Field(default=None)]
+    Personal_Use_Only: Annotated[Optional[str], Field(default=None)]
+    Level2_Charging: Annotated[Optional[float], Field(default=None)]
+    Dc_Fast_Charging: Annotated[Optional[float], Field(default=None)]
+    Battery_Capacity: Annotated[Optional[float], Field(default=None)]
+    Expected_Range: Annotated[Optional[float], Field(default=None)]
+    Gear_Spec: Annotated[Optional[str], Field(default=None)]
+    Engine_Size: Annotated[Optional[float], Field(default=None)]
+    Cylinder_Config: Annotated[Optional[str], Field(default=None)]
+    Valves: Annotated[Optional[str], Field(default=None)]
+    Seller_Site: Annotated[Optional[str], Field(default=None)]
+    Seller_Name: Annotated[Optional[str], Field(default=None)]
+    Km_L_e_City: Annotated[Optional[float], Field(default=None)]
+    Km_L_e_Hwy: Annotated[Optional[float], Field(default=None)]
+    Street_Address: Annotated[Optional[str], Field(default=None)]
+    ZIP: Annotated[Optional[str], Field(default=None)]
+    City: Annotated[Optional[str], Field(default=None)]
+    STATE: Annotated[Optional[str], Field(default=None)]
+    ST: Annotated[Optional[str], Field(default=None)]
+    lat: Annotated[Optional[float], Field(default=None)]
+    LONG: Annotated[Optional[float], Field(default=None)]
 
     class Config:
         from_attributes = True
@@ -187,3 +223,19 @@ class PredictionInputSchema(BaseModel):
 
 class PredictionOutputSchema(BaseModel):
     Price: Annotated[float, Field(..., description='Price of model predicted by ML algo')]
+
+class BatchPredictionRowSchema(BaseModel):
+    index: Annotated[int, Field(..., description='position of the car in the request list')]
+    Price: Annotated[Optional[float], Field(default=None, description='Predicted price, null if the row failed validation')]
+    errors: Annotated[Optional[List[dict]], Field(default=None, description='validation errors of the row')]
+
+class BatchPredictionOutputSchema(BaseModel):
+    predictions: Annotated[List[BatchPredictionRowSchema], Field(..., description='one entry per input car, in input order')]
+
+class BatchRecommendationInputSchema(BaseModel):
+    car_ids: Annotated[List[int], Field(..., min_length=1, description='ids of the cars to find similar cars for', examples=[[1, 2, 3]])]
+    k: Annotated[int, Field(default=5, ge=1, le=50, description='number of recommendations per car')]
+
+class BatchRecommendationOutputSchema(BaseModel):
+    recommendations: Annotated[Dict[int, List[CarOut]], Field(..., description='similar cars per requested car id, best match first')]
+    missing: Annotated[List[int], Field(default=[], description='requested ids that are not in the catalog')]
@@ -0,0 +1,117 @@
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Optional
+import numpy as np
+from scipy import sparse
+
+SESSION_PROFILE_MAX_SESSIONS = int(os.getenv('SESSION_PROFILE_MAX_SESSIONS', 10000))
+# each view weighs this much more than the one before, recent views steer the profile
+SESSION_PROFILE_GROWTH = float(os.getenv('SESSION_PROFILE_GROWTH', 1.25))
+SESSION_PROFILE_MAX_VIEWED = int(os.getenv('SESSION_PROFILE_MAX_VIEWED', 50))
+# weights are brought back to 1 before they can overflow
+MAX_WEIGHT = 1e150
+# user agents that never get a session, each new one would push a real visitor's profile out of the LRU
+BOT_USER_AGENTS = re.compile(
+    os.getenv('BOT_USER_AGENTS', r'bot|crawl|spider|slurp|preview|monitor|curl|wget|python-requests|headless'), re.IGNORECASE
+)
+
+
+def is_page_view(method: str, user_agent: str) -> bool:
+    """A browser loading a page, not a HEAD check, a crawler or a client without a user agent."""
+    return method == 'GET' and bool(user_agent) and BOT_USER_AGENTS.search(user_agent) is None
+
+
+class SessionProfile:
+    def __init__(self, n_features: int, max_viewed: int):
+        self.n_features = n_features
+        self.vector = {}
+        self.weight = 1.0
+        self.views = 0
+        self.viewed = deque(maxlen=max_viewed)
+
+
+class SessionProfiles:
+    """
+    Per-visitor profiles for "recommended for you", an LRU of at most `max_sessions` sessions.
+
+    A profile is the weighted sum of the l2 normalized matrix rows of the
+    cars the visitor viewed, kept as a sparse {column: value} dict. Cosine
+    scoring ignores the scale of the query, so the sum points the same way
+    as the weighted centroid and is never divided by the total weight. With
+    view t weighted growth**t, older views decay without touching the
+    stored sum: a view only adds its own non zeros. The rare rescale that
+    keeps the weights finite is the one step proportional to the profile.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_PROFILE_MAX_SESSIONS, growth: float = SESSION_PROFILE_GROWTH,
+                 max_viewed: int = SESSION_PROFILE_MAX_VIEWED):
+        self.max_sessions = max_sessions
+        self.growth = growth
+        self.max_viewed = max_viewed
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'views' : 0, 'repeat_views' : 0, 'new_sessions' : 0, 'evictions' : 0, 'resets' : 0}
+
+    def record_view(self, session_id: str, car_id: int, row) -> None:
+        row = sparse.csr_matrix(row)
+        with self._lock:
+            profile = self._profiles.get(session_id)
+            if profile is not None and profile.n_features != row.shape[1]:
+                # the recommendation transformer changed, the old profile lives in another feature space
+                profile = None
+                self.stats['resets'] += 1
+            if profile is None:
+                profile = self._profiles[session_id] = SessionProfile(row.shape[1], self.max_viewed)
+                self.stats['new_sessions'] += 1
+            self._profiles.move_to_end(session_id)
+            self.stats['views'] += 1
+            # a reload of the same page is not a new signal
+            if profile.viewed and profile.viewed[-1] == car_id:
+                self.stats['repeat_views'] += 1
+                return
+
+            vector, weight = profile.vector, profile.weight
+            for column, value in zip(row.indices.tolist(), row.data.tolist()):
+                vector[column] = vector.get(column, 0.0) + weight * value
+            profile.weight *= self.growth
+            if profile.weight > MAX_WEIGHT:
+                for column in vector:
+                    vector[column] /= profile.weight
+                profile.weight = 1.0
+            profile.views += 1
+            profile.viewed.append(car_id)
+
+            while len(self._profiles) > self.max_sessions:
+                self._profiles.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def query(self, session_id: str) -> Optional[tuple]:
+        """(1 x features profile row, viewed car ids) of the session, None for a session without views."""
+        with self._lock:
+            profile = self._profiles.get(session_id)
+            if profile is None or not profile.vector:
+                return None
+            self._profiles.move_to_end(session_id)
+            columns = np.fromiter(profile.vector.keys(), dtype=np.int32, count=len(profile.vector))
+            values = np.fromiter(profile.vector.values(), dtype=np.float64, count=len(profile.vector))
+            viewed = list(profile.viewed)
+            n_features = profile.n_features
+        order = np.argsort(columns)
+        row = sparse.csr_matrix((values[order], columns[order], np.array([0, len(columns)])), shape=(1, n_features))
+        return row, viewed
+
+    def views(self, session_id: str) -> int:
+        with self._lock:
+            profile = self._profiles.get(session_id)
+            return 0 if profile is None else profile.views
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'sessions' : len(self._profiles),
+                'max_sessions' : self.max_sessions,
+                'growth' : self.growth,
+                **self.stats,
+            }
@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+import schemas, models
+from database import SessionLocal
+from load_model import load_model
+from prediction import batch_prediction
+from recommend import get_artifacts, recommend_car_idx
+
+WARMUP_RETRY_SECONDS = float(os.getenv('WARMUP_RETRY_SECONDS', 30))
+
+WARMUP_CAR = schemas.PredictionInputSchema(
+    Model_Year=2020, Mileage=30000, Brand_Name='Toyota', Model_Name='Camry', Stock_Type='Used',
+    Exterior_Color='White', Interior_Color='Black', Drivetrain='FWD', Fuel_Type='Gasoline',
+    Accidents_Or_Damage=False, Clean_Title=True, One_Owner_Vehicle=True, Personal_Use_Only=True,
+    Engine_Size=2.5, Km_per_l=12, Cylinder_Config='I4', Valves=16, Gear_Spec=8,
+    Km_L_e_City=0, Km_L_e_Hwy=0, City='Austin', STATE='Texas',
+)
+
+readiness = {
+    'ready' : False,
+    'model_loaded' : False,
+    'artifacts_loaded' : False,
+    'attempts' : 0,
+    'error' : None,
+    'warmup_seconds' : None,
+}
+
+def readiness_status():
+    """(status code, body) of the readiness probe, 503 until the model and the recommendation artifacts are warm."""
+    return (200 if readiness['ready'] else 503), dict(readiness)
+
+def warm_prediction():
+    model = load_model()
+    batch_prediction(cars=[WARMUP_CAR], model=model)
+    readiness['model_loaded'] = True
+
+def warm_recommendation():
+    get_artifacts()
+    # a real listing is used since the fitted OneHotEncoder rejects unseen categories
+    db = SessionLocal()
+    try:
+        car = db.query(models.Car).first()
+    finally:
+        db.close()
+    if car is not None:
+        recommend_car_idx(car)
+    readiness['artifacts_loaded'] = True
+
+def warmup(max_attempts: int = None):
+    started = time.perf_counter()
+    while not readiness['ready'] and (max_attempts is None or readiness['attempts'] < max_attempts):
+        readiness['attempts'] += 1
+        try:
+            if not readiness['model_loaded']:
+                warm_prediction()
+            if not readiness['artifacts_loaded']:
+                warm_recommendation()
+            readiness['error'] = None
+            readiness['warmup_seconds'] = round(time.perf_counter() - started, 3)
+            readiness['ready'] = True
+        except Exception as e:
+            readiness['error'] = f'{type(e).__name__}: {e}'
+            print(f'Warmup attempt {readiness["attempts"]} failed: {readiness["error"]}')
+            if max_attempts is None or readiness['attempts'] < max_attempts:
+                time.sleep(WARMUP_RETRY_SECONDS)
+    return readiness['ready']
+
+def start_warmup():
+    thread = threading.Thread(target=warmup, name='warmup', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,82 @@
+"""
+Recall / latency trade-off of the IVF index against exact search.
+
+For every catalog size the index is built with params.yaml defaults (about
+sqrt(rows) lists) and queried with several n_probe values; recall@k is
+measured against the exact pre-normalized search.
+
+    python benchmarks/ann_recall.py [--sizes 100000 1000000] [--probes 1 4 8 16 32 64]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "FastApi_app"))
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+from ann_index import IVFIndex, build_ann_index  # noqa: E402
+from neighbor_table import normalized_rows, similarity_scores, top_k_indices  # noqa: E402
+from synthetic_data import make_recommendation_matrix  # noqa: E402
+
+
+def p50_ms(samples: list) -> float:
+    return round(float(np.percentile(samples, 50)) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for n_rows in args.sizes:
+        matrix = make_recommendation_matrix(n_rows, seed=0)
+        query_matrix = make_recommendation_matrix(args.queries, seed=1)
+        queries = [query_matrix[i:i + 1] for i in range(args.queries)]
+
+        start = time.perf_counter()
+        index = build_ann_index(matrix)
+        build_s = time.perf_counter() - start
+        ivf = IVFIndex(index, matrix)
+
+        normalized_t = normalized_rows(matrix).T.tocsr()
+        exact, exact_times = [], []
+        for query in queries:
+            start = time.perf_counter()
+            exact.append(set(top_k_indices(similarity_scores(query, normalized_t), args.k)))
+            exact_times.append(time.perf_counter() - start)
+
+        for n_probe in args.probes:
+            hits, times = 0, []
+            for query, expected in zip(queries, exact):
+                start = time.perf_counter()
+                ids, _ = ivf.search(query, args.k, n_probe=n_probe)
+                times.append(time.perf_counter() - start)
+                hits += len(set(ids) & expected)
+            results.append({
+                "rows": n_rows,
+                "n_lists": ivf.n_lists,
+                "n_probe": n_probe,
+                "build_s": round(build_s, 1),
+                f"recall_at_{args.k}": round(hits / (args.k * len(queries)), 4),
+                "ann_p50_ms": p50_ms(times),
+                "exact_p50_ms": p50_ms(exact_times),
+            })
+
+    print(f"{'rows':>9} {'lists':>6} {'probes':>6} {'recall':>7} {'ann p50':>10} {'exact p50':>10}")
+    for row in results:
+        print(f"{row['rows']:>9} {row['n_lists']:>6} {row['n_probe']:>6} {row[f'recall_at_{args.k}']:>7} "
+              f"{row['ann_p50_ms']:>8}ms {row['exact_p50_ms']:>8}ms")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Latency of the flattened forest engine against the sklearn path.
+
+Uses models/prediction_pipe.joblib when it exists (after `dvc repro`),
+otherwise trains a pipeline with params.yaml settings on synthetic cars.
+
+    python benchmarks/forest_latency.py [--rows 1 10 100 1000 10000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import yaml
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "FastApi_app"))
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+from forest_engine import ForestEngine  # noqa: E402
+
+
+def build_pipeline(train_rows: int) -> Pipeline:
+    pipe_path = os.path.join(ROOT, "models", "prediction_pipe.joblib")
+    if os.path.exists(pipe_path):
+        return joblib.load(pipe_path)
+
+    from src.features.feature_transformation import create_encoder
+    from synthetic_data import make_training_frame
+
+    with open(os.path.join(ROOT, "params.yaml")) as f:
+        params = yaml.safe_load(f)
+    train = make_training_frame(train_rows, seed=0)
+    pipe = Pipeline([
+        ("Encoder", create_encoder(params["feature_transformation"]["encoding_method"])),
+        ("Regressor", RandomForestRegressor(**params["train_model"])),
+    ])
+    return pipe.fit(train.drop(columns="Price"), train["Price"])
+
+
+def timed(fn, repeats: int) -> dict:
+    fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": round(float(np.percentile(samples, 50)), 3),
+            "p99_ms": round(float(np.percentile(samples, 99)), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--train-rows", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    from synthetic_data import make_training_frame
+
+    pipe = build_pipeline(args.train_rows)
+    encoder, forest = pipe.named_steps["Encoder"], pipe.named_steps["Regressor"]
+    engine = ForestEngine.from_estimator(forest)
+
+    results = []
+    for n_rows in args.rows:
+        frame = make_training_frame(n_rows, seed=7).drop(columns="Price")
+        X = encoder.transform(frame).to_numpy(dtype=np.float32)
+        assert np.array_equal(engine.predict(X), pipe.predict(frame))
+        repeats = max(3, args.repeats // max(1, n_rows // 1000))
+        results.append({
+            "rows": n_rows,
+            "sklearn_forest": timed(lambda: forest.predict(X), repeats),
+            "native_forest": timed(lambda: engine.predict(X), repeats),
+            "sklearn_pipeline": timed(lambda: pipe.predict(frame), repeats),
+        })
+
+    print(f"{'rows':>6} {'sklearn forest':>16} {'native forest':>15} {'sklearn pipeline':>18}  (p50 ms)")
+    for row in results:
+        print(f"{row['rows']:>6} {row['sklearn_forest']['p50_ms']:>16} "
+              f"{row['native_forest']['p50_ms']:>15} {row['sklearn_pipeline']['p50_ms']:>18}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
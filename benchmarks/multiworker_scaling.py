@@ -0,0 +1,137 @@
+"""
+Throughput and per-worker memory of the preload-then-fork gunicorn mode.
+
+Starts `gunicorn -c gunicorn_conf.py main:app` from FastApi_app/ once per worker
+count, waits for /healthz/ready, drives /prediction with concurrent clients
+and reports requests/s, latency and the RSS / USS / PSS of every worker.
+The app needs its usual environment (.env with DB + DagsHub credentials, or
+MODEL_REGISTRY_DIR pointing at a local registry). The prediction result cache
+is switched off so every request reaches the model.
+
+    python benchmarks/multiworker_scaling.py --workers 1 2 4 --seconds 20 --concurrency 32
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import psutil
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+APP_DIR = os.path.join(ROOT, "FastApi_app")
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+from synthetic_data import make_prediction_inputs  # noqa: E402
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            if requests.get(f"{url}/healthz/ready", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def worker_memory(master_pid: int) -> list:
+    memory = []
+    for child in psutil.Process(master_pid).children():
+        info = child.memory_full_info()
+        memory.append({
+            "pid": child.pid,
+            "rss_mb": round(info.rss / 1e6, 1),
+            "uss_mb": round(info.uss / 1e6, 1),
+            "pss_mb": round(getattr(info, "pss", 0) / 1e6, 1),
+        })
+    return memory
+
+
+def drive_load(url: str, cars: list, seconds: float, concurrency: int) -> dict:
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stop_at = time.time() + seconds
+
+    def client(offset: int):
+        session = requests.Session()
+        i = offset
+        while time.time() < stop_at:
+            car = cars[i % len(cars)]
+            i += concurrency
+            start = time.perf_counter()
+            try:
+                ok = session.post(f"{url}/prediction", data=car, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                (latencies if ok else errors).append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_s": round(len(latencies) / seconds, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2) if latencies else None,
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2) if latencies else None,
+    }
+
+
+def run(workers: int, args) -> dict:
+    port = args.port
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port), PREDICTION_CACHE_SIZE="0")
+    process = subprocess.Popen(["gunicorn", "-c", "gunicorn_conf.py", "main:app"], cwd=APP_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(url, process, args.ready_timeout)
+        cars = make_prediction_inputs(1000, seed=11)
+        drive_load(url, cars, seconds=2, concurrency=args.concurrency)
+        load = drive_load(url, cars, seconds=args.seconds, concurrency=args.concurrency)
+        memory = worker_memory(process.pid)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return {
+        "workers": workers,
+        **load,
+        "worker_rss_mb": [m["rss_mb"] for m in memory],
+        "worker_uss_mb": [m["uss_mb"] for m in memory],
+        "worker_pss_mb": [m["pss_mb"] for m in memory],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    results = [run(workers, args) for workers in args.workers]
+
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'mean RSS MB':>12} {'mean USS MB':>12} {'mean PSS MB':>12}")
+    for row in results:
+        print(f"{row['workers']:>7} {row['requests_per_s']:>8} {row['p50_ms']:>8} {row['p99_ms']:>8} "
+              f"{np.mean(row['worker_rss_mb']):>12.1f} {np.mean(row['worker_uss_mb']):>12.1f} "
+              f"{np.mean(row['worker_pss_mb']):>12.1f}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
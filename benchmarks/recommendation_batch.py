@@ -0,0 +1,66 @@
+"""
+Batch recommendations: one search_idx call per car against recommend_batch,
+which scores blocks of cars with one sparse matrix product.
+
+The per-car loop is given the stored matrix rows as queries, so the pandas
+transform recommend_car_idx also pays per car is not part of its time.
+
+    python benchmarks/recommendation_batch.py [--sizes 10000 100000] [--cars 50]
+"""
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "FastApi_app"))
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+import recommend  # noqa: E402
+from live_catalog import LiveCatalog  # noqa: E402
+from neighbor_table import normalized_rows  # noqa: E402
+from synthetic_data import make_recommendation_matrix  # noqa: E402
+
+
+def use_matrix(matrix):
+    # the module globals get_artifacts would fill, exact search without a neighbor table
+    recommend.df = matrix
+    recommend.transformer = object()
+    recommend.normalized = normalized_rows(matrix)
+    recommend.normalized_t = recommend.normalized.T.tocsr()
+    recommend.live_catalog = LiveCatalog(matrix)
+
+
+def per_car(cars, k):
+    snapshot = recommend.live_catalog.snapshot()
+    return {car.id: [int(i) for i in recommend.without_car(recommend.search_idx(recommend.df[car.id], k + 1, snapshot), car.id, k)]
+            for car in cars}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--cars", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'cars':>5} {'per car ms':>11} {'batch ms':>9} {'speedup':>8} {'identical':>10}")
+    for n_rows in args.sizes:
+        use_matrix(make_recommendation_matrix(n_rows, seed=0))
+        rng = np.random.default_rng(1)
+        cars = [SimpleNamespace(id=int(row)) for row in rng.choice(n_rows, args.cars, replace=False)]
+
+        start = time.perf_counter()
+        expected = per_car(cars, args.k)
+        loop_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        batch = recommend.recommend_batch(cars, k=args.k)
+        batch_ms = (time.perf_counter() - start) * 1000
+        print(f"{n_rows:>9} {args.cars:>5} {loop_ms:>11.1f} {batch_ms:>9.1f} {loop_ms / batch_ms:>8.2f} {str(batch == expected):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Per-query cost of live recommendations: cosine_similarity + full argsort against
+the pre-normalized sparse product + partial top-k now used by recommend.py.
+
+Runs on synthetic catalogs shaped like transformed_df.npz and checks that both
+paths return the same neighbors.
+
+    python benchmarks/recommendation_similarity.py [--sizes 10000 100000 1000000] [--queries 50]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "FastApi_app"))
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+from neighbor_table import normalized_rows, similarity_scores, top_k_indices  # noqa: E402
+from synthetic_data import make_recommendation_matrix  # noqa: E402
+
+
+def old_path(query, matrix, k):
+    similarity_matrix = cosine_similarity(query, matrix)
+    return np.argsort(similarity_matrix.ravel(), kind="stable")[-k - 1:][::-1][1:]
+
+
+def new_path(query, normalized_t, k):
+    return top_k_indices(similarity_scores(query, normalized_t), k + 1)[1:]
+
+
+def timed(fn, queries) -> dict:
+    fn(queries[0])
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": round(float(np.percentile(samples, 50)), 3),
+            "p99_ms": round(float(np.percentile(samples, 99)), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for n_rows in args.sizes:
+        matrix = make_recommendation_matrix(n_rows, seed=0)
+        query_matrix = make_recommendation_matrix(args.queries, seed=1)
+        queries = [query_matrix[i:i + 1] for i in range(args.queries)]
+
+        start = time.perf_counter()
+        normalized_t = normalized_rows(matrix).T.tocsr()
+        prepare_ms = (time.perf_counter() - start) * 1000
+
+        identical = all(
+            np.array_equal(old_path(query, matrix, args.k), new_path(query, normalized_t, args.k)) for query in queries
+        )
+        old = timed(lambda query: old_path(query, matrix, args.k), queries)
+        new = timed(lambda query: new_path(query, normalized_t, args.k), queries)
+        results.append({
+            "rows": n_rows,
+            "nnz": int(matrix.nnz),
+            "prepare_ms": round(prepare_ms, 1),
+            "cosine_argsort": old,
+            "normalized_topk": new,
+            "speedup_p50": round(old["p50_ms"] / new["p50_ms"], 2),
+            "identical": identical,
+        })
+
+    print(f"{'rows':>9} {'cosine+argsort p50':>19} {'normalized+topk p50':>20} {'speedup':>8} {'identical':>10}")
+    for row in results:
+        print(f"{row['rows']:>9} {row['cosine_argsort']['p50_ms']:>17}ms {row['normalized_topk']['p50_ms']:>18}ms "
+              f"{row['speedup_p50']:>7}x {str(row['identical']):>10}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
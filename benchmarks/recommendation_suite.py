@@ -0,0 +1,349 @@
+"""
+Recommendation benchmark and quality suite.
+
+Synthetic catalogs are generated column by column from the models.Car
+schema, run through the build_index stage (streaming fit + transform) and
+served through recommend.get_artifacts with the loaders pointed at local
+copies of the artifacts, one serving mode at a time:
+
+    exact_npz   float64 npz matrix, transposed exact product (RECOMMENDATION_MATRIX_FORMAT=npz)
+    exact_mmap  float32 memory-mapped store, the default
+    table       precomputed neighbor table (slow to build past ~100k rows)
+    ivf         IVF index, ANN_NPROBE probes
+    embedding   dense SVD embedding (RECOMMENDATION_MODE=embedding)
+
+For every catalog size and mode it reports the p50/p99 latency of
+recommend_car_idx, the per-car time of recommend_batch, the peak heap
+allocated while loading and querying (tracemalloc; memory-mapped pages are
+shared between workers and not counted) and recall@k of both against exact
+cosine similarity of the full sklearn transform. Recall counts a returned
+car as a hit when it scores at least as high as the k-th exact neighbor, so
+ties at the cut do not count as misses.
+
+    python benchmarks/recommendation_suite.py [--sizes 10000 100000 1000000] [--modes exact_mmap ivf]
+        [--output reports/recommendation_benchmark.json] [--baseline baseline.json]
+
+With --baseline the run fails (exit code 1) when recall drops by more than
+--recall-tolerance or p99 latency / peak memory grow by more than
+--latency-tolerance / --memory-tolerance against the same size and mode.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from sqlalchemy import JSON, Boolean, DECIMAL, Integer, String
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "FastApi_app"))
+sys.path.insert(0, ROOT)
+
+import models  # noqa: E402
+import recommend  # noqa: E402
+from ann_index import build_ann_index, load_ann_index, save_ann_index  # noqa: E402
+from comparables import US_STATE_CODES  # noqa: E402
+from embedding import EmbeddingIndex, build_embedding, save_embedding  # noqa: E402
+from matrix_store import load_matrix_mmap, save_matrix_mmap  # noqa: E402
+from neighbor_table import NeighborTable, build_neighbor_table, normalized_rows, save_neighbor_table  # noqa: E402
+from src.recommendation.build_index import fit_transformer, transform_catalog  # noqa: E402
+
+MODES = ["exact_npz", "exact_mmap", "table", "ivf", "embedding"]
+
+BRAND_MODELS = {
+    "Toyota": ["Camry", "Corolla", "RAV4", "Tacoma", "Highlander"],
+    "Ford": ["F-150", "Mustang", "Explorer", "Escape", "Maverick"],
+    "Chevrolet": ["Silverado 1500", "Tahoe", "Equinox", "Malibu"],
+    "Honda": ["Civic", "Accord", "CR-V", "Pilot"],
+    "BMW": ["X5", "330i", "X3", "M4"],
+    "Audi": ["A4", "Q5", "Q7", "e-tron"],
+    "Tesla": ["Model 3", "Model Y", "Model S", "Model X"],
+    "Kia": ["Sorento", "Telluride", "Carnival", "EV6"],
+    "Jeep": ["Wrangler Unlimited", "Grand Cherokee", "Compass"],
+    "Hyundai": ["Elantra", "Tucson", "Santa Fe", "Ioniq 5"],
+}
+TRIMS = ["Base", "SE", "XLT", "Limited", "Premium", "Sport", "Touring", "Platinum", "EX-L", "Long Range"]
+ELECTRIC_BRANDS = {"Tesla"}
+POOLS = {
+    "Stock_Type": ["New", "Used", "Certified"],
+    "Drivetrain": ["AWD", "4WD", "FWD", "RWD"],
+    "One_Owner_Vehicle": ["yes", "no", "not_owned_yet"],
+    "Personal_Use_Only": ["yes", "no", "not_in_use_yet"],
+    "Gear_Spec": ["1", "5", "6", "8", "10"],
+    "Cylinder_Config": ["I4", "V6", "V8", "I6", "H4"],
+    "Valves": ["16", "24", "32", "12"],
+    "Exterior_Color": ["Gray", "Black", "White", "Silver", "Blue", "Red"],
+    "Interior_Color": ["Gray", "Black", "Beige", "Brown"],
+    "City": ["austin", "dallas", "miami", "denver", "seattle", "orlando", "phoenix", "atlanta"],
+}
+
+
+def synthetic_car_table(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    `n_rows` listings with every models.Car column, ids 1..n_rows.
+
+    Columns the recommender reads get realistic, correlated values (models
+    per brand, electric specs only for electric cars, price by year, mileage
+    and brand); the rest are filled by their SQL type. Image_List (JSON) is
+    left empty.
+    """
+    rng = np.random.default_rng(seed)
+    brands = np.array(list(BRAND_MODELS))
+    brand_idx = rng.integers(0, len(brands), n_rows)
+    brand = brands[brand_idx]
+    family = np.array([models_[i % len(models_)] for models_, i in
+                       zip((BRAND_MODELS[b] for b in brand), rng.integers(0, 5, n_rows))], dtype=object)
+    electric = np.isin(brand, list(ELECTRIC_BRANDS)) | (rng.random(n_rows) < 0.05)
+    year = rng.integers(2005, 2027, n_rows)
+    stock = rng.choice(POOLS["Stock_Type"], n_rows, p=[0.3, 0.55, 0.15])
+    mileage = np.where(stock == "New", rng.integers(0, 50, n_rows), rng.gamma(2.0, 12000 * np.maximum(2026 - year, 1) / 4))
+    state_codes = np.array(sorted(set(US_STATE_CODES.values())))
+    st = rng.choice(state_codes, n_rows)
+    state_names = {code: name for name, code in US_STATE_CODES.items()}
+
+    known = {
+        "id": np.arange(1, n_rows + 1),
+        "Model_Year": year,
+        "Brand_Name": brand,
+        "Model_Name": family + " " + rng.choice(TRIMS, n_rows).astype(object),
+        "Stock_Type": stock,
+        "Mileage": np.round(mileage, 0),
+        "Price": np.round(np.exp(rng.normal(10.3, 0.35, n_rows)) * (1 + 0.05 * (year - 2005))
+                          * (1 + 0.08 * brand_idx / len(brands)) / (1 + mileage / 150000), 0),
+        "Fuel_Type": np.where(electric, "Electric", rng.choice(["Gasoline", "Hybrid", "Diesel", "Flex Fuel"], n_rows,
+                                                               p=[0.8, 0.1, 0.05, 0.05])),
+        "Km_per_l": np.where(electric, 0.0, rng.integers(6, 25, n_rows)).astype(float),
+        "Dc_Fast_Charging": np.where(electric, rng.integers(18, 60, n_rows), 0).astype(float),
+        "Battery_Capacity": np.where(electric, rng.integers(50, 110, n_rows), 0).astype(float),
+        "Expected_Range": np.where(electric, rng.integers(200, 420, n_rows), 0).astype(float),
+        "Level2_Charging": np.where(electric, rng.integers(4, 12, n_rows), 0).astype(float),
+        "Engine_Size": np.where(electric, 0.0, rng.choice([1.5, 2.0, 2.5, 3.5, 5.0], n_rows)),
+        "Gear_Spec": np.where(electric, "1", rng.choice(POOLS["Gear_Spec"][1:], n_rows)),
+        "Cylinder_Config": np.where(electric, "NA", rng.choice(POOLS["Cylinder_Config"], n_rows)),
+        "Valves": np.where(electric, "0", rng.choice(POOLS["Valves"], n_rows)),
+        "Km_L_e_City": np.where(electric, rng.integers(40, 60, n_rows), 0).astype(float),
+        "Km_L_e_Hwy": np.where(electric, rng.integers(35, 55, n_rows), 0).astype(float),
+        "Accidents_Or_Damage": rng.random(n_rows) < 0.15,
+        "Clean_Title": rng.random(n_rows) < 0.95,
+        "Seller_Name": rng.choice(["premier", "budget", "city", "sunset", "metro", "valley"], n_rows).astype(object)
+                       + " " + brand.astype(object) + " " + (rng.integers(0, 400, n_rows) % 97).astype(str).astype(object),
+        "ST": st,
+        "STATE": np.array([state_names[code] for code in st], dtype=object),
+    }
+    frame = {}
+    for column in models.Car.__table__.columns:
+        name = column.name
+        if name in known:
+            frame[name] = known[name]
+        elif name in POOLS:
+            frame[name] = rng.choice(POOLS[name], n_rows)
+        elif isinstance(column.type, JSON):
+            frame[name] = [[] for _ in range(n_rows)]
+        elif isinstance(column.type, Boolean):
+            frame[name] = rng.random(n_rows) < 0.5
+        elif isinstance(column.type, Integer):
+            frame[name] = rng.integers(0, 1000, n_rows)
+        elif isinstance(column.type, DECIMAL):
+            frame[name] = np.round(rng.random(n_rows) * 10 ** (column.type.precision - column.type.scale - 1), column.type.scale)
+        elif isinstance(column.type, String):
+            frame[name] = np.char.add(f"{name.lower()} ", (rng.integers(0, 100, n_rows)).astype(str))
+        else:
+            raise TypeError(f"No generator for {name} ({column.type})")
+    return pd.DataFrame(frame)
+
+
+def chunks(frame: pd.DataFrame, chunk_rows: int = 50000):
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+class Artifacts:
+    """The build_index outputs of one catalog, plus the optional indexes, saved under a temporary directory."""
+
+    def __init__(self, frame: pd.DataFrame, directory: str):
+        self.directory = directory
+        self.transformer, _ = fit_transformer(chunks(frame))
+        self.matrix, _ = transform_catalog(chunks(frame), self.transformer, n_jobs=-1)
+        self.npz_path = os.path.join(directory, "matrix.npz")
+        sparse.save_npz(self.npz_path, self.matrix)
+        self.store_dir = os.path.join(directory, "matrix_mmap")
+        save_matrix_mmap(self.matrix, self.store_dir)
+        self.build_s = {}
+
+    def build(self, mode: str, args):
+        start = time.perf_counter()
+        if mode == "table":
+            save_neighbor_table(build_neighbor_table(self.matrix, max(args.k, 20)), os.path.join(self.directory, "neighbors"))
+        elif mode == "ivf":
+            save_ann_index(build_ann_index(self.matrix), os.path.join(self.directory, "ann_index.npz"))
+        elif mode == "embedding":
+            save_embedding(build_embedding(self.matrix, args.n_components), os.path.join(self.directory, "embedding"))
+        self.build_s[mode] = round(time.perf_counter() - start, 1)
+
+
+def serve(artifacts: Artifacts, mode: str):
+    """Point recommend's loaders at the local artifacts for `mode` and drop whatever get_artifacts loaded before."""
+    for name in ["df", "transformer", "query_vectorizer", "neighbor_table", "normalized", "normalized_t",
+                 "ivf_index", "embedding_index", "attribute_index", "live_catalog", "loaded_build"]:
+        setattr(recommend, name, None)
+    recommend.current_build = lambda: {"build_id": mode, "prefix": artifacts.directory, "built_at": None}
+    recommend.RECOMMENDATION_MATRIX_FORMAT = "npz" if mode == "exact_npz" else "mmap"
+    recommend.RECOMMENDATION_MODE = "embedding" if mode == "embedding" else "sparse"
+    recommend.ANN_MIN_ROWS = 0 if mode == "ivf" else np.inf
+    recommend.load_artifacts = lambda build=None: (sparse.load_npz(artifacts.npz_path), artifacts.transformer)
+    recommend.load_transformer = lambda build=None: artifacts.transformer
+    recommend.load_matrix_store = lambda build=None: load_matrix_mmap(artifacts.store_dir)
+    recommend.load_neighbor_table = lambda build=None: NeighborTable.load(os.path.join(artifacts.directory, "neighbors")) \
+        if mode == "table" else None
+    recommend.load_ann_artifact = lambda build=None: load_ann_index(os.path.join(artifacts.directory, "ann_index.npz"))
+    recommend.load_embedding_index = lambda build=None: EmbeddingIndex.load(os.path.join(artifacts.directory, "embedding"))
+
+
+def exact_scores(artifacts: Artifacts, cars: list, block: int = 32) -> np.ndarray:
+    """Cosine similarity of every query car (full sklearn transform) with every catalog row, the car itself at -inf."""
+    normalized = normalized_rows(artifacts.matrix)
+    scores = np.empty((len(cars), artifacts.matrix.shape[0]))
+    for start in range(0, len(cars), block):
+        part = cars[start:start + block]
+        queries = normalize(sparse.csr_matrix(artifacts.transformer.transform(recommend.cars_frame(part))), norm="l2")
+        scores[start:start + len(part)] = (normalized @ queries.T.toarray()).T
+    scores[np.arange(len(cars)), [car.id for car in cars]] = -np.inf
+    return scores
+
+
+def recall_at_k(results: list, scores: np.ndarray, k: int) -> float:
+    hits = 0
+    for ids, row in zip(results, scores):
+        kth = np.partition(row, -k)[-k]
+        hits += min(k, int(np.sum(row[np.asarray(ids, dtype=np.int64)] >= kth - 1e-6))) if len(ids) else 0
+    return round(hits / (k * len(results)), 4)
+
+
+def percentile_ms(samples: list, q: float) -> float:
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def run_mode(artifacts: Artifacts, mode: str, cars: list, scores: np.ndarray, k: int) -> dict:
+    serve(artifacts, mode)
+    tracemalloc.start()
+    start = time.perf_counter()
+    recommend.get_artifacts()
+    load_s = time.perf_counter() - start
+    for car in cars[:5]:
+        recommend.recommend_car_idx(car, k=k)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    results, samples = [], []
+    for car in cars:
+        start = time.perf_counter()
+        results.append(recommend.recommend_car_idx(car, k=k))
+        samples.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    batch = recommend.recommend_batch(cars, k=k)
+    batch_s = time.perf_counter() - start
+    return {
+        "rows": artifacts.matrix.shape[0] - 1,
+        "mode": mode,
+        "build_s": artifacts.build_s.get(mode, 0.0),
+        "load_s": round(load_s, 3),
+        "p50_ms": percentile_ms(samples, 50),
+        "p99_ms": percentile_ms(samples, 99),
+        "batch_ms_per_car": round(batch_s * 1000 / len(cars), 3),
+        "peak_mb": round(peak / 1e6, 1),
+        f"recall_at_{k}": recall_at_k(results, scores, k),
+        f"batch_recall_at_{k}": recall_at_k([batch[car.id] for car in cars], scores, k),
+    }
+
+
+def check_regressions(results: list, baseline: list, recall_tolerance: float = 0.01,
+                      latency_tolerance: float = 0.5, memory_tolerance: float = 0.25) -> list:
+    """Failures of `results` against `baseline`, matched on rows and mode; entries missing from either side are skipped."""
+    previous = {(row["rows"], row["mode"]): row for row in baseline}
+    failures = []
+    for row in results:
+        base = previous.get((row["rows"], row["mode"]))
+        if base is None:
+            continue
+        name = f"{row['rows']} rows {row['mode']}"
+        for key in [key for key in row if "recall_at_" in key and key in base]:
+            if row[key] < base[key] - recall_tolerance:
+                failures.append(f"{name}: {key} {row[key]} < baseline {base[key]}")
+        if row["p99_ms"] > base["p99_ms"] * (1 + latency_tolerance):
+            failures.append(f"{name}: p99 {row['p99_ms']}ms > baseline {base['p99_ms']}ms")
+        if row["peak_mb"] > base["peak_mb"] * (1 + memory_tolerance) + 1:
+            failures.append(f"{name}: peak {row['peak_mb']}MB > baseline {base['peak_mb']}MB")
+    return failures
+
+
+def run_suite(sizes: list, modes: list, args) -> list:
+    results = []
+    for n_rows in sizes:
+        frame = synthetic_car_table(n_rows, seed=args.seed)
+        directory = tempfile.mkdtemp(prefix="recommendation-suite-")
+        try:
+            artifacts = Artifacts(frame, directory)
+            rng = np.random.default_rng(args.seed + 1)
+            picked = frame.iloc[np.sort(rng.choice(len(frame), min(args.queries, len(frame)), replace=False))]
+            cars = [SimpleNamespace(**car) for car in picked.to_dict(orient="records")]
+            scores = exact_scores(artifacts, cars)
+            for mode in modes:
+                artifacts.build(mode, args)
+                results.append(run_mode(artifacts, mode, cars, scores, args.k))
+                print(json.dumps(results[-1]), file=sys.stderr)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=["exact_npz", "exact_mmap", "ivf", "embedding"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--n-components", type=int, default=128)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write the results as json")
+    parser.add_argument("--baseline", default=None, help="results json of an earlier run to check against")
+    parser.add_argument("--recall-tolerance", type=float, default=0.01)
+    parser.add_argument("--latency-tolerance", type=float, default=0.5)
+    parser.add_argument("--memory-tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.modes, args)
+    recall = f"recall_at_{args.k}"
+    print(f"{'rows':>9} {'mode':>11} {'p50 ms':>8} {'p99 ms':>8} {'batch ms':>9} {'peak MB':>8} {'recall':>7} {'batch recall':>13}")
+    for row in results:
+        print(f"{row['rows']:>9} {row['mode']:>11} {row['p50_ms']:>8} {row['p99_ms']:>8} {row['batch_ms_per_car']:>9} "
+              f"{row['peak_mb']:>8} {row[recall]:>7} {row[f'batch_{recall}']:>13}")
+
+    report = {"python": platform.python_version(), "machine": platform.machine(), "k": args.k,
+              "queries": args.queries, "results": results}
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = check_regressions(results, json.load(f)["results"], args.recall_tolerance,
+                                         args.latency_tolerance, args.memory_tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+        print("no regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -60,7 +60,10 @@ sudo docker pull "$IMAGE"
 sudo docker stop my-app || true
 sudo docker rm my-app || true
 
+sudo mkdir -p /home/ubuntu/model_cache
+
 sudo docker run -d -p 80:8000 \
   --env-file "$ENV_FILE" \
+  -v /home/ubuntu/model_cache:/app/model_cache \
   --name my-app \
   "$IMAGE"
@@ -0,0 +1,88 @@
+import logging
+import os
+import joblib
+from sklearn.pipeline import Pipeline
+
+from FastApi_app.forest_engine import flatten_forest, save_forest, save_forest_mmap
+
+logger = logging.getLogger(name=os.path.basename(__file__))
+logger.setLevel(level="DEBUG")
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(level="DEBUG")
+
+file_handler = logging.FileHandler("reports/errors.log")
+file_handler.setLevel(level="DEBUG")
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(file_handler)
+logger.addHandler(console_handler)
+
+file_name = os.path.basename(__file__)
+
+
+def load_pipeline(pipe_path: str) -> Pipeline:
+    try:
+        prediction_pipe = joblib.load(pipe_path)
+        logger.info("trained pipeline loaded")
+        return prediction_pipe
+    except FileNotFoundError:
+        logger.error(
+            f"{file_name} -> load_pipeline function: Pipeline File does not exists at specified location"
+        )
+        raise
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> load_pipeline function"
+        )
+        raise
+
+
+def export_forest(prediction_pipe: Pipeline) -> dict:
+    try:
+        arrays = flatten_forest(prediction_pipe.named_steps["Regressor"])
+        logger.info(
+            f"forest flattened: {len(arrays['roots'])} trees, {len(arrays['feature'])} nodes, "
+            f"{sum(array.nbytes for array in arrays.values()) / 1e6:.1f} MB"
+        )
+        return arrays
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> export_forest function"
+        )
+        raise
+
+
+def save_artifact(arrays: dict, forest_path: str, mmap_dir: str) -> None:
+    try:
+        save_forest(arrays, forest_path)
+        n_bytes = save_forest_mmap(arrays, mmap_dir)
+        logger.info(f"forest arrays saved, memory-mapped serving format is {n_bytes / 1e6:.1f} MB")
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> save_artifact function"
+        )
+        raise
+
+
+def main() -> None:
+    try:
+        prediction_pipe = load_pipeline(pipe_path="models/prediction_pipe.joblib")
+        arrays = export_forest(prediction_pipe=prediction_pipe)
+        save_artifact(
+            arrays=arrays,
+            forest_path="models/forest_arrays.npz",
+            mmap_dir="models/forest_mmap",
+        )
+        logger.info("main function executed")
+    except Exception:
+        logger.error(f"Some unexpected error occured in {file_name} -> main function")
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import logging
+import os
+import sys
+import yaml
+from dotenv import load_dotenv
+from scipy.sparse import load_npz
+
+# ann_index uses the app's flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "FastApi_app"))
+from ann_index import build_ann_index, save_ann_index  # noqa: E402
+
+load_dotenv()
+
+logger = logging.getLogger(name=os.path.basename(__file__))
+logger.setLevel(level="DEBUG")
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(level="DEBUG")
+
+file_handler = logging.FileHandler("reports/errors.log")
+file_handler.setLevel(level="DEBUG")
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(file_handler)
+logger.addHandler(console_handler)
+
+file_name = os.path.basename(__file__)
+
+def load_params(params_path: str) -> dict:
+    try:
+        params = yaml.safe_load(open(params_path, "r"))["build_ann_index"]
+        return params
+    except FileNotFoundError:
+        logger.error(
+            f"{file_name} -> load_params function: Params File does not exists at specified location"
+        )
+        raise
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> load_params function"
+        )
+        raise
+
+
+def load_matrix(local_sparse_path: str):
+    # written by the build_index stage, the published copy is only for the app
+    try:
+        matrix = load_npz(local_sparse_path)
+        logger.info(f"recommendation matrix loaded: {matrix.shape[0]} rows, {matrix.nnz} non zeros")
+        return matrix
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> load_matrix function"
+        )
+        raise
+
+
+def build_index(matrix, params: dict) -> dict:
+    try:
+        index = build_ann_index(
+            matrix,
+            n_lists=params["n_lists"],
+            n_iter=params["n_iter"],
+            sample_rows=params["sample_rows"],
+            seed=params["random_state"],
+        )
+        list_sizes = index["list_offsets"][1:] - index["list_offsets"][:-1]
+        logger.info(
+            f"IVF index built: {len(index['centroids'])} lists, "
+            f"{int(list_sizes.mean())} rows per list on average, largest {int(list_sizes.max())}"
+        )
+        return index
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> build_index function"
+        )
+        raise
+
+
+def save_index(index: dict, local_path: str) -> None:
+    try:
+        save_ann_index(index, local_path)
+        logger.info(f"ANN index saved ({os.path.getsize(local_path) / 1e6:.1f} MB)")
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> save_index function"
+        )
+        raise
+
+
+def main() -> None:
+    try:
+        params = load_params(params_path="params.yaml")
+        matrix = load_matrix(local_sparse_path="models/recommendation/matrix.npz")
+        index = build_index(matrix=matrix, params=params)
+        save_index(index=index, local_path="models/ann_index.npz")
+        logger.info("main function executed")
+    except Exception:
+        logger.error(f"Some unexpected error occured in {file_name} -> main function")
+        raise
+
+
+if __name__ == "__main__":
+    main()
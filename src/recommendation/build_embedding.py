@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import sys
+import yaml
+from dotenv import load_dotenv
+from scipy.sparse import load_npz
+
+# embedding uses the app's flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "FastApi_app"))
+from embedding import EmbeddingIndex, build_embedding, evaluate_embedding, save_embedding  # noqa: E402
+
+load_dotenv()
+
+logger = logging.getLogger(name=os.path.basename(__file__))
+logger.setLevel(level="DEBUG")
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(level="DEBUG")
+
+file_handler = logging.FileHandler("reports/errors.log")
+file_handler.setLevel(level="DEBUG")
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(file_handler)
+logger.addHandler(console_handler)
+
+file_name = os.path.basename(__file__)
+
+def load_params(params_path: str) -> dict:
+    try:
+        params = yaml.safe_load(open(params_path, "r"))["build_embedding"]
+        return params
+    except FileNotFoundError:
+        logger.error(
+            f"{file_name} -> load_params function: Params File does not exists at specified location"
+        )
+        raise
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> load_params function"
+        )
+        raise
+
+
+def load_matrix(local_sparse_path: str):
+    # written by the build_index stage, the published copy is only for the app
+    try:
+        matrix = load_npz(local_sparse_path)
+        logger.info(f"recommendation matrix loaded: {matrix.shape[0]} rows, {matrix.nnz} non zeros")
+        return matrix
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> load_matrix function"
+        )
+        raise
+
+
+def build_reduction(matrix, params: dict) -> dict:
+    try:
+        embedding = build_embedding(
+            matrix,
+            n_components=params["n_components"],
+            n_iter=params["n_iter"],
+            seed=params["random_state"],
+        )
+        logger.info(f"embedding built: {embedding['embeddings'].shape[0]} rows x {embedding['embeddings'].shape[1]} dims")
+        return embedding
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> build_reduction function"
+        )
+        raise
+
+
+def evaluate(matrix, embedding: dict, params: dict, metrics_path: str) -> dict:
+    try:
+        metrics = evaluate_embedding(
+            matrix,
+            EmbeddingIndex(embedding["components"], embedding["embeddings"]),
+            n_queries=params["eval_queries"],
+            seed=params["random_state"],
+        )
+        with open(metrics_path, "w") as f:
+            json.dump(metrics, f, indent=4)
+        logger.info(f"embedding evaluated: {metrics}")
+        return metrics
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> evaluate function"
+        )
+        raise
+
+
+def save_reduction(embedding: dict, local_dir: str) -> None:
+    try:
+        n_bytes = save_embedding(embedding, local_dir)
+        logger.info(f"embedding saved ({n_bytes / 1e6:.1f} MB)")
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> save_reduction function"
+        )
+        raise
+
+
+def main() -> None:
+    try:
+        params = load_params(params_path="params.yaml")
+        matrix = load_matrix(local_sparse_path="models/recommendation/matrix.npz")
+        embedding = build_reduction(matrix=matrix, params=params)
+        evaluate(matrix=matrix, embedding=embedding, params=params, metrics_path="reports/embedding_metrics.json")
+        save_reduction(embedding=embedding, local_dir="models/embedding")
+        logger.info("main function executed")
+    except Exception:
+        logger.error(f"Some unexpected error occured in {file_name} -> main function")
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+import joblib
+import numpy as np
+import pandas as pd
+import yaml
+from dotenv import load_dotenv
+from joblib import Parallel, delayed
+from scipy import sparse
+from sqlalchemy import column, create_engine, select, table
+from sklearn.compose import ColumnTransformer
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+
+# the memory-mapped store is read back by the app's flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "FastApi_app"))
+from attribute_index import AttributeIndex  # noqa: E402
+from matrix_store import save_matrix_mmap, storage_report  # noqa: E402
+
+load_dotenv()
+
+logger = logging.getLogger(name=os.path.basename(__file__))
+logger.setLevel(level="DEBUG")
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(level="DEBUG")
+
+file_handler = logging.FileHandler("reports/errors.log")
+file_handler.setLevel(level="DEBUG")
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(file_handler)
+logger.addHandler(console_handler)
+
+file_name = os.path.basename(__file__)
+
+OHE_COLUMNS = ["Brand_Name", "Stock_Type", "Drivetrain", "Fuel_Type", "One_Owner_Vehicle",
+               "Personal_Use_Only", "Gear_Spec", "Cylinder_Config", "Valves", "ST"]
+TFIDF_COLUMNS = {"tfidf_model": "Model_Name", "tfidf_seller": "Seller_Name"}
+MIN_MAX_COLUMNS = ["Model_Year", "Mileage", "Price", "Km_per_l", "Dc_Fast_Charging", "Battery_Capacity",
+                   "Expected_Range", "Engine_Size", "Km_L_e_City", "Km_L_e_Hwy"]
+PASSTHROUGH_COLUMNS = ["Accidents_Or_Damage", "Clean_Title"]
+# same columns, same order as the frame recommend.py builds for a single car
+RECOMMENDATION_COLUMNS = ["Brand_Name", "Stock_Type", "Drivetrain", "Fuel_Type", "One_Owner_Vehicle",
+                          "Personal_Use_Only", "Gear_Spec", "Cylinder_Config", "Valves", "ST", "Model_Name",
+                          "Seller_Name", "Model_Year", "Mileage", "Price", "Km_per_l", "Dc_Fast_Charging",
+                          "Battery_Capacity", "Expected_Range", "Engine_Size", "Km_L_e_City", "Km_L_e_Hwy",
+                          "Accidents_Or_Damage", "Clean_Title"]
+
+
+def database_url() -> str:
+    # RECOMMENDATION_DB_URL=sqlite:///catalog.db runs the stage against a local copy of the catalog
+    url = os.getenv("RECOMMENDATION_DB_URL")
+    if url:
+        return url
+    return (f"mysql+pymysql://{os.getenv('DB_USERNAME')}:{os.getenv('DB_PASSWORD')}"
+            f"@{os.getenv('DB_HOSTNAME')}:3306/{os.getenv('DB_NAME')}")
+
+
+def load_params(params_path: str) -> dict:
+    try:
+        params = yaml.safe_load(open(params_path, "r"))["build_index"]
+        return params
+    except FileNotFoundError:
+        logger.error(
+            f"{file_name} -> load_params function: Params File does not exists at specified location"
+        )
+        raise
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> load_params function"
+        )
+        raise
+
+
+def read_chunks(engine, table_name: str, chunk_rows: int):
+    """Catalog rows ordered by id, `chunk_rows` at a time from a server side cursor."""
+    try:
+        query = select(*[column(name) for name in ["id"] + RECOMMENDATION_COLUMNS]) \
+            .select_from(table(table_name)).order_by(column("id"))
+        with engine.connect().execution_options(stream_results=True, yield_per=chunk_rows) as conn:
+            for chunk in pd.read_sql(query, conn, chunksize=chunk_rows):
+                yield chunk
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> read_chunks function"
+        )
+        raise
+
+
+def create_transformer() -> ColumnTransformer:
+    return ColumnTransformer(
+        transformers=[
+            ("ohe", OneHotEncoder(), OHE_COLUMNS),
+            ("tfidf_model", TfidfVectorizer(stop_words="english"), TFIDF_COLUMNS["tfidf_model"]),
+            ("tfidf_seller", TfidfVectorizer(stop_words="english"), TFIDF_COLUMNS["tfidf_seller"]),
+            ("norm", MinMaxScaler(), MIN_MAX_COLUMNS)
+        ],
+        remainder="passthrough",
+        force_int_remainder_cols=False
+    )
+
+
+def fit_transformer(chunks) -> tuple:
+    """
+    Fit the recommendation transformer in one pass over the chunks.
+
+    Only what the fit needs is kept: distinct categories, min and max of the
+    numeric columns and document counts of the texts. The transformer is fit
+    on a small frame holding all of those, then the tf-idf weights are set
+    from the counts, which gives the same transformer as a fit on every row.
+    """
+    try:
+        distinct = {name: set() for name in OHE_COLUMNS + PASSTHROUGH_COLUMNS}
+        texts = {name: Counter() for name in TFIDF_COLUMNS.values()}
+        minimum, maximum = {}, {}
+        n_rows = 0
+        for chunk in chunks:
+            n_rows += len(chunk)
+            for name in distinct:
+                distinct[name].update(chunk[name].drop_duplicates().tolist())
+            for name in texts:
+                texts[name].update(chunk[name].value_counts(dropna=False).to_dict())
+            numeric = chunk[MIN_MAX_COLUMNS].apply(pd.to_numeric)
+            for name in MIN_MAX_COLUMNS:
+                minimum[name] = np.nanmin([minimum.get(name, np.nan), numeric[name].min()])
+                maximum[name] = np.nanmax([maximum.get(name, np.nan), numeric[name].max()])
+
+        values = {name: list(pd.unique(pd.Series(list(items), dtype=object))) for name, items in distinct.items()}
+        values.update({name: list(counts) for name, counts in texts.items()})
+        values.update({name: [minimum[name], maximum[name]] for name in MIN_MAX_COLUMNS})
+        n_fit_rows = max(len(items) for items in values.values())
+        fit_frame = pd.DataFrame({name: [values[name][i % len(values[name])] for i in range(n_fit_rows)]
+                                  for name in RECOMMENDATION_COLUMNS})
+        fit_frame[MIN_MAX_COLUMNS] = fit_frame[MIN_MAX_COLUMNS].astype(float)
+
+        transformer = create_transformer().fit(fit_frame)
+        for step, name in TFIDF_COLUMNS.items():
+            vectorizer = transformer.named_transformers_[step]
+            analyzer = vectorizer.build_analyzer()
+            document_frequency = np.zeros(len(vectorizer.vocabulary_))
+            for text, count in texts[name].items():
+                for token in set(analyzer(text)):
+                    document_frequency[vectorizer.vocabulary_[token]] += count
+            # smooth_idf, as TfidfVectorizer computes it over all the rows
+            vectorizer.idf_ = np.log((1 + n_rows) / (1 + document_frequency)) + 1
+        transformer.named_transformers_["norm"].n_samples_seen_ = n_rows
+        logger.info(f"transformer fitted on {n_rows} rows, {n_fit_rows} row fit frame")
+        return transformer, n_rows
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> fit_transformer function"
+        )
+        raise
+
+
+def transform_chunk(transformer: ColumnTransformer, chunk: pd.DataFrame) -> tuple:
+    return chunk["id"].to_numpy(dtype=np.int64), sparse.csr_matrix(transformer.transform(chunk[RECOMMENDATION_COLUMNS]))
+
+
+def transform_catalog(chunks, transformer: ColumnTransformer, n_jobs: int) -> tuple:
+    """
+    Transform the chunks in parallel workers into one matrix where row == car id.
+
+    The app looks cars up by row, so ids missing from the table are left as
+    empty rows; `row_car_ids` holds the car id of every row, -1 for the gaps.
+    """
+    try:
+        parts = Parallel(n_jobs=n_jobs)(delayed(transform_chunk)(transformer, chunk) for chunk in chunks)
+        ids = np.concatenate([part_ids for part_ids, _ in parts])
+        stacked = sparse.vstack([part for _, part in parts], format="coo")
+        n_rows = int(ids.max()) + 1 if len(ids) else 0
+        matrix = sparse.csr_matrix((stacked.data, (ids[stacked.row], stacked.col)), shape=(n_rows, stacked.shape[1]))
+        row_car_ids = np.full(n_rows, -1, dtype=np.int64)
+        row_car_ids[ids] = ids
+        logger.info(f"{len(ids)} cars transformed into a {matrix.shape[0]} x {matrix.shape[1]} matrix, {matrix.nnz} non zeros")
+        return matrix, row_car_ids
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> transform_catalog function"
+        )
+        raise
+
+
+def save_artifacts(matrix, transformer: ColumnTransformer, row_car_ids: np.ndarray, local_dir: str,
+                   report_path: str = None, started_at: float = None) -> None:
+    # uploaded by the publish_index stage, together with the neighbor table, ANN index and embedding built from it
+    try:
+        os.makedirs(local_dir, exist_ok=True)
+        matrix_path = os.path.join(local_dir, "matrix.npz")
+        sparse.save_npz(matrix_path, matrix)
+        joblib.dump(transformer, os.path.join(local_dir, "transformer.joblib"))
+        np.save(os.path.join(local_dir, "row_car_ids.npy"), row_car_ids)
+
+        # float32 store the app workers map, prices kept exact for the price filters
+        store_dir = os.path.join(local_dir, "matrix_mmap")
+        n_bytes = save_matrix_mmap(matrix, store_dir, prices=AttributeIndex.matrix_prices(matrix, transformer))
+        report = storage_report(matrix, matrix_path, n_bytes)
+        logger.info(f"memory-mapped matrix: {report['mmap_bytes']} bytes shared, {report['bytes_saved_per_worker']} bytes saved per worker")
+        if report_path:
+            with open(report_path, "w") as f:
+                json.dump(report, f, indent=4)
+        # the catalog was read from `started_at` on, the app applies its own writes since then again on top of the build
+        with open(os.path.join(local_dir, "build.json"), "w") as f:
+            json.dump({"started_at": started_at, "n_rows": matrix.shape[0]}, f, indent=4)
+        logger.info(f"recommendation index saved to {local_dir}")
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> save_artifacts function"
+        )
+        raise
+
+
+def main() -> None:
+    try:
+        params = load_params(params_path="params.yaml")
+        started_at = time.time()
+        engine = create_engine(database_url())
+        transformer, _ = fit_transformer(read_chunks(engine, params["table"], params["chunk_rows"]))
+        matrix, row_car_ids = transform_catalog(
+            read_chunks(engine, params["table"], params["chunk_rows"]), transformer, n_jobs=params["n_jobs"]
+        )
+        save_artifacts(matrix, transformer, row_car_ids, local_dir="models/recommendation",
+                       report_path="reports/matrix_store.json", started_at=started_at)
+        logger.info("main function executed")
+    except Exception:
+        logger.error(f"Some unexpected error occured in {file_name} -> main function")
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import logging
+import os
+import sys
+import yaml
+from dotenv import load_dotenv
+from scipy.sparse import load_npz
+
+# neighbor_table uses the app's flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "FastApi_app"))
+from neighbor_table import build_neighbor_table, save_neighbor_table  # noqa: E402
+
+load_dotenv()
+
+logger = logging.getLogger(name=os.path.basename(__file__))
+logger.setLevel(level="DEBUG")
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(level="DEBUG")
+
+file_handler = logging.FileHandler("reports/errors.log")
+file_handler.setLevel(level="DEBUG")
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(file_handler)
+logger.addHandler(console_handler)
+
+file_name = os.path.basename(__file__)
+
+def load_params(params_path: str) -> dict:
+    try:
+        params = yaml.safe_load(open(params_path, "r"))["build_neighbors"]
+        return params
+    except FileNotFoundError:
+        logger.error(
+            f"{file_name} -> load_params function: Params File does not exists at specified location"
+        )
+        raise
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> load_params function"
+        )
+        raise
+
+
+def load_matrix(local_sparse_path: str):
+    # written by the build_index stage, the published copy is only for the app
+    try:
+        matrix = load_npz(local_sparse_path)
+        logger.info(f"recommendation matrix loaded: {matrix.shape[0]} rows, {matrix.nnz} non zeros")
+        return matrix
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> load_matrix function"
+        )
+        raise
+
+
+def build_table(matrix, k: int, block_mb: float) -> dict:
+    try:
+        table = build_neighbor_table(matrix, k=k, block_mb=block_mb)
+        logger.info(f"top-{table['indices'].shape[1]} neighbors computed for {table['indices'].shape[0]} rows")
+        return table
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> build_table function"
+        )
+        raise
+
+
+def save_table(table: dict, local_dir: str) -> None:
+    try:
+        n_bytes = save_neighbor_table(table, local_dir)
+        logger.info(f"neighbor table saved ({n_bytes / 1e6:.1f} MB)")
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> save_table function"
+        )
+        raise
+
+
+def main() -> None:
+    try:
+        params = load_params(params_path="params.yaml")
+        matrix = load_matrix(local_sparse_path="models/recommendation/matrix.npz")
+        table = build_table(matrix=matrix, k=params["k"], block_mb=params["block_mb"])
+        save_table(table=table, local_dir="models/neighbors")
+        logger.info("main function executed")
+    except Exception:
+        logger.error(f"Some unexpected error occured in {file_name} -> main function")
+        raise
+
+
+if __name__ == "__main__":
+    main()
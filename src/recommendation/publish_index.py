@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+import boto3
+from dotenv import load_dotenv
+
+# the artifact names are the ones the app's flat imports read back
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "FastApi_app"))
+from artifact_cache import file_md5  # noqa: E402
+from embedding import EMBEDDING_ARRAYS  # noqa: E402
+from load_recommendation_artifacts import CURRENT_BUILD_KEY  # noqa: E402
+from matrix_store import matrix_files  # noqa: E402
+from neighbor_table import NEIGHBOR_ARRAYS  # noqa: E402
+
+load_dotenv()
+
+logger = logging.getLogger(name=os.path.basename(__file__))
+logger.setLevel(level="DEBUG")
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(level="DEBUG")
+
+file_handler = logging.FileHandler("reports/errors.log")
+file_handler.setLevel(level="DEBUG")
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(file_handler)
+logger.addHandler(console_handler)
+
+file_name = os.path.basename(__file__)
+
+BUCKET = "recommendation-system-artifacts"
+BUILDS_PREFIX = "artifacts/builds"
+
+
+def s3_client():
+    return boto3.client(
+        "s3",
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        region_name=os.getenv("REGION_NAME"),
+    )
+
+
+def build_files(index_dir: str, neighbors_dir: str, ann_path: str, embedding_dir: str) -> dict:
+    """
+    {key under the build prefix: local path} for everything one build serves.
+
+    The matrix, transformer and memory-mapped store are required; the
+    neighbor table, ANN index and embedding are published when their stage
+    produced them.
+    """
+    try:
+        store_dir = os.path.join(index_dir, "matrix_mmap")
+        files = {
+            "transformed_df.npz": os.path.join(index_dir, "matrix.npz"),
+            "recommendation_transformer.joblib": os.path.join(index_dir, "transformer.joblib"),
+            "row_car_ids.npy": os.path.join(index_dir, "row_car_ids.npy"),
+        }
+        files.update({f"matrix_mmap/{name}": os.path.join(store_dir, name) for name in matrix_files(store_dir)})
+        optional = {f"neighbors/{name}.npy": os.path.join(neighbors_dir, f"{name}.npy") for name in NEIGHBOR_ARRAYS}
+        optional["ann_index.npz"] = ann_path
+        optional.update({f"embedding/{name}.npy": os.path.join(embedding_dir, f"{name}.npy") for name in EMBEDDING_ARRAYS})
+        files.update({key: path for key, path in optional.items() if os.path.exists(path)})
+        missing = [path for path in files.values() if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"Recommendation artifacts missing: {missing}")
+        return files
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> build_files function"
+        )
+        raise
+
+
+def build_id(files: dict) -> str:
+    # same artifacts, same id: publishing an unchanged build again changes nothing the app sees
+    digest = hashlib.sha256()
+    for key in sorted(files):
+        digest.update(f"{key}:{file_md5(files[key])}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def publish_build(s3, bucket: str, files: dict, built_at: float = None) -> dict:
+    """
+    Upload a build under its own prefix, then point artifacts/current.json at it.
+
+    A build prefix is never written again once the pointer names it, and the
+    pointer is written last, so the app either sees the previous build or
+    every file of this one. Returns the pointer.
+    """
+    try:
+        build = {"build_id": build_id(files), "built_at": built_at}
+        build["prefix"] = f"{BUILDS_PREFIX}/{build['build_id']}"
+        for key, local_path in files.items():
+            s3.upload_file(local_path, bucket, f"{build['prefix']}/{key}")
+        build["published_at"] = time.time()
+        s3.put_object(Bucket=bucket, Key=CURRENT_BUILD_KEY, Body=json.dumps(build).encode())
+        logger.info(f"recommendation build {build['build_id']} published, {len(files)} files under {build['prefix']}")
+        return build
+    except Exception:
+        logger.error(
+            f"Some unexpected error occured in {file_name} -> publish_build function"
+        )
+        raise
+
+
+def main() -> None:
+    try:
+        with open("models/recommendation/build.json") as f:
+            built_at = json.load(f)["started_at"]
+        files = build_files(index_dir="models/recommendation", neighbors_dir="models/neighbors",
+                            ann_path="models/ann_index.npz", embedding_dir="models/embedding")
+        build = publish_build(s3_client(), BUCKET, files, built_at=built_at)
+        with open("reports/recommendation_build.json", "w") as f:
+            json.dump(build, f, indent=4)
+        logger.info("main function executed")
+    except Exception:
+        logger.error(f"Some unexpected error occured in {file_name} -> main function")
+        raise
+
+
+if __name__ == "__main__":
+    main()
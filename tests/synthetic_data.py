@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+BRANDS = {
+    "Toyota": ["Camry", "Corolla", "RAV4"],
+    "Tesla": ["Model 3", "Model Y"],
+    "Ford": ["F-150", "Mustang", "Explorer"],
+    "BMW": ["X5", "330i"],
+    "Audi": ["A4", "Q5"],
+}
+COLORS = ["Gray", "Black", "White", "Silver", "Blue", "Red"]
+CITIES = ["austin", "dallas", "miami", "denver", "seattle"]
+STATES = ["texas", "florida", "colorado", "washington"]
+
+
+def make_prediction_inputs(n_rows: int, seed: int = 0) -> list:
+    """Random cars as dicts that validate against schemas.PredictionInputSchema."""
+    rng = np.random.default_rng(seed)
+    cars = []
+    for _ in range(n_rows):
+        brand = rng.choice(list(BRANDS))
+        electric = brand == "Tesla"
+        cars.append({
+            "Model_Year": int(rng.integers(2005, 2025)),
+            "Brand_Name": str(brand),
+            "Model_Name": str(rng.choice(BRANDS[brand])),
+            "Stock_Type": str(rng.choice(["New", "Used", "Certified"])),
+            "Mileage": int(rng.integers(0, 150000)),
+            "Exterior_Color": str(rng.choice(COLORS)),
+            "Interior_Color": str(rng.choice(COLORS)),
+            "Drivetrain": str(rng.choice(["AWD", "4WD", "FWD", "RWD"])),
+            "Km_per_l": 0.0 if electric else float(rng.integers(6, 20)),
+            "Fuel_Type": "Electric" if electric else str(rng.choice(["Gasoline", "Hybrid", "Diesel"])),
+            "Accidents_Or_Damage": bool(rng.integers(0, 2)),
+            "Clean_Title": bool(rng.integers(0, 2)),
+            "One_Owner_Vehicle": bool(rng.integers(0, 2)),
+            "Personal_Use_Only": bool(rng.integers(0, 2)),
+            "Level2_Charging": float(rng.integers(4, 12)) if electric else 0.0,
+            "Dc_Fast_Charging": float(rng.integers(20, 60)) if electric else 0.0,
+            "Battery_Capacity": float(rng.integers(50, 100)) if electric else 0.0,
+            "Expected_Range": float(rng.integers(200, 400)) if electric else 0.0,
+            "Gear_Spec": 1 if electric else int(rng.choice([5, 6, 8])),
+            "Engine_Size": 0.0 if electric else float(rng.choice([1.5, 2.0, 2.5, 3.5, 5.0])),
+            "Cylinder_Config": "NA" if electric else str(rng.choice(["I4", "V6", "V8"])),
+            "Valves": 0 if electric else int(rng.choice([16, 24, 32])),
+            "Km_L_e_City": float(rng.integers(40, 60)) if electric else 0.0,
+            "Km_L_e_Hwy": float(rng.integers(35, 55)) if electric else 0.0,
+            "City": str(rng.choice(CITIES)),
+            "STATE": str(rng.choice(STATES)),
+        })
+    return cars
+
+
+def make_training_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic stand-in for data/raw/train.parquet (model column names plus Price)."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(make_prediction_inputs(n_rows, seed)).rename(columns={
+        "Km_per_l": "Km/L",
+        "Km_L_e_City": "Km/L_e_City",
+        "Km_L_e_Hwy": "Km/L_e_Hwy",
+    })
+    df["Price"] = (
+        60000
+        - 2.5 * (2025 - df["Model_Year"]) * 1000
+        - 0.1 * df["Mileage"]
+        + 5000 * df["Engine_Size"]
+        + rng.normal(0, 2000, n_rows)
+    ).round(2)
+    return df
+
+
+# one-hot cardinalities, tf-idf vocabulary sizes and numeric width of the recommendation transformer output
+RECOMMENDATION_CATEGORIES = [60, 3, 4, 5, 2, 2, 8, 6, 5, 50]
+RECOMMENDATION_VOCABULARIES = [3000, 2000]
+RECOMMENDATION_NUMERIC = 12
+
+
+def make_recommendation_matrix(n_rows: int, seed: int = 0):
+    """Sparse stand-in for transformed_df.npz: one-hot blocks, two tf-idf blocks and min-max scaled numerics."""
+    rng = np.random.default_rng(seed)
+    indices, data, offset = [], [], 0
+    for cardinality in RECOMMENDATION_CATEGORIES:
+        # skewed popularity, like real brands and states
+        weights = 1 / np.arange(1, cardinality + 1)
+        indices.append(offset + rng.choice(cardinality, size=(n_rows, 1), p=weights / weights.sum()))
+        data.append(np.ones((n_rows, 1)))
+        offset += cardinality
+    for vocabulary in RECOMMENDATION_VOCABULARIES:
+        indices.append(offset + rng.choice(vocabulary, size=(n_rows, 3)))
+        data.append(rng.uniform(0.2, 0.8, size=(n_rows, 3)))
+        offset += vocabulary
+    indices.append(offset + np.tile(np.arange(RECOMMENDATION_NUMERIC), (n_rows, 1)))
+    data.append(rng.random((n_rows, RECOMMENDATION_NUMERIC)))
+    offset += RECOMMENDATION_NUMERIC
+
+    indices, data = np.hstack(indices), np.hstack(data)
+    indptr = np.arange(n_rows + 1) * indices.shape[1]
+    matrix = sparse.csr_matrix((data.ravel(), indices.ravel(), indptr), shape=(n_rows, offset))
+    # repeated tf-idf terms are merged, which also sorts the column indices
+    matrix.sum_duplicates()
+    return matrix
+
+
+def make_catalog_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic listings with an id and the columns the recommendation transformer reads, like the Car table."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(make_prediction_inputs(n_rows, seed)).drop(
+        columns=["Exterior_Color", "Interior_Color", "Level2_Charging", "City", "STATE"]
+    )
+    df["One_Owner_Vehicle"] = df["One_Owner_Vehicle"].map({True: "yes", False: "no"})
+    df["Personal_Use_Only"] = df["Personal_Use_Only"].map({True: "yes", False: "no"})
+    df["Seller_Name"] = [f"{rng.choice(['Premier', 'Budget', 'City', 'Sunset'])} Motors {i % 40}" for i in range(n_rows)]
+    df["ST"] = rng.choice(["TX", "FL", "CO", "WA"], n_rows)
+    df["Price"] = rng.integers(5000, 90000, n_rows).astype(float)
+    df.insert(0, "id", np.arange(1, n_rows + 1))
+    return df
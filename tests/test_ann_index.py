@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+from ann_index import IVFIndex, build_ann_index, load_ann_index, save_ann_index
+from neighbor_table import normalized_rows, similarity_scores, top_k_indices
+from synthetic_data import make_recommendation_matrix
+
+
+class TestIVFIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.matrix = make_recommendation_matrix(5000, seed=0)
+        cls.queries = make_recommendation_matrix(30, seed=1)
+        cls.normalized_t = normalized_rows(cls.matrix).T.tocsr()
+        cls.index = build_ann_index(cls.matrix, n_iter=5, seed=0)
+
+    def exact(self, query, k):
+        scores = similarity_scores(query, self.normalized_t)
+        top = top_k_indices(scores, k)
+        return top, scores[top]
+
+    def test_lists_partition_every_row(self):
+        self.assertEqual(len(self.index["centroids"]), int(np.sqrt(5000)))
+        np.testing.assert_array_equal(np.sort(self.index["row_ids"]), np.arange(5000))
+        self.assertEqual(self.index["list_offsets"][-1], 5000)
+
+    def test_probing_every_list_is_exact(self):
+        ivf = IVFIndex(self.index, self.matrix)
+        for row in range(self.queries.shape[0]):
+            query = self.queries[row:row + 1]
+            ids, scores = ivf.search(query, 6, n_probe=ivf.n_lists)
+            expected_ids, expected_scores = self.exact(query, 6)
+            np.testing.assert_array_equal(ids, expected_ids)
+            np.testing.assert_array_equal(scores, expected_scores)
+
+    def test_recall_grows_with_probes(self):
+        ivf = IVFIndex(self.index, self.matrix)
+        recalls = []
+        for n_probe in (1, 8):
+            hits = 0
+            for row in range(self.queries.shape[0]):
+                query = self.queries[row:row + 1]
+                hits += len(set(ivf.search(query, 5, n_probe)[0]) & set(self.exact(query, 5)[0]))
+            recalls.append(hits / (5 * self.queries.shape[0]))
+        self.assertLess(recalls[0], recalls[1])
+        self.assertGreater(recalls[1], 0.8)
+
+    def test_save_load_and_stale_matrix(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ann_index.npz")
+            save_ann_index(self.index, path)
+            loaded = load_ann_index(path)
+        ivf = IVFIndex(loaded, self.matrix, n_probe=4)
+        query = self.queries[:1]
+        np.testing.assert_array_equal(ivf.search(query, 5)[0], IVFIndex(self.index, self.matrix).search(query, 5, 4)[0])
+        with self.assertRaises(ValueError):
+            IVFIndex(loaded, self.matrix[:100])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+import artifact_cache
+
+
+class LocalS3:
+    """Stand-in for the boto3 S3 client backed by a directory: head_object, download_file and upload_file."""
+
+    def __init__(self, root):
+        self.root = root
+        self.offline = False
+        self.corrupt = False
+        self.downloads = []
+        self.lock = threading.Lock()
+
+    def path(self, bucket, key):
+        return os.path.join(self.root, bucket, key)
+
+    def put(self, bucket, key, body: bytes):
+        os.makedirs(os.path.dirname(self.path(bucket, key)), exist_ok=True)
+        with open(self.path(bucket, key), "wb") as f:
+            f.write(body)
+
+    def check_online(self):
+        if self.offline:
+            raise EndpointConnectionError(endpoint_url="https://s3.local")
+
+    def head_object(self, Bucket, Key):
+        self.check_online()
+        if not os.path.exists(self.path(Bucket, Key)):
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        with open(self.path(Bucket, Key), "rb") as f:
+            body = f.read()
+        return {"ETag": f'"{hashlib.md5(body).hexdigest()}"', "ContentLength": len(body)}
+
+    def download_file(self, Bucket, Key, Filename):
+        self.check_online()
+        with self.lock:
+            self.downloads.append(Key)
+        shutil.copyfile(self.path(Bucket, Key), Filename)
+        if self.corrupt:
+            with open(Filename, "r+b") as f:
+                f.write(b"X")
+
+    def upload_file(self, Filename, Bucket, Key):
+        with open(Filename, "rb") as f:
+            self.put(Bucket, Key, f.read())
+
+
+class TestArtifactCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.s3 = LocalS3(os.path.join(self.tmp, "s3"))
+        self.s3.put("bucket", "artifacts/matrix.npz", b"matrix-v1")
+        self.s3.put("bucket", "artifacts/transformer.joblib", b"transformer-v1")
+        self.cache_dir = os.path.join(self.tmp, "cache")
+        self.matrix_path = os.path.join(self.cache_dir, "matrix.npz")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_warm_cache_is_not_downloaded_again(self):
+        artifact_cache.fetch_object(self.s3, "bucket", "artifacts/matrix.npz", self.matrix_path)
+        artifact_cache.fetch_object(self.s3, "bucket", "artifacts/matrix.npz", self.matrix_path)
+        self.assertEqual(self.s3.downloads, ["artifacts/matrix.npz"])
+        self.assertEqual(self.read(self.matrix_path), b"matrix-v1")
+
+    def test_changed_object_is_downloaded(self):
+        artifact_cache.fetch_object(self.s3, "bucket", "artifacts/matrix.npz", self.matrix_path)
+        self.s3.put("bucket", "artifacts/matrix.npz", b"matrix-v2")
+        artifact_cache.fetch_object(self.s3, "bucket", "artifacts/matrix.npz", self.matrix_path)
+        self.assertEqual(len(self.s3.downloads), 2)
+        self.assertEqual(self.read(self.matrix_path), b"matrix-v2")
+
+    def test_locally_modified_file_is_replaced(self):
+        artifact_cache.fetch_object(self.s3, "bucket", "artifacts/matrix.npz", self.matrix_path)
+        with open(self.matrix_path, "ab") as f:
+            f.write(b"garbage")
+        artifact_cache.fetch_object(self.s3, "bucket", "artifacts/matrix.npz", self.matrix_path)
+        self.assertEqual(self.read(self.matrix_path), b"matrix-v1")
+
+    def test_offline_uses_the_warm_cache(self):
+        artifact_cache.fetch_object(self.s3, "bucket", "artifacts/matrix.npz", self.matrix_path)
+        self.s3.offline = True
+        artifact_cache.fetch_object(self.s3, "bucket", "artifacts/matrix.npz", self.matrix_path)
+        self.assertEqual(self.read(self.matrix_path), b"matrix-v1")
+
+    def test_offline_with_a_cold_cache_fails(self):
+        self.s3.offline = True
+        with self.assertRaises(EndpointConnectionError):
+            artifact_cache.fetch_object(self.s3, "bucket", "artifacts/matrix.npz", self.matrix_path)
+
+    def test_missing_object_raises_client_error(self):
+        with self.assertRaises(ClientError):
+            artifact_cache.fetch_object(self.s3, "bucket", "artifacts/missing.npz", self.matrix_path)
+
+    def test_corrupt_download_is_never_placed(self):
+        artifact_cache.fetch_object(self.s3, "bucket", "artifacts/matrix.npz", self.matrix_path)
+        self.s3.put("bucket", "artifacts/matrix.npz", b"matrix-v2")
+        self.s3.corrupt = True
+        with self.assertRaises(IOError):
+            artifact_cache.fetch_object(self.s3, "bucket", "artifacts/matrix.npz", self.matrix_path)
+        self.assertEqual(self.read(self.matrix_path), b"matrix-v1")
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ["matrix.npz", "matrix.npz.etag.json"])
+
+    def test_fetch_objects(self):
+        transformer_path = os.path.join(self.cache_dir, "transformer.joblib")
+        paths = artifact_cache.fetch_objects(self.s3, "bucket", {
+            "artifacts/matrix.npz": self.matrix_path,
+            "artifacts/transformer.joblib": transformer_path,
+        })
+        self.assertEqual(paths["artifacts/transformer.joblib"], transformer_path)
+        self.assertEqual(self.read(transformer_path), b"transformer-v1")
+        self.assertEqual(sorted(self.s3.downloads), ["artifacts/matrix.npz", "artifacts/transformer.joblib"])
+
+    def test_uploaded_file_counts_as_cached(self):
+        os.makedirs(self.cache_dir)
+        with open(self.matrix_path, "wb") as f:
+            f.write(b"matrix-v3")
+        self.s3.upload_file(self.matrix_path, "bucket", "artifacts/matrix.npz")
+        artifact_cache.record_upload(self.s3, "bucket", "artifacts/matrix.npz", self.matrix_path)
+        artifact_cache.fetch_object(self.s3, "bucket", "artifacts/matrix.npz", self.matrix_path)
+        self.assertEqual(self.s3.downloads, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
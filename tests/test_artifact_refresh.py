@@ -0,0 +1,166 @@
+import hashlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from botocore.exceptions import ClientError
+from scipy import sparse
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+from src.recommendation.build_index import RECOMMENDATION_COLUMNS, create_transformer, save_artifacts
+from src.recommendation.publish_index import build_files, publish_build
+import load_recommendation_artifacts
+import recommend
+from synthetic_data import make_catalog_frame
+
+
+class DirectoryS3:
+    """Just the S3 calls the publish stage and the artifact cache make, objects are files under `root`."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def upload_file(self, local_path, bucket, key):
+        os.makedirs(os.path.dirname(self._path(key)), exist_ok=True)
+        shutil.copyfile(local_path, self._path(key))
+
+    def put_object(self, Bucket, Key, Body):
+        os.makedirs(os.path.dirname(self._path(Key)), exist_ok=True)
+        with open(self._path(Key), "wb") as f:
+            f.write(Body)
+
+    def head_object(self, Bucket, Key):
+        if not os.path.exists(self._path(Key)):
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        with open(self._path(Key), "rb") as f:
+            return {"ETag": f'"{hashlib.md5(f.read()).hexdigest()}"', "ContentLength": os.path.getsize(self._path(Key))}
+
+    def download_file(self, bucket, key, local_path):
+        shutil.copyfile(self._path(key), local_path)
+
+    def listing(self):
+        objects = {}
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                with open(os.path.join(directory, name), "rb") as f:
+                    objects[os.path.relpath(os.path.join(directory, name), self.root)] = hashlib.md5(f.read()).hexdigest()
+        return objects
+
+
+QUERY_IDS = [3, 40, 77]
+
+
+def catalog_cars(catalog):
+    return {int(row["id"]): SimpleNamespace(**row) for row in catalog.to_dict("records")}
+
+
+def serve(cars, published, results):
+    # one serving process: load what the pointer names, then pick up the next build when told to
+    cars = [cars[car_id] for car_id in QUERY_IDS]
+    recommend.get_artifacts()
+    results.put(("loaded", os.getpid(), recommend.artifacts_build(), [recommend.recommend_car_idx(car) for car in cars]))
+    published.wait(30)
+    recommend.check_for_new_build()
+    results.put(("refreshed", os.getpid(), recommend.artifacts_build(), [recommend.recommend_car_idx(car) for car in cars]))
+
+
+class TestArtifactRefresh(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.s3 = DirectoryS3(os.path.join(self.tmp, "bucket"))
+        self.catalog = make_catalog_frame(300, seed=5)
+        self.cars = catalog_cars(self.catalog)
+        patches = [
+            mock.patch("builtins.print"),
+            mock.patch.object(load_recommendation_artifacts, "s3_client", lambda: self.s3),
+            mock.patch.object(load_recommendation_artifacts, "ARTIFACT_DIR", os.path.join(self.tmp, "cache")),
+            mock.patch.multiple(recommend, df=None, transformer=None, query_vectorizer=None, neighbor_table=None,
+                                normalized=None, normalized_t=None, ivf_index=None, embedding_index=None,
+                                attribute_index=None, live_catalog=None, loaded_build=None,
+                                RECOMMENDATION_MATRIX_FORMAT="mmap", RECOMMENDATION_MODE="sparse"),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def publish(self, catalog, name, built_at=None):
+        # what build_index writes for `catalog`, published like the publish_index stage does
+        transformer = create_transformer().fit(catalog[RECOMMENDATION_COLUMNS])
+        ids = catalog["id"].to_numpy()
+        rows = sparse.csr_matrix(transformer.transform(catalog[RECOMMENDATION_COLUMNS])).tocoo()
+        matrix = sparse.csr_matrix((rows.data, (ids[rows.row], rows.col)), shape=(int(ids.max()) + 1, rows.shape[1]))
+        row_car_ids = np.full(matrix.shape[0], -1, dtype=np.int64)
+        row_car_ids[ids] = ids
+        index_dir = os.path.join(self.tmp, name)
+        save_artifacts(matrix, transformer, row_car_ids, index_dir)
+        missing = os.path.join(self.tmp, "not_built")
+        files = build_files(index_dir, missing, os.path.join(missing, "ann_index.npz"), missing)
+        return publish_build(self.s3, "bucket", files, built_at=built_at)
+
+    def test_every_process_moves_to_the_published_build(self):
+        build_a = self.publish(self.catalog, "a")
+        context = multiprocessing.get_context("fork")
+        published, results = context.Event(), context.Queue()
+        processes = [context.Process(target=serve, args=(self.cars, published, results)) for _ in range(2)]
+        for process in processes:
+            process.start()
+        loaded = [results.get(timeout=60) for _ in processes]
+
+        # the next build drops some listings and reprices the rest
+        changed = self.catalog[~self.catalog["id"].isin([10, 11, 12])].copy()
+        changed["Price"] = changed["Price"][::-1].to_numpy()
+        build_b = self.publish(changed, "b")
+        bucket = self.s3.listing()
+        published.set()
+        refreshed = [results.get(timeout=60) for _ in processes]
+        for process in processes:
+            process.join(30)
+            self.assertEqual(process.exitcode, 0)
+
+        self.assertNotEqual(build_a["build_id"], build_b["build_id"])
+        self.assertEqual({(stage, build_id) for stage, _, build_id, _ in loaded}, {("loaded", build_a["build_id"])})
+        self.assertEqual({(stage, build_id) for stage, _, build_id, _ in refreshed}, {("refreshed", build_b["build_id"])})
+        self.assertEqual(len({pid for _, pid, _, _ in refreshed}), 2)
+        # both processes serve the same recommendations from the same build, and they changed with it
+        self.assertEqual(refreshed[0][3], refreshed[1][3])
+        self.assertNotEqual(loaded[0][3], refreshed[0][3])
+        self.assertTrue(all(car_id not in (10, 11, 12) for recommendations in refreshed[0][3] for car_id in recommendations))
+        # serving processes only read the bucket
+        self.assertEqual(self.s3.listing(), bucket)
+
+    def test_writes_after_the_build_started_carry_over(self):
+        self.publish(self.catalog, "a")
+        recommend.get_artifacts()
+        recommend.on_car_write("delete", 10)
+        started_at = time.time()
+        repriced = SimpleNamespace(**dict(vars(self.cars[20]), Price=1.0))
+        recommend.on_car_write("update", 20, repriced)
+        recommend.on_car_write("delete", 21)
+
+        build_b = self.publish(self.catalog[self.catalog["id"] != 10], "b", built_at=started_at)
+        self.assertEqual(recommend.check_for_new_build(), build_b["build_id"])
+        snapshot = recommend.live_catalog.snapshot()
+        # the delete of 10 happened before the build read the catalog, it is not applied again
+        np.testing.assert_array_equal(snapshot["ids"], [20])
+        np.testing.assert_array_equal(snapshot["tombstoned"], [20, 21])
+        self.assertEqual(snapshot["attributes"][0]["Price"], 1.0)
+        self.assertIsNone(recommend.check_for_new_build())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+from attribute_index import AttributeIndex
+
+
+def make_catalog(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Brand_Name": rng.choice(["Audi", "BMW", "Tesla", "Toyota"], n_rows),
+        "Drivetrain": rng.choice(["AWD", "FWD"], n_rows),
+        "Fuel_Type": rng.choice(["Gasoline", "Electric", "Hybrid"], n_rows),
+        "Stock_Type": rng.choice(["New", "Used", "Certified"], n_rows),
+        "ST": rng.choice(["TX", "CA", "NY", "WA"], n_rows),
+        "Model_Name": rng.choice(["Model 3 Long Range", "A4 Premium", "Camry SE", "X5 xDrive"], n_rows),
+        "Mileage": rng.integers(0, 100000, n_rows).astype(float),
+        "Price": rng.integers(5000, 90000, n_rows).astype(float),
+    })
+
+
+class TestAttributeIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.catalog = make_catalog(600, seed=0)
+        cls.catalog.loc[7, "Price"] = 30000.0
+        transformer = ColumnTransformer(transformers=[
+            ("ohe", OneHotEncoder(), ["Brand_Name", "Drivetrain", "Fuel_Type", "Stock_Type", "ST"]),
+            ("tfidf_model", TfidfVectorizer(), "Model_Name"),
+            ("norm", MinMaxScaler(), ["Mileage", "Price"]),
+        ])
+        matrix = transformer.fit_transform(cls.catalog)
+        cls.index = AttributeIndex.from_matrix(matrix, transformer)
+
+    def expected(self, mask):
+        return np.flatnonzero(mask.to_numpy())
+
+    def test_single_and_multi_value_filters(self):
+        np.testing.assert_array_equal(
+            self.index.candidates({"Fuel_Type": "Electric"}), self.expected(self.catalog.Fuel_Type == "Electric")
+        )
+        np.testing.assert_array_equal(
+            self.index.candidates({"ST": ["tx", "NY"], "Stock_Type": "Used"}),
+            self.expected(self.catalog.ST.isin(["TX", "NY"]) & (self.catalog.Stock_Type == "Used")),
+        )
+
+    def test_price_range_is_inclusive(self):
+        candidates = self.index.candidates({"Brand_Name": "Tesla"}, min_price=20000, max_price=30000)
+        mask = (self.catalog.Brand_Name == "Tesla") & self.catalog.Price.between(20000, 30000)
+        np.testing.assert_array_equal(candidates, self.expected(mask))
+        self.assertIn(7, self.index.candidates(max_price=30000))
+        self.assertNotIn(7, self.index.candidates(max_price=29999.99))
+
+    def test_unknown_values_and_fields(self):
+        self.assertEqual(len(self.index.candidates({"Brand_Name": "Lada"})), 0)
+        np.testing.assert_array_equal(self.index.candidates(), np.arange(600))
+        with self.assertRaises(ValueError):
+            self.index.candidates({"Drivetrain": "AWD"})
+
+
+if __name__ == "__main__":
+    unittest.main()
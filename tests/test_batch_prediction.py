@@ -0,0 +1,98 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+import prediction
+from synthetic_data import make_prediction_inputs
+
+
+class MileageModel:
+    """Stands in for the pipeline, the price of a car is its mileage so every row can be traced back."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, frame):
+        self.calls.append(len(frame))
+        return frame["Mileage"].to_numpy() / 2
+
+
+class KnownBrandsModel(MileageModel):
+    """Fails the whole frame on a brand it was not fitted on, like the pipeline's encoder does."""
+
+    def __init__(self, brands):
+        super().__init__()
+        self.brands = set(brands)
+
+    def predict(self, frame):
+        unknown = set(frame["Brand_Name"]) - self.brands
+        if unknown:
+            self.calls.append(len(frame))
+            raise ValueError(f"Found unknown categories {sorted(unknown, key=str)} in column 'Brand_Name'")
+        return super().predict(frame)
+
+
+@mock.patch.object(prediction, "PREDICTION_ENGINE", "sklearn")
+class TestScoreBatch(unittest.TestCase):
+    def setUp(self):
+        self.batch = make_prediction_inputs(6, seed=11)
+        self.model = MileageModel()
+
+    def test_rows_come_back_in_input_order(self):
+        rows = prediction.score_batch(self.batch, self.model)
+        self.assertEqual([row.index for row in rows], list(range(6)))
+        self.assertEqual([row.Price for row in rows], [round(car["Mileage"] / 2, 2) for car in self.batch])
+        self.assertEqual(self.model.calls, [6])
+
+    def test_invalid_rows_get_errors_and_the_rest_are_scored(self):
+        self.batch[1] = dict(self.batch[1], Model_Year="not a year")
+        self.batch[4] = dict(self.batch[4], Fuel_Type="Steam")
+        rows = prediction.score_batch(self.batch, self.model)
+        self.assertEqual([row.index for row in rows], list(range(6)))
+        for idx in (1, 4):
+            self.assertIsNone(rows[idx].Price)
+            self.assertTrue(rows[idx].errors)
+        self.assertEqual({err["loc"][0] for err in rows[1].errors}, {"Model_Year"})
+        self.assertEqual([rows[idx].Price for idx in (0, 2, 3, 5)], [round(self.batch[idx]["Mileage"] / 2, 2) for idx in (0, 2, 3, 5)])
+        self.assertEqual(self.model.calls, [4])
+
+    def test_all_invalid_rows_skip_the_model(self):
+        rows = prediction.score_batch([{"Fuel_Type": "Steam"}, {"Mileage": "far"}], self.model)
+        self.assertTrue(all(row.errors and row.Price is None for row in rows))
+        self.assertEqual(self.model.calls, [])
+
+    def test_partial_rows_get_errors_and_the_rest_are_scored(self):
+        model = KnownBrandsModel(car["Brand_Name"] for car in self.batch)
+        batch = self.batch[:2] + [{"Mileage": 1000}] + self.batch[2:]
+        rows = prediction.score_batch(batch, model)
+        self.assertIsNone(rows[2].Price)
+        missing = {err["loc"][0] for err in rows[2].errors}
+        self.assertIn("Brand_Name", missing)
+        self.assertNotIn("Mileage", missing)
+        self.assertEqual([row.Price for row in rows[:2] + rows[3:]], [round(car["Mileage"] / 2, 2) for car in self.batch])
+        self.assertTrue(all(row.errors is None for row in rows[:2] + rows[3:]))
+        self.assertEqual(model.calls, [6])
+
+    def test_rows_the_model_rejects_are_scored_one_at_a_time(self):
+        model = KnownBrandsModel(car["Brand_Name"] for car in self.batch[1:])
+        self.batch[0] = dict(self.batch[0], Brand_Name="Zzzbrand")
+        rows = prediction.score_batch(self.batch, model)
+        self.assertIsNone(rows[0].Price)
+        self.assertIn("Zzzbrand", rows[0].errors[0]["msg"])
+        self.assertEqual([row.Price for row in rows[1:]], [round(car["Mileage"] / 2, 2) for car in self.batch[1:]])
+        self.assertEqual(model.calls, [6] + [1] * 6)
+
+    def test_batch_size_limit(self):
+        with mock.patch.object(prediction, "MAX_BATCH_PREDICTION_ROWS", 5):
+            with self.assertRaises(ValueError):
+                prediction.score_batch(self.batch, self.model)
+            self.assertEqual(len(prediction.score_batch(self.batch[:5], self.model)), 5)
+        self.assertEqual(self.model.calls, [5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+from batcher import PredictionBatcher
+
+
+class TestPredictionBatcher(unittest.TestCase):
+    def test_concurrent_requests_are_coalesced(self):
+        calls = []
+
+        def predict_fn(items):
+            calls.append(list(items))
+            time.sleep(0.01)
+            return [item * 2 for item in items]
+
+        batcher = PredictionBatcher(predict_fn=predict_fn, window_ms=20, max_batch_size=64)
+        results = {}
+
+        def worker(i):
+            results[i] = batcher.predict(i, timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(32)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, {i: i * 2 for i in range(32)})
+        self.assertLess(len(calls), 32)
+        snapshot = batcher.metrics.snapshot()
+        self.assertEqual(snapshot["rows"], 32)
+        self.assertEqual(snapshot["batches"], len(calls))
+
+    def test_max_batch_size_is_respected(self):
+        calls = []
+        release = threading.Event()
+
+        def predict_fn(items):
+            release.wait(5)
+            calls.append(len(items))
+            return items
+
+        batcher = PredictionBatcher(predict_fn=predict_fn, window_ms=50, max_batch_size=4)
+        futures = [batcher.submit(i) for i in range(10)]
+        release.set()
+        self.assertEqual([f.result(timeout=5) for f in futures], list(range(10)))
+        self.assertTrue(all(size <= 4 for size in calls))
+
+    def test_errors_are_propagated_to_every_caller(self):
+        def predict_fn(items):
+            raise ValueError("model not loaded")
+
+        batcher = PredictionBatcher(predict_fn=predict_fn, window_ms=1)
+        with self.assertRaises(ValueError):
+            batcher.predict(1, timeout=5)
+        self.assertEqual(batcher.metrics.snapshot()["failed_batches"], 1)
+
+    def coalesced(self, batcher, items):
+        # holds the worker on a first request so the rest queue up into one batch
+        release = threading.Event()
+        predict_fn = batcher.predict_fn
+        batcher.predict_fn = lambda batch: release.wait(5) and predict_fn(batch)
+        first = batcher.submit(items[0])
+        time.sleep(0.05)
+        batcher.predict_fn = predict_fn
+        futures = [batcher.submit(item) for item in items[1:]]
+        release.set()
+        return [first] + futures
+
+    def test_a_bad_row_only_fails_its_own_caller(self):
+        calls = []
+
+        def predict_fn(items):
+            calls.append(len(items))
+            if "bad" in items:
+                raise ValueError("unknown category")
+            return [item * 2 for item in items]
+
+        batcher = PredictionBatcher(predict_fn=predict_fn, window_ms=50, max_batch_size=64)
+        futures = self.coalesced(batcher, [0, 1, "bad", 3])
+        self.assertEqual([futures[i].result(timeout=5) for i in (0, 1, 3)], [0, 2, 6])
+        with self.assertRaises(ValueError):
+            futures[2].result(timeout=5)
+        self.assertIn(3, calls)
+        self.assertEqual(batcher.metrics.snapshot()["failed_batches"], 1)
+
+    def test_missing_results_fail_the_callers_instead_of_hanging(self):
+        batcher = PredictionBatcher(predict_fn=lambda items: items[:-1], window_ms=50, max_batch_size=64)
+        futures = self.coalesced(batcher, [1, 2, 3])
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
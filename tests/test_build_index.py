@@ -0,0 +1,75 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+from src.recommendation.build_index import (
+    RECOMMENDATION_COLUMNS, create_transformer, fit_transformer, read_chunks, save_artifacts, transform_catalog
+)
+from matrix_store import load_matrix_mmap
+from synthetic_data import make_catalog_frame
+
+
+class TestBuildIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.engine = create_engine(f"sqlite:///{os.path.join(cls.tmp.name, 'catalog.db')}")
+        cls.catalog = make_catalog_frame(1000, seed=3)
+        # a deleted listing leaves a gap in the ids
+        cls.catalog = cls.catalog[cls.catalog["id"] != 500]
+        cls.catalog.to_sql("Car", cls.engine, index=False)
+        cls.expected = create_transformer().fit(cls.catalog[RECOMMENDATION_COLUMNS])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+        cls.tmp.cleanup()
+
+    def test_chunks_cover_the_table_in_id_order(self):
+        chunks = list(read_chunks(self.engine, "Car", chunk_rows=128))
+        self.assertEqual(len(chunks), 8)
+        ids = np.concatenate([chunk["id"].to_numpy() for chunk in chunks])
+        np.testing.assert_array_equal(ids, self.catalog["id"].to_numpy())
+
+    def test_streaming_fit_matches_a_full_fit(self):
+        transformer, n_rows = fit_transformer(read_chunks(self.engine, "Car", chunk_rows=128))
+        self.assertEqual(n_rows, len(self.catalog))
+        rows = self.catalog[RECOMMENDATION_COLUMNS]
+        np.testing.assert_allclose(transformer.transform(rows).toarray(), self.expected.transform(rows).toarray(), atol=1e-12)
+
+    def test_matrix_rows_line_up_with_car_ids(self):
+        transformer, _ = fit_transformer(read_chunks(self.engine, "Car", chunk_rows=128))
+        matrix, row_car_ids = transform_catalog(read_chunks(self.engine, "Car", chunk_rows=128), transformer, n_jobs=2)
+        self.assertEqual(matrix.shape[0], 1001)
+        self.assertEqual(row_car_ids[0], -1)
+        self.assertEqual(row_car_ids[500], -1)
+        self.assertEqual(row_car_ids[731], 731)
+        self.assertEqual(matrix[[0, 500]].nnz, 0)
+        expected = self.expected.transform(self.catalog[RECOMMENDATION_COLUMNS])
+        np.testing.assert_allclose(matrix[self.catalog["id"].to_numpy()].toarray(), expected.toarray(), atol=1e-12)
+
+    def test_saves_the_memory_mapped_store(self):
+        transformer, _ = fit_transformer(read_chunks(self.engine, "Car", chunk_rows=256))
+        matrix, row_car_ids = transform_catalog(read_chunks(self.engine, "Car", chunk_rows=256), transformer, n_jobs=1)
+        local_dir = os.path.join(self.tmp.name, "recommendation")
+        report_path = os.path.join(self.tmp.name, "matrix_store.json")
+        save_artifacts(matrix, transformer, row_car_ids, local_dir, report_path=report_path)
+
+        store = load_matrix_mmap(os.path.join(local_dir, "matrix_mmap"))
+        np.testing.assert_allclose(store["matrix"].toarray(), matrix.toarray(), rtol=1e-6)
+        prices = store["prices"][self.catalog["id"].to_numpy()]
+        np.testing.assert_allclose(prices, self.catalog["Price"].to_numpy(), atol=0.01)
+        with open(report_path) as f:
+            self.assertEqual(json.load(f)["rows"], matrix.shape[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+import recommend
+import schemas
+from comparables import catalog_value, spec_car
+from live_catalog import LiveCatalog
+from neighbor_table import normalized_rows
+from query_vectorizer import QueryVectorizer
+from recommendation_budget import RecommendationBudget
+from src.recommendation.build_index import RECOMMENDATION_COLUMNS, create_transformer
+from synthetic_data import make_catalog_frame, make_prediction_inputs
+
+
+class TestComparables(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        catalog = make_catalog_frame(2000, seed=7)[RECOMMENDATION_COLUMNS]
+        cls.transformer = create_transformer().fit(catalog)
+        cls.vectorizer = QueryVectorizer.from_column_transformer(cls.transformer)
+        cls.specs = [schemas.PredictionInputSchema.model_validate(car) for car in make_prediction_inputs(50, seed=8)]
+        cls.catalog = catalog
+
+    def test_catalog_value_respells_to_known_categories(self):
+        self.assertEqual(catalog_value(True, {"yes", "no"}), "yes")
+        self.assertEqual(catalog_value(False, {"yes", "no"}), "no")
+        self.assertEqual(catalog_value(16, {"16", "24"}), "16")
+        self.assertEqual(catalog_value("awd", {"AWD", "FWD"}), "AWD")
+        self.assertEqual(catalog_value("Lada", {"Audi"}), "Lada")
+
+    def test_spec_becomes_a_catalog_row(self):
+        spec = self.specs[0].model_copy(update={"STATE": "texas", "Engine_Size": None})
+        car = spec_car(spec, 25000.0, self.vectorizer.categories)
+        self.assertEqual(list(car), RECOMMENDATION_COLUMNS)
+        self.assertEqual(car["ST"], "TX")
+        self.assertEqual(car["Price"], 25000.0)
+        self.assertEqual(car["Seller_Name"], "")
+        self.assertEqual(car["Engine_Size"], 0.0)
+        self.assertIn(car["One_Owner_Vehicle"], {"yes", "no"})
+
+    def test_rows_match_the_transformer(self):
+        for spec in self.specs:
+            car = spec_car(spec, 30000.0, self.vectorizer.categories)
+            expected = sparse.csr_matrix(self.transformer.transform(pd.DataFrame([car])))
+            compiled = self.vectorizer.transform([car], ignore_unknown=True)
+            np.testing.assert_array_equal(compiled.indices, expected.indices)
+            np.testing.assert_array_equal(compiled.data, expected.data)
+
+    def test_unknown_categories_drop_out_of_the_query(self):
+        spec = self.specs[0].model_copy(update={"Brand_Name": "Lada"})
+        car = spec_car(spec, 30000.0, self.vectorizer.categories)
+        with self.assertRaises(ValueError):
+            self.vectorizer.transform([car])
+        row = self.vectorizer.transform([car], ignore_unknown=True)
+        known = self.vectorizer.transform([dict(car, Brand_Name=self.specs[1].Brand_Name)])
+        self.assertEqual(row.nnz, known.nnz - 1)
+
+
+    def test_transformer_path_falls_back_on_unknown_categories(self):
+        # without the compiled vectorizer the raw transformer sees the spec, as with QUERY_VECTORIZER=pandas
+        matrix = sparse.csr_matrix(self.transformer.transform(self.catalog))
+        normalized = normalized_rows(matrix)
+        state = dict(df=matrix, transformer=self.transformer, query_vectorizer=None, normalized=normalized,
+                     normalized_t=normalized.T.tocsr(), ivf_index=None, embedding_index=None,
+                     live_catalog=LiveCatalog(matrix))
+        budget = RecommendationBudget(recommend_fn=recommend.comparable_car_idx, is_loaded_fn=lambda: True,
+                                      load_fn=lambda: None, budget_ms=0)
+        with mock.patch.multiple(recommend, **state), mock.patch("builtins.print"):
+            known = budget.recommend(self.specs[0], 30000.0)
+            unknown = budget.recommend(self.specs[0].model_copy(update={"Brand_Name": "Lada"}), 30000.0)
+        self.assertEqual(len(known), 5)
+        self.assertIsNone(unknown)
+        self.assertEqual((budget.stats["model"], budget.stats["error"]), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
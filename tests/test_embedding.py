@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+from embedding import EmbeddingIndex, build_embedding, evaluate_embedding, save_embedding
+from synthetic_data import make_recommendation_matrix
+
+
+class TestEmbedding(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.matrix = make_recommendation_matrix(400, seed=0)
+
+    def test_layout(self):
+        embedding = build_embedding(self.matrix, n_components=16)
+        self.assertEqual(embedding["components"].shape, (16, self.matrix.shape[1]))
+        self.assertEqual(embedding["embeddings"].shape, (400, 16))
+        self.assertEqual(embedding["embeddings"].dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(embedding["embeddings"], axis=1), 1, rtol=1e-5)
+
+    def test_catalog_row_embeds_onto_its_stored_embedding(self):
+        index = EmbeddingIndex(**build_embedding(self.matrix, n_components=16))
+        np.testing.assert_allclose(index.embed(self.matrix[7:8]), index.embeddings[7], atol=1e-5)
+        self.assertEqual(index.search(self.matrix[7:8], 1)[0], 7)
+
+    def test_overlap_grows_with_dimension(self):
+        overlaps = []
+        for n_components in (4, 399):
+            index = EmbeddingIndex(**build_embedding(self.matrix, n_components=n_components))
+            overlaps.append(evaluate_embedding(self.matrix, index, n_queries=100)["overlap_at_5"])
+        self.assertLess(overlaps[0], overlaps[1])
+        # enough dimensions to span the 400 rows reproduces the exact neighbors up to float32 rounding
+        self.assertGreater(overlaps[1], 0.9)
+
+    def test_save_and_load(self):
+        embedding = build_embedding(self.matrix, n_components=8)
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = os.path.join(tmp, "embedding")
+            save_embedding(embedding, directory)
+            index = EmbeddingIndex.load(directory)
+            self.assertIsInstance(index.embeddings, np.memmap)
+            np.testing.assert_array_equal(index.components, embedding["components"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+import schemas
+from fast_encoder import CompiledEncoder
+from prediction import RENAME_COLUMNS, CompiledPipeline, batch_prediction, get_compiled_model, to_frame
+from src.features.feature_transformation import create_encoder
+from synthetic_data import make_prediction_inputs, make_training_frame
+
+
+class TestCompiledEncoderParity(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        train = make_training_frame(2000, seed=3)
+        cls.pipe = Pipeline([
+            ("Encoder", create_encoder(encoding_method="frequency")),
+            ("Regressor", RandomForestRegressor(n_estimators=10, min_samples_leaf=2, random_state=42)),
+        ])
+        cls.pipe.fit(train.drop(columns="Price"), train["Price"])
+        cls.cars = [schemas.PredictionInputSchema.model_validate(car) for car in make_prediction_inputs(300, seed=4)]
+        cls.encoder = CompiledEncoder.from_column_transformer(cls.pipe.named_steps["Encoder"], RENAME_COLUMNS)
+
+    def pandas_features(self, cars):
+        return self.pipe.named_steps["Encoder"].transform(to_frame(cars)).to_numpy(dtype=np.float32)
+
+    def test_feature_vectors_match_pandas_path(self):
+        np.testing.assert_array_equal(self.encoder.transform(self.cars), self.pandas_features(self.cars))
+        self.assertEqual(self.encoder.feature_names, list(self.pipe.named_steps["Regressor"].feature_names_in_))
+
+    def test_unseen_categories_match_pandas_path(self):
+        cars = [car.model_copy(update={"Model_Name": "Cybertruck", "City": "nowhere"}) for car in self.cars[:5]]
+        compiled = self.encoder.transform(cars)
+        self.assertTrue(np.isnan(compiled).any())
+        np.testing.assert_array_equal(compiled, self.pandas_features(cars))
+
+    def test_unknown_ordinal_category_raises_like_pandas_path(self):
+        car = self.cars[0].model_copy(update={"Stock_Type": "Salvage"})
+        with self.assertRaises(ValueError):
+            self.pandas_features([car])
+        with self.assertRaises(ValueError):
+            self.encoder.transform([car])
+
+    def test_compiled_pipeline_matches_pipeline_predict(self):
+        compiled = CompiledPipeline(self.pipe)
+        np.testing.assert_array_equal(compiled.predict(self.cars), self.pipe.predict(to_frame(self.cars)))
+        np.testing.assert_array_equal(batch_prediction(self.cars[:1], self.pipe), self.pipe.predict(to_frame(self.cars[:1])))
+        self.assertIsNotNone(get_compiled_model(self.pipe))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+from forest_engine import ForestEngine, current_forest_mmap, flatten_forest, load_forest, load_forest_mmap, save_forest, save_forest_mmap
+from src.features.feature_transformation import create_encoder
+from synthetic_data import make_training_frame
+
+
+class TestForestEngineParity(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        train = make_training_frame(3000, seed=1)
+        cls.holdout = make_training_frame(500, seed=2).drop(columns="Price")
+        cls.pipe = Pipeline([
+            ("Encoder", create_encoder(encoding_method="frequency")),
+            ("Regressor", RandomForestRegressor(
+                n_estimators=20, max_depth=30, min_samples_leaf=2, min_samples_split=8, random_state=42
+            )),
+        ])
+        cls.pipe.fit(train.drop(columns="Price"), train["Price"])
+        cls.engine = ForestEngine.from_estimator(cls.pipe.named_steps["Regressor"])
+
+    def encode(self, frame):
+        return self.pipe.named_steps["Encoder"].transform(frame).to_numpy(dtype=np.float32)
+
+    def test_matches_pipeline_predict_exactly(self):
+        for n_rows in (1, 17, 500):
+            frame = self.holdout.head(n_rows)
+            np.testing.assert_array_equal(self.engine.predict(self.encode(frame)), self.pipe.predict(frame))
+
+    def test_matches_with_unseen_categories(self):
+        frame = self.holdout.head(50).copy()
+        frame.loc[frame.index[::3], "Model_Name"] = "Never Seen Model"
+        np.testing.assert_array_equal(self.engine.predict(self.encode(frame)), self.pipe.predict(frame))
+
+    def test_chunked_traversal_matches_single_pass(self):
+        X = self.encode(self.holdout)
+        chunked = ForestEngine.from_estimator(self.pipe.named_steps["Regressor"], chunk_rows=64)
+        np.testing.assert_array_equal(chunked.apply(X), self.engine.apply(X))
+
+    def test_compact_dtypes_and_round_trip(self):
+        arrays = flatten_forest(self.pipe.named_steps["Regressor"])
+        self.assertEqual(arrays["threshold"].dtype, np.float32)
+        self.assertEqual(arrays["left"].dtype, np.int32)
+        self.assertEqual(arrays["feature"].dtype, np.int16)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "forest_arrays.npz")
+            save_forest(arrays, path)
+            reloaded = ForestEngine(load_forest(path))
+        X = self.encode(self.holdout)
+        np.testing.assert_array_equal(reloaded.predict(X), self.pipe.predict(self.holdout))
+
+    def test_memory_mapped_format(self):
+        arrays = flatten_forest(self.pipe.named_steps["Regressor"])
+        X = self.encode(self.holdout)
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = os.path.join(tmp, "forest_mmap")
+            n_bytes = save_forest_mmap(arrays, directory)
+            mapped = load_forest_mmap(directory)
+            self.assertIsInstance(mapped["children"], np.memmap)
+            self.assertEqual(mapped["value"].dtype, np.float32)
+            self.assertLess(n_bytes, sum(array.nbytes for array in arrays.values()))
+
+            engine = ForestEngine(mapped)
+            np.testing.assert_array_equal(engine.apply(X), self.engine.apply(X))
+            np.testing.assert_allclose(engine.predict(X), self.pipe.predict(self.holdout), rtol=1e-6)
+            del engine, mapped
+
+    def test_memory_mapped_publish_switches_a_pointer(self):
+        arrays = flatten_forest(self.pipe.named_steps["Regressor"])
+        X = self.encode(self.holdout)
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = os.path.join(tmp, "forest_mmap")
+            self.assertIsNone(current_forest_mmap(directory))
+            save_forest_mmap(arrays, directory)
+            first = current_forest_mmap(directory)
+            mapped = ForestEngine(load_forest_mmap(directory))
+
+            # a different forest goes to its own directory, the one being served is left in place
+            save_forest_mmap(arrays, directory, value_dtype=np.float64)
+            second = current_forest_mmap(directory)
+            self.assertNotEqual(first, second)
+            self.assertTrue(os.path.exists(os.path.join(first, "value.bin")))
+            np.testing.assert_allclose(mapped.predict(X), self.pipe.predict(self.holdout), rtol=1e-6)
+            self.assertEqual(load_forest_mmap(directory)["value"].dtype, np.float64)
+
+            # publishing the same forest again only moves the pointer back
+            save_forest_mmap(arrays, directory)
+            self.assertEqual(current_forest_mmap(directory), first)
+            self.assertEqual(sorted(os.listdir(directory)), sorted(["current.json", os.path.basename(first), os.path.basename(second)]))
+            del mapped
+
+
+if __name__ == "__main__":
+    unittest.main()
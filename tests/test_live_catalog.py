@@ -0,0 +1,56 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from scipy import sparse
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+from live_catalog import LiveCatalog
+from synthetic_data import make_recommendation_matrix
+
+
+class TestLiveCatalog(unittest.TestCase):
+    def setUp(self):
+        self.base = make_recommendation_matrix(200, seed=0)
+        self.new_rows = make_recommendation_matrix(3, seed=1)
+        self.catalog = LiveCatalog(self.base)
+
+    def test_upsert_and_delete_tombstone_base_rows(self):
+        self.catalog.upsert(10, self.new_rows[0], {"Price": 1})
+        self.catalog.upsert(250, self.new_rows[1], {"Price": 2})
+        self.catalog.delete(20)
+        snapshot = self.catalog.snapshot()
+        np.testing.assert_array_equal(snapshot["ids"], [10, 250])
+        np.testing.assert_array_equal(snapshot["tombstoned"], [10, 20])
+        self.assertEqual(self.catalog.changes, 4)
+
+    def test_deleting_a_pending_row_drops_it(self):
+        self.catalog.upsert(250, self.new_rows[0], {})
+        self.catalog.delete(250)
+        self.assertEqual(len(self.catalog.snapshot()["ids"]), 0)
+        self.assertEqual(self.catalog.changes, 0)
+
+    def test_snapshot_is_cached_until_the_next_write(self):
+        first = self.catalog.snapshot()
+        self.assertIs(self.catalog.snapshot(), first)
+        self.catalog.delete(5)
+        self.assertIsNot(self.catalog.snapshot(), first)
+
+    def test_rejects_a_row_of_the_wrong_width(self):
+        with self.assertRaises(ValueError):
+            self.catalog.upsert(1, sparse.csr_matrix((1, 3)), {})
+
+    def test_writes_since(self):
+        self.catalog.upsert(10, self.new_rows[0], {}, source="car 10")
+        self.catalog.delete(20)
+        written_at = self.catalog.writes[20][0]
+        self.catalog.upsert(10, self.new_rows[1], {}, source="car 10 again")
+        self.assertEqual(self.catalog.writes_since(None), [(10, "car 10 again"), (20, None)])
+        self.assertEqual(self.catalog.writes_since(written_at + 3600), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from scipy import sparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+from matrix_store import MATRIX_HEADER, load_matrix_mmap, matrix_files, save_matrix_mmap, storage_report
+from neighbor_table import normalized_rows, top_k_indices
+
+
+def make_catalog_matrix(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    one_hot = sparse.csr_matrix(np.eye(6)[rng.integers(0, 6, n_rows)])
+    numeric = sparse.random(n_rows, 8, density=0.5, random_state=seed, format="csr")
+    matrix = sparse.hstack([one_hot, numeric]).tolil()
+    # an empty row, as left by a gap in the car ids
+    matrix[0] = 0
+    return matrix.tocsr()
+
+
+class TestMatrixStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "matrix_mmap")
+        self.matrix = make_catalog_matrix(300, seed=4)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_is_float32_over_int32_indices(self):
+        prices = np.linspace(1000, 90000, 300)
+        n_bytes = save_matrix_mmap(self.matrix, self.directory, prices=prices)
+        store = load_matrix_mmap(self.directory)
+
+        self.assertEqual(store["matrix"].shape, self.matrix.shape)
+        self.assertEqual(store["matrix"].dtype, np.float32)
+        self.assertEqual(store["matrix"].indices.dtype, np.int32)
+        np.testing.assert_allclose(store["matrix"].toarray(), self.matrix.toarray(), rtol=1e-7)
+        np.testing.assert_allclose(store["normalized"].toarray(), normalized_rows(self.matrix).toarray(), rtol=1e-6)
+        np.testing.assert_array_equal(store["prices"], prices)
+        self.assertEqual(store["matrix"][0].nnz, 0)
+        self.assertEqual(n_bytes, self.matrix.nnz * (4 + 4 + 4) + 301 * 4 + 300 * 8)
+
+    def test_matrices_are_views_over_the_mapped_files(self):
+        save_matrix_mmap(self.matrix, self.directory)
+        store = load_matrix_mmap(self.directory)
+        self.assertIsNone(store["prices"])
+        for name in ("matrix", "normalized"):
+            # scipy keeps a plain ndarray view, read-only and not owning its memory, over the memmap
+            self.assertFalse(store[name].data.flags.owndata)
+            self.assertFalse(store[name].data.flags.writeable)
+            base = store[name].data
+            while not isinstance(base, np.memmap) and base is not None:
+                base = base.base
+            self.assertIsInstance(base, np.memmap)
+        # both matrices share the one copy of the indices
+        self.assertTrue(np.shares_memory(store["matrix"].indices, store["normalized"].indices))
+
+    def test_header_is_listed_last(self):
+        save_matrix_mmap(self.matrix, self.directory, prices=np.zeros(300))
+        files = matrix_files(self.directory)
+        self.assertEqual(files[-1], MATRIX_HEADER)
+        self.assertEqual(sorted(files[:-1]), ["data.bin", "indices.bin", "indptr.bin", "normalized.bin", "prices.bin"])
+
+    def test_truncated_array_is_rejected(self):
+        save_matrix_mmap(self.matrix, self.directory)
+        with open(os.path.join(self.directory, "data.bin"), "r+b") as f:
+            f.truncate(8)
+        with self.assertRaises(ValueError):
+            load_matrix_mmap(self.directory)
+
+    def test_float32_scores_agree_with_float64(self):
+        save_matrix_mmap(self.matrix, self.directory)
+        store = load_matrix_mmap(self.directory)
+        exact = normalized_rows(self.matrix)
+        for row in (3, 50, 299):
+            query = exact[row].toarray().ravel()
+            expected = exact @ query
+            scores = store["normalized"] @ query.astype(np.float32)
+            np.testing.assert_allclose(scores, expected, atol=1e-6)
+            self.assertEqual(set(top_k_indices(scores, 5)), set(top_k_indices(expected, 5)))
+
+    def test_storage_report(self):
+        npz_path = os.path.join(self.tmp.name, "matrix.npz")
+        sparse.save_npz(npz_path, self.matrix)
+        report = storage_report(self.matrix, npz_path, save_matrix_mmap(self.matrix, self.directory))
+        json.dumps(report)
+        self.assertEqual(report["rows"], 300)
+        self.assertEqual(report["nnz"], self.matrix.nnz)
+        self.assertGreater(report["bytes_saved_per_worker"], 0)
+        self.assertGreater(report["saved_pct"], 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
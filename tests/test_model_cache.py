@@ -0,0 +1,83 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+import model_cache
+
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp, "cache")
+        self.registry = os.path.join(self.tmp, "registry", "RF")
+        os.makedirs(os.path.join(self.registry, "3"))
+        with open(os.path.join(self.registry, "3", "model.pkl"), "wb") as f:
+            f.write(b"forest-v3")
+        with open(os.path.join(self.registry, "aliases.json"), "w") as f:
+            json.dump({"Production": "3"}, f)
+        self.resolver_calls = 0
+        self.downloads = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def resolver(self, model_name, alias):
+        self.resolver_calls += 1
+        with open(os.path.join(self.registry, "aliases.json")) as f:
+            return json.load(f)[alias]
+
+    def offline_resolver(self, model_name, alias):
+        raise ConnectionError("registry unreachable")
+
+    def downloader(self, model_name, version, dst):
+        self.downloads += 1
+        shutil.copytree(os.path.join(self.registry, version), dst, dirs_exist_ok=True)
+
+    def test_second_load_is_served_from_disk(self):
+        version = model_cache.resolve_alias("RF", "Production", self.resolver, cache_dir=self.cache_dir)
+        path = model_cache.fetch_model("RF", version, self.downloader, cache_dir=self.cache_dir)
+        version = model_cache.resolve_alias("RF", "Production", self.resolver, cache_dir=self.cache_dir)
+        path_again = model_cache.fetch_model("RF", version, self.downloader, cache_dir=self.cache_dir)
+
+        self.assertEqual(path, path_again)
+        self.assertEqual(self.resolver_calls, 1)
+        self.assertEqual(self.downloads, 1)
+        with open(os.path.join(path, "model.pkl"), "rb") as f:
+            self.assertEqual(f.read(), b"forest-v3")
+
+    def test_offline_restart_uses_last_known_version(self):
+        model_cache.resolve_alias("RF", "Production", self.resolver, cache_dir=self.cache_dir)
+        model_cache.fetch_model("RF", "3", self.downloader, cache_dir=self.cache_dir)
+
+        version = model_cache.resolve_alias("RF", "Production", self.offline_resolver, cache_dir=self.cache_dir, ttl=0)
+        path = model_cache.fetch_model("RF", version, self.downloader, cache_dir=self.cache_dir)
+        self.assertEqual(version, "3")
+        self.assertTrue(model_cache.verify_model_dir(path))
+        self.assertEqual(self.downloads, 1)
+
+    def test_expired_ttl_picks_up_new_version(self):
+        model_cache.resolve_alias("RF", "Production", self.resolver, cache_dir=self.cache_dir)
+        with open(os.path.join(self.registry, "aliases.json"), "w") as f:
+            json.dump({"Production": "4"}, f)
+        self.assertEqual(model_cache.resolve_alias("RF", "Production", self.resolver, cache_dir=self.cache_dir), "3")
+        self.assertEqual(model_cache.resolve_alias("RF", "Production", self.resolver, cache_dir=self.cache_dir, ttl=0), "4")
+
+    def test_corrupted_cache_is_downloaded_again(self):
+        path = model_cache.fetch_model("RF", "3", self.downloader, cache_dir=self.cache_dir)
+        with open(os.path.join(path, "model.pkl"), "wb") as f:
+            f.write(b"truncated")
+        self.assertFalse(model_cache.verify_model_dir(path))
+
+        path = model_cache.fetch_model("RF", "3", self.downloader, cache_dir=self.cache_dir)
+        self.assertEqual(self.downloads, 2)
+        with open(os.path.join(path, "model.pkl"), "rb") as f:
+            self.assertEqual(f.read(), b"forest-v3")
+
+
+if __name__ == "__main__":
+    unittest.main()
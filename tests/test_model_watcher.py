@@ -0,0 +1,108 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from functools import partial
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+import load_model as model_store
+import model_cache
+import model_watcher
+import prediction
+
+
+class StubModel:
+    def __init__(self, version, broken=False):
+        self.version = version
+        self.broken = broken
+
+    def predict(self, frame):
+        if self.broken:
+            raise ValueError("columns do not match")
+        return [float(self.version)] * len(frame)
+
+
+class TestModelWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.registry = {"Production": "1"}
+        self.loaded = []
+        self.initial = dict(model_watcher.watcher_state)
+        patches = [
+            mock.patch.object(prediction, "PREDICTION_ENGINE", "sklearn"),
+            mock.patch.object(model_store, "model", StubModel("1")),
+            mock.patch.object(model_store, "model_version", "1"),
+            mock.patch.object(model_store, "get_latest_model_version", lambda name, alias: self.registry[alias]),
+            mock.patch.object(model_store, "load_model_version", self.load_model_version),
+            mock.patch.object(model_cache, "resolve_alias", partial(model_cache.resolve_alias, cache_dir=self.tmp)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        model_watcher.watcher_state.update(self.initial)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def load_model_version(self, version):
+        self.loaded.append(version)
+        if version == "missing":
+            raise FileNotFoundError("model artifacts not found")
+        return StubModel(version, broken=version == "broken")
+
+    def test_unchanged_alias_loads_nothing(self):
+        self.assertIsNone(model_watcher.check_for_new_version())
+        self.assertEqual(self.loaded, [])
+        self.assertEqual(model_watcher.watcher_state["polls"], self.initial["polls"] + 1)
+
+    def test_nothing_is_swapped_before_the_first_load(self):
+        self.registry["Production"] = "2"
+        with mock.patch.object(model_store, "model", None):
+            self.assertIsNone(model_watcher.check_for_new_version())
+        self.assertEqual(self.loaded, [])
+
+    def test_moved_alias_swaps_in_the_new_version(self):
+        self.registry["Production"] = "2"
+        self.assertEqual(model_watcher.check_for_new_version(), "2")
+        self.assertEqual((model_store.model_version, model_store.model.version), ("2", "2"))
+        self.assertEqual(model_watcher.watcher_state["swaps"], self.initial["swaps"] + 1)
+        self.assertIsNone(model_watcher.check_for_new_version())
+        self.assertEqual(self.loaded, ["2"])
+
+    def test_failed_load_keeps_the_old_model(self):
+        old_model = model_store.model
+        for version in ("missing", "broken"):
+            self.registry["Production"] = version
+            with self.assertRaises(Exception):
+                model_watcher.check_for_new_version()
+            self.assertIs(model_store.model, old_model)
+            self.assertEqual(model_store.model_version, "1")
+        self.assertEqual(model_watcher.watcher_state["swaps"], self.initial["swaps"])
+
+    def test_watch_records_errors_and_reports_swaps(self):
+        results = iter([RuntimeError("registry unreachable"), None, "2"])
+        swapped = []
+        stop_event = threading.Event()
+
+        def check():
+            result = next(results)
+            if isinstance(result, Exception):
+                raise result
+            if result is not None:
+                stop_event.set()
+            return result
+
+        def on_swap(version):
+            swapped.append((version, model_watcher.watcher_state["error"]))
+
+        with mock.patch("builtins.print"):
+            model_watcher.watch(poll_seconds=0.001, stop_event=stop_event, check=check, on_swap=on_swap)
+        self.assertEqual(swapped, [("2", None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from scipy import sparse
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+from neighbor_table import (
+    NeighborTable, build_neighbor_table, normalized_rows, save_neighbor_table, similarity_scores, top_k_indices
+)
+
+
+def make_catalog_matrix(n_rows, seed):
+    # one-hot blocks give plenty of exact ties, the dense tail mimics the scaled numeric columns
+    rng = np.random.default_rng(seed)
+    one_hot = sparse.csr_matrix(np.eye(6)[rng.integers(0, 6, n_rows)])
+    numeric = sparse.random(n_rows, 8, density=0.5, random_state=seed, format="csr")
+    matrix = sparse.hstack([one_hot, numeric]).tocsr()
+    if n_rows > 5:
+        matrix[5] = matrix[3]
+    return matrix
+
+
+def reference_top_k(scores, k):
+    return np.argsort(scores, kind="stable")[-k:][::-1]
+
+
+class TestTopK(unittest.TestCase):
+    def test_matches_stable_argsort_with_ties(self):
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            scores = rng.integers(0, 5, size=40).astype(np.float64)
+            for k in (1, 3, 10, 40, 60):
+                np.testing.assert_array_equal(top_k_indices(scores, k), reference_top_k(scores, k))
+
+
+class TestSimilarityScores(unittest.TestCase):
+    def test_matches_cosine_similarity_ordering(self):
+        matrix = make_catalog_matrix(500, seed=4)
+        normalized_t = normalized_rows(matrix).T.tocsr()
+        queries = make_catalog_matrix(20, seed=5)
+        for query in (queries, queries.toarray()):
+            for row in range(query.shape[0]):
+                expected = cosine_similarity(query[row:row + 1], matrix).ravel()
+                scores = similarity_scores(query[row:row + 1], normalized_t)
+                np.testing.assert_array_equal(scores, expected)
+                np.testing.assert_array_equal(top_k_indices(scores, 6)[1:], reference_top_k(expected, 6)[1:])
+
+
+class TestNeighborTable(unittest.TestCase):
+    def test_blocked_table_matches_full_similarity(self):
+        matrix = make_catalog_matrix(300, seed=1)
+        similarities = cosine_similarity(matrix, matrix)
+        # a budget this small forces many row blocks
+        table = build_neighbor_table(matrix, k=7, block_mb=0.01)
+
+        self.assertEqual(table["indices"].dtype, np.int32)
+        self.assertEqual(table["scores"].dtype, np.float32)
+        for row in range(matrix.shape[0]):
+            expected = reference_top_k(similarities[row], 8)[1:]
+            np.testing.assert_array_equal(table["indices"][row], expected)
+            np.testing.assert_array_equal(table["scores"][row], similarities[row][expected].astype(np.float32))
+
+    def test_k_is_capped_by_catalog_size(self):
+        table = build_neighbor_table(make_catalog_matrix(4, seed=2), k=10)
+        self.assertEqual(table["indices"].shape, (4, 3))
+
+    def test_save_and_load(self):
+        table = build_neighbor_table(make_catalog_matrix(50, seed=3), k=5)
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = os.path.join(tmp, "neighbors")
+            save_neighbor_table(table, directory)
+            loaded = NeighborTable.load(directory)
+            self.assertIsInstance(loaded.indices, np.memmap)
+            self.assertTrue(loaded.covers(49, 5))
+            self.assertFalse(loaded.covers(50, 5))
+            self.assertFalse(loaded.covers(0, 6))
+            self.assertEqual(loaded.lookup(10, 3), [int(i) for i in table["indices"][10, :3]])
+
+
+if __name__ == "__main__":
+    unittest.main()
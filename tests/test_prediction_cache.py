@@ -0,0 +1,81 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+import schemas
+from prediction_cache import PredictionCache
+from synthetic_data import make_prediction_inputs
+
+
+class TestPredictionCache(unittest.TestCase):
+    def setUp(self):
+        self.cars = [schemas.PredictionInputSchema.model_validate(car) for car in make_prediction_inputs(5, seed=5)]
+        self.computed = 0
+
+    def compute(self, value=1.0):
+        def _compute():
+            self.computed += 1
+            return value
+        return _compute
+
+    def test_hit_after_miss(self):
+        cache = PredictionCache(max_entries=10, ttl_seconds=60)
+        self.assertEqual(cache.get_or_compute(self.cars[0], "1", self.compute(42.0)), 42.0)
+        self.assertEqual(cache.get_or_compute(self.cars[0], "1", self.compute(0.0)), 42.0)
+        self.assertEqual(self.computed, 1)
+        self.assertEqual((cache.stats["hits"], cache.stats["misses"]), (1, 1))
+
+    def test_key_uses_validated_input(self):
+        cache = PredictionCache(max_entries=10, ttl_seconds=60)
+        raw = make_prediction_inputs(1, seed=6)[0]
+        spaced = dict(raw, Model_Name=f"  {raw['Model_Name']} ")
+        cache.get_or_compute(schemas.PredictionInputSchema.model_validate(raw), "1", self.compute())
+        cache.get_or_compute(schemas.PredictionInputSchema.model_validate(spaced), "1", self.compute())
+        self.assertEqual(self.computed, 1)
+
+    def test_model_version_change_invalidates(self):
+        cache = PredictionCache(max_entries=10, ttl_seconds=60)
+        cache.get_or_compute(self.cars[0], "1", self.compute(1.0))
+        self.assertEqual(cache.get_or_compute(self.cars[0], "2", self.compute(2.0)), 2.0)
+        self.assertEqual(cache.stats["invalidations"], 1)
+
+    def test_lru_eviction_and_ttl(self):
+        cache = PredictionCache(max_entries=2, ttl_seconds=60)
+        for car in self.cars[:3]:
+            cache.get_or_compute(car, "1", self.compute())
+        self.assertEqual(cache.stats["evictions"], 1)
+        cache.get_or_compute(self.cars[0], "1", self.compute())
+        self.assertEqual(self.computed, 4)
+
+        cache = PredictionCache(max_entries=2, ttl_seconds=0)
+        cache.get_or_compute(self.cars[0], "1", self.compute())
+        cache.get_or_compute(self.cars[0], "1", self.compute())
+        self.assertEqual(cache.stats["expirations"], 1)
+
+    def test_concurrent_misses_compute_once(self):
+        cache = PredictionCache(max_entries=10, ttl_seconds=60)
+
+        def slow():
+            time.sleep(0.05)
+            self.computed += 1
+            return 7.0
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute(self.cars[0], "1", slow)))
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [7.0] * 8)
+        self.assertEqual(self.computed, 1)
+        self.assertEqual(cache.stats["coalesced"], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+from query_vectorizer import QueryVectorizer
+from src.recommendation.build_index import RECOMMENDATION_COLUMNS, create_transformer
+from synthetic_data import make_catalog_frame
+
+
+class TestQueryVectorizerParity(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        catalog = make_catalog_frame(2000, seed=5)[RECOMMENDATION_COLUMNS]
+        cls.transformer = create_transformer().fit(catalog)
+        cls.vectorizer = QueryVectorizer.from_column_transformer(cls.transformer)
+        cls.cars = make_catalog_frame(300, seed=6)[RECOMMENDATION_COLUMNS].to_dict(orient="records")
+
+    def pandas_row(self, car):
+        return sparse.csr_matrix(self.transformer.transform(pd.DataFrame([car])))
+
+    def assert_same_row(self, car):
+        expected = self.pandas_row(car)
+        compiled = self.vectorizer.transform([car])
+        self.assertEqual(compiled.shape, expected.shape)
+        np.testing.assert_array_equal(compiled.indices, expected.indices)
+        np.testing.assert_array_equal(compiled.data, expected.data)
+
+    def test_rows_match_pandas_path_exactly(self):
+        for car in self.cars:
+            self.assert_same_row(car)
+
+    def test_objects_and_dicts_give_the_same_rows(self):
+        class Car:
+            def __init__(self, values):
+                self.__dict__.update(values)
+
+        from_dicts = self.vectorizer.transform(self.cars[:20])
+        from_objects = self.vectorizer.transform([Car(car) for car in self.cars[:20]])
+        self.assertEqual((from_dicts != from_objects).nnz, 0)
+        self.assertEqual(from_dicts.shape, (20, self.vectorizer.n_features))
+
+    def test_unseen_words_and_out_of_range_numbers(self):
+        car = dict(self.cars[0], Model_Name="Cybertruck Model 3", Seller_Name="the and of", Mileage=10 ** 7, Price=1.0)
+        self.assert_same_row(car)
+
+    def test_unknown_category_raises_like_the_transformer(self):
+        car = dict(self.cars[0], Brand_Name="Lada")
+        with self.assertRaises(ValueError):
+            self.pandas_row(car)
+        with self.assertRaises(ValueError):
+            self.vectorizer.transform([car])
+
+    def test_faster_than_the_dataframe_path(self):
+        start = time.perf_counter()
+        for car in self.cars[:50]:
+            self.pandas_row(car)
+        pandas_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for car in self.cars[:50]:
+            self.vectorizer.transform([car])
+        self.assertLess(time.perf_counter() - start, pandas_time / 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+import recommend
+from live_catalog import LiveCatalog
+from neighbor_table import normalized_rows
+from synthetic_data import make_recommendation_matrix
+
+
+class TestRecommendBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.saved = {name: getattr(recommend, name) for name in ["df", "transformer", "normalized", "normalized_t", "live_catalog"]}
+        matrix = make_recommendation_matrix(3000, seed=0)
+        recommend.df = matrix
+        recommend.transformer = object()
+        recommend.normalized = normalized_rows(matrix)
+        recommend.normalized_t = recommend.normalized.T.tocsr()
+        recommend.live_catalog = LiveCatalog(matrix)
+        # a new car, a changed car and a deleted one
+        new_rows = make_recommendation_matrix(2, seed=1)
+        recommend.live_catalog.upsert(3000, new_rows[0], {})
+        recommend.live_catalog.upsert(10, new_rows[1], {})
+        recommend.live_catalog.delete(20)
+
+    @classmethod
+    def tearDownClass(cls):
+        for name, value in cls.saved.items():
+            setattr(recommend, name, value)
+
+    def per_car(self, car_id, k):
+        snapshot = recommend.live_catalog.snapshot()
+        if car_id in snapshot["ids"]:
+            query = snapshot["matrix"][int(np.flatnonzero(snapshot["ids"] == car_id)[0])]
+        else:
+            query = recommend.df[car_id]
+        return [int(i) for i in recommend.without_car(recommend.search_idx(query, k + 1, snapshot), car_id, k)]
+
+    def test_batch_matches_one_search_per_car(self):
+        car_ids = [0, 10, 11, 500, 2999, 3000]
+        old_block_mb = recommend.RECOMMENDATION_BATCH_BLOCK_MB
+        # a few rows per block so the blocking itself is exercised
+        recommend.RECOMMENDATION_BATCH_BLOCK_MB = 0.05
+        try:
+            batch = recommend.recommend_batch([SimpleNamespace(id=car_id) for car_id in car_ids], k=7)
+        finally:
+            recommend.RECOMMENDATION_BATCH_BLOCK_MB = old_block_mb
+        self.assertEqual(list(batch), car_ids)
+        for car_id in car_ids:
+            self.assertEqual(batch[car_id], self.per_car(car_id, 7))
+            self.assertNotIn(car_id, batch[car_id])
+            self.assertNotIn(20, batch[car_id])
+
+    def test_a_car_the_vectorizer_rejects_is_left_out(self):
+        def vectorize(cars):
+            unknown = [car.Brand_Name for car in cars if car.Brand_Name == "Zzzbrand"]
+            if unknown:
+                raise ValueError(f"Found unknown categories {unknown} in column 'Brand_Name'")
+            return make_recommendation_matrix(len(cars), seed=2)
+
+        cars = [SimpleNamespace(id=5000, Brand_Name="Zzzbrand"), SimpleNamespace(id=5001, Brand_Name="Audi"),
+                SimpleNamespace(id=5, Brand_Name="Audi")]
+        with mock.patch.object(recommend, "vectorize", vectorize), mock.patch("builtins.print"):
+            batch = recommend.recommend_batch(cars, k=3)
+        self.assertEqual(sorted(batch), [5, 5001])
+        self.assertEqual(batch[5], self.per_car(5, 3))
+        self.assertEqual(len(batch[5001]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,217 @@
+import os
+import sys
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..", "FastApi_app")
+sys.path.insert(0, APP_DIR)
+
+import crud
+import database
+import models
+
+ENGINE = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+def import_main():
+    # main creates its tables, fetches the home page cars and mounts static/ relative to the app directory on import
+    cwd = os.getcwd()
+    with mock.patch.object(database, "engine", ENGINE), mock.patch("requests.get") as get, \
+            mock.patch.dict(os.environ, {"CREATE_MISSING_INDEXES": "false"}):
+        get.return_value.json.return_value = {}
+        os.chdir(APP_DIR)
+        try:
+            import main
+        finally:
+            os.chdir(cwd)
+    return main
+
+
+main = import_main()
+
+
+def listing(id_, **columns):
+    # a row as the catalog stores it: string ZIP and Gear_Spec, prices and mileage with cents
+    row = dict(id=id_, Model_Year=2021, Brand_Name="Tesla", Model_Name="Model 3", Image_List=["front.jpg", "back.jpg"],
+               Stock_Type="Used", Mileage=Decimal("23150.50"), Price=Decimal("38995.99"), Exterior_Color="Gray",
+               Interior_Color="Black", Drivetrain="AWD", Km_per_l=Decimal("0.00"), Fuel_Type="Electric",
+               Accidents_Or_Damage=False, Clean_Title=True, One_Owner_Vehicle="one", Personal_Use_Only="yes",
+               Level2_Charging=Decimal("7.50"), Dc_Fast_Charging=Decimal("25.00"), Battery_Capacity=Decimal("75.00"),
+               Expected_Range=Decimal("315.00"), Gear_Spec="1-Speed", Engine_Size=None, Cylinder_Config="NA",
+               Valves="0", Seller_Site="https://dealer.example.com", Seller_Name="Austin Motors",
+               Km_L_e_City=Decimal("56.10"), Km_L_e_Hwy=Decimal("49.70"), Street_Address="1 Congress Ave",
+               ZIP="78701", City="austin", STATE="texas", ST="TX", lat=Decimal("30.267153"), LONG=Decimal("-97.743057"))
+    row.update(columns)
+    return row
+
+
+class TestRecommendRoutes(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        models.Car.__table__.create(ENGINE, checkfirst=True)
+        cls.Session = sessionmaker(bind=ENGINE)
+        db = cls.Session()
+        db.add_all([
+            models.Car(**listing(1)),
+            models.Car(**listing(2, Price=Decimal("41250.00"), ZIP="02108-1234")),
+            models.Car(**listing(3, Model_Name="Model Y", ZIP=None, Gear_Spec="Automatic")),
+            models.Car(**listing(4, Brand_Name="Ford", Model_Name="Mustang Mach-E", ZIP="10001")),
+        ])
+        db.commit()
+        db.close()
+
+        def get_db():
+            db = cls.Session()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        main.app.dependency_overrides[main.get_db] = get_db
+        cls.client = TestClient(main.app)
+
+    @classmethod
+    def tearDownClass(cls):
+        main.app.dependency_overrides.pop(main.get_db, None)
+        models.Car.__table__.drop(ENGINE)
+
+    def test_similar_cars_serialize_catalog_rows(self):
+        with mock.patch.object(main.recommendation_budget, "recommend", return_value=[2, 3, 4]):
+            response = self.client.get("/api/recommend/1")
+        self.assertEqual(response.status_code, 200)
+        cars = response.json()
+        self.assertEqual([car["id"] for car in cars], [2, 3, 4])
+        self.assertEqual([car["ZIP"] for car in cars], ["02108-1234", None, "10001"])
+        self.assertEqual(cars[0]["Price"], 41250.0)
+        self.assertEqual(cars[1]["Gear_Spec"], "Automatic")
+
+    def test_a_car_the_build_cannot_place_falls_back(self):
+        def unknown_brand(car, **kwargs):
+            raise ValueError("Found unknown categories ['Zzzbrand'] in column 'Brand_Name'")
+
+        with mock.patch.multiple(main.recommendation_budget, recommend_fn=unknown_brand, is_loaded_fn=lambda: True, budget=0), \
+                mock.patch("builtins.print"):
+            response = self.client.get("/api/recommend/1", params={"k": 2})
+            filtered = self.client.get("/api/recommend/1", params={"k": 5, "max_price": 40000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([car["id"] for car in response.json()], [2, 3])
+        # the fallback keeps to the filters the search would have applied
+        self.assertEqual(filtered.status_code, 200)
+        self.assertEqual([car["id"] for car in filtered.json()], [3])
+
+    def test_inverted_price_range_is_rejected(self):
+        with mock.patch.object(main.recommendation_budget, "recommend") as recommend:
+            response = self.client.get("/api/recommend/1", params={"min_price": 50000, "max_price": 20000})
+        self.assertEqual(response.status_code, 400)
+        recommend.assert_not_called()
+
+    def test_batch_serializes_catalog_rows(self):
+        with mock.patch.object(main.batch_budget, "recommend", return_value={1: [2, 4], 4: [1]}):
+            response = self.client.post("/api/recommend/batch", json={"car_ids": [1, 4, 999], "k": 2})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual({car_id: [car["id"] for car in cars] for car_id, cars in body["recommendations"].items()},
+                         {"1": [2, 4], "4": [1]})
+        self.assertEqual(body["recommendations"]["4"][0]["ZIP"], "78701")
+        self.assertEqual(body["missing"], [999])
+
+    def test_batch_falls_back_for_cars_the_search_left_out(self):
+        # car 3 could not be vectorized, the rest of the batch keeps its search results
+        with mock.patch.object(main.batch_budget, "recommend", return_value={1: [2, 4]}):
+            response = self.client.post("/api/recommend/batch", json={"car_ids": [1, 3], "k": 2})
+        self.assertEqual(response.status_code, 200)
+        recommendations = {car_id: [car["id"] for car in cars] for car_id, cars in response.json()["recommendations"].items()}
+        self.assertEqual(recommendations, {"1": [2, 4], "3": [1, 2]})
+
+    def test_batch_over_budget_falls_back_for_every_car(self):
+        with mock.patch.object(main.batch_budget, "recommend", return_value=None):
+            response = self.client.post("/api/recommend/batch", json={"car_ids": [1, 4], "k": 2})
+        self.assertEqual(response.status_code, 200)
+        recommendations = {car_id: [car["id"] for car in cars] for car_id, cars in response.json()["recommendations"].items()}
+        self.assertEqual(recommendations, {"1": [2, 3], "4": []})
+
+    def test_for_you_serializes_catalog_rows(self):
+        self.client.cookies.set(main.SESSION_COOKIE, "visitor")
+        try:
+            with mock.patch.object(main.for_you_budget, "recommend", return_value=[4, 1]):
+                response = self.client.get("/api/recommend/for-you")
+        finally:
+            self.client.cookies.clear()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(car["id"], car["ZIP"]) for car in response.json()], [(4, "10001"), (1, "78701")])
+        self.assertEqual(response.json()[1]["lat"], 30.267153)
+
+
+class TestCatalogWriteRoutes(unittest.TestCase):
+    def setUp(self):
+        models.Car.__table__.create(ENGINE, checkfirst=True)
+        self.Session = sessionmaker(bind=ENGINE)
+        db = self.Session()
+        db.add(models.Car(**listing(1)))
+        db.commit()
+        db.close()
+
+        def get_db():
+            db = self.Session()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        self.writes = []
+        record = lambda action, car_id, car=None: self.writes.append((action, car_id, getattr(car, "Price", None)))
+        patches = [
+            mock.patch.dict(main.app.dependency_overrides, {main.get_db: get_db}),
+            mock.patch.object(crud, "write_hooks", [record]),
+            mock.patch.object(main, "CATALOG_WRITE_TOKEN", "secret"),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.client = TestClient(main.app)
+        self.auth = {"Authorization": "Bearer secret"}
+
+    def tearDown(self):
+        models.Car.__table__.drop(ENGINE)
+
+    def test_writes_reach_the_recommendation_hooks(self):
+        created = self.client.post("/api/cars", headers=self.auth, json={
+            "Model_Year": 2022, "Brand_Name": "Tesla", "Model_Name": "Model Y", "Price": 45000, "ZIP": 78701, "Open_Recall": "yes"})
+        self.assertEqual(created.status_code, 201)
+        car_id = created.json()["id"]
+        self.assertEqual(created.json()["ZIP"], "78701")
+
+        updated = self.client.put(f"/api/cars/{car_id}", headers=self.auth, json={"Price": 43000})
+        self.assertEqual(updated.status_code, 200)
+        self.assertEqual((updated.json()["Price"], updated.json()["Model_Name"]), (43000.0, "Model Y"))
+        self.assertEqual(self.client.delete(f"/api/cars/{car_id}", headers=self.auth).status_code, 204)
+        self.assertEqual(self.writes, [("create", car_id, 45000), ("update", car_id, 43000), ("delete", car_id, None)])
+
+        self.assertEqual(self.client.delete(f"/api/cars/{car_id}", headers=self.auth).status_code, 404)
+        self.assertEqual(self.client.put(f"/api/cars/{car_id}", headers=self.auth, json={"Price": 1}).status_code, 404)
+        self.assertEqual(len(self.writes), 3)
+
+    def test_a_listing_needs_year_brand_and_model(self):
+        response = self.client.post("/api/cars", headers=self.auth, json={"Brand_Name": "Tesla"})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.writes, [])
+
+    def test_writes_need_the_token(self):
+        self.assertIn(self.client.delete("/api/cars/1").status_code, (401, 403))
+        self.assertEqual(self.client.delete("/api/cars/1", headers={"Authorization": "Bearer wrong"}).status_code, 403)
+        with mock.patch.object(main, "CATALOG_WRITE_TOKEN", None):
+            self.assertEqual(self.client.delete("/api/cars/1", headers=self.auth).status_code, 403)
+        self.assertEqual(self.writes, [])
+        db = self.Session()
+        self.assertIsNotNone(crud.get_car(db, 1))
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+import crud
+import models
+from recommendation_budget import RecommendationBudget
+
+
+class TestRecommendationBudget(unittest.TestCase):
+    def setUp(self):
+        self.loaded = True
+        self.loads = 0
+        self.release = threading.Event()
+
+    def load(self):
+        self.loads += 1
+        self.loaded = True
+
+    def budget(self, recommend_fn, budget_ms=200, workers=2):
+        return RecommendationBudget(recommend_fn=recommend_fn, is_loaded_fn=lambda: self.loaded, load_fn=self.load,
+                                    budget_ms=budget_ms, workers=workers)
+
+    def slow(self, car):
+        self.release.wait(5)
+        return [1, 2]
+
+    def test_returns_the_model_ids_within_budget(self):
+        budget = self.budget(lambda car: [car, car + 1])
+        self.assertEqual(budget.recommend(7), [7, 8])
+        self.assertEqual(budget.stats["model"], 1)
+        self.assertEqual(budget.snapshot()["fallback_ratio"], 0.0)
+
+    def test_not_loaded_falls_back_and_loads_in_the_background(self):
+        self.loaded = False
+        budget = self.budget(lambda car: [1])
+        self.assertIsNone(budget.recommend(7))
+        budget._loader.join(5)
+        self.assertEqual((self.loads, budget.stats["not_loaded"]), (1, 1))
+        self.assertEqual(budget.recommend(7), [1])
+
+    def test_over_budget_falls_back(self):
+        budget = self.budget(self.slow, budget_ms=20)
+        started = time.perf_counter()
+        self.assertIsNone(budget.recommend(7))
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual(budget.stats["timeout"], 1)
+        self.release.set()
+
+    def test_busy_workers_fall_back_without_queueing(self):
+        budget = self.budget(self.slow, budget_ms=20, workers=1)
+        self.assertIsNone(budget.recommend(7))
+        self.assertIsNone(budget.recommend(7))
+        self.assertEqual((budget.stats["timeout"], budget.stats["saturated"]), (1, 1))
+        self.release.set()
+        budget._executor.shutdown(wait=True)
+        self.assertEqual(budget.snapshot()["running"], 0)
+
+    def test_errors_fall_back(self):
+        def fail(car):
+            raise ValueError("unknown category")
+        budget = self.budget(fail)
+        self.assertIsNone(budget.recommend(7))
+        self.assertEqual(budget.stats["error"], 1)
+        self.assertEqual(budget.snapshot()["fallback_ratio"], 1.0)
+        # searches run inline without a budget fall back the same way
+        inline = self.budget(fail, budget_ms=0)
+        self.assertIsNone(inline.recommend(7))
+        self.assertEqual(inline.stats["error"], 1)
+
+
+class TestSimilarCars(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine("sqlite://")
+        models.Car.__table__.create(cls.engine)
+        cls.Session = sessionmaker(bind=cls.engine)
+        db = cls.Session()
+        listings = [
+            (1, "Tesla", "Model 3", 40000, 2021),
+            (2, "Tesla", "Model 3", 41000, 2019),
+            (3, "Tesla", "Model 3", 41000, 2021),
+            (4, "Tesla", "Model 3", 20000, 2021),
+            (5, "Tesla", "Model Y", 40500, 2021),
+            (6, "Toyota", "Model 3", 40000, 2021),
+            (7, "Tesla", "Model S", 90000, 2021),
+        ]
+        for id_, brand, model, price, year in listings:
+            db.add(models.Car(id=id_, Brand_Name=brand, Model_Name=model, Price=price, Model_Year=year))
+        db.commit()
+        db.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+
+    def similar(self, car_id, k):
+        db = self.Session()
+        try:
+            return [car.id for car in crud.similar_cars(db, crud.get_car(db, car_id), k=k)]
+        finally:
+            db.close()
+
+    def test_same_model_nearest_in_price_then_year(self):
+        self.assertEqual(self.similar(1, k=3), [3, 2, 4])
+
+    def test_topped_up_from_the_same_brand(self):
+        self.assertEqual(self.similar(1, k=5), [3, 2, 4, 5, 7])
+        self.assertNotIn(6, self.similar(1, k=10))
+
+    def test_specs_without_an_id_at_a_given_price(self):
+        spec = SimpleNamespace(Brand_Name="Tesla", Model_Name="Model 3", Model_Year=2021)
+        db = self.Session()
+        try:
+            self.assertEqual([car.id for car in crud.similar_cars(db, spec, k=2, price=20500)], [4, 1])
+        finally:
+            db.close()
+
+    def test_price_windows_widen_until_they_hold_k_listings(self):
+        statements = []
+        record = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(self.engine, "before_cursor_execute", record)
+        try:
+            self.assertEqual(self.similar(1, k=2), [3, 2])
+        finally:
+            event.remove(self.engine, "before_cursor_execute", record)
+        # the car itself, then the same model within 5% of its price
+        self.assertEqual(len(statements), 2)
+        self.assertIn("BETWEEN", statements[1])
+
+
+class TestCreateMissingIndexes(unittest.TestCase):
+    def test_adds_an_index_declared_after_the_table_was_created(self):
+        engine = create_engine("sqlite://")
+        models.Car.__table__.create(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_car_brand_model_price")
+        self.assertEqual(models.create_missing_indexes(engine), ["ix_car_brand_model_price"])
+        self.assertIn("ix_car_brand_model_price", {index["name"] for index in inspect(engine).get_indexes("Car")})
+        self.assertEqual(models.create_missing_indexes(engine), [])
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
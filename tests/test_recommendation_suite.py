@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+from recommendation_suite import check_regressions, recall_at_k, run_suite, synthetic_car_table
+import models
+import recommend
+
+
+class TestRecommendationSuite(unittest.TestCase):
+    def test_synthetic_table_has_every_car_column(self):
+        frame = synthetic_car_table(500, seed=1)
+        self.assertEqual(list(frame.columns), [column.name for column in models.Car.__table__.columns])
+        np.testing.assert_array_equal(frame["id"], np.arange(1, 501))
+        electric = frame["Fuel_Type"] == "Electric"
+        self.assertTrue((frame.loc[~electric, "Battery_Capacity"] == 0).all())
+        self.assertTrue((frame["Price"] > 0).all())
+
+    def test_recall_counts_ties_at_the_cut_as_hits(self):
+        scores = np.array([[0.9, 0.8, 0.8, 0.1]])
+        self.assertEqual(recall_at_k([[0, 2]], scores, k=2), 1.0)
+        self.assertEqual(recall_at_k([[0, 3]], scores, k=2), 0.5)
+
+    def test_exact_modes_have_full_recall(self):
+        saved = {name: getattr(recommend, name) for name in dir(recommend) if not name.startswith("__")}
+        try:
+            args = SimpleNamespace(k=5, queries=20, seed=0, n_components=16)
+            results = run_suite([2000], ["exact_npz", "exact_mmap"], args)
+        finally:
+            for name, value in saved.items():
+                setattr(recommend, name, value)
+        self.assertEqual([row["mode"] for row in results], ["exact_npz", "exact_mmap"])
+        for row in results:
+            self.assertEqual(row["rows"], 2000)
+            self.assertEqual(row["recall_at_5"], 1.0)
+            self.assertEqual(row["batch_recall_at_5"], 1.0)
+            self.assertGreater(row["p99_ms"], 0)
+
+    def test_check_regressions(self):
+        baseline = [{"rows": 100, "mode": "ivf", "p99_ms": 2.0, "peak_mb": 10.0, "recall_at_5": 0.95}]
+        self.assertEqual(check_regressions(baseline, baseline), [])
+        slower = [dict(baseline[0], p99_ms=4.0, recall_at_5=0.9, peak_mb=20.0)]
+        failures = check_regressions(slower, baseline)
+        self.assertEqual(len(failures), 3)
+        self.assertEqual(check_regressions([dict(slower[0], rows=200)], baseline), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+import session_profiles
+from session_profiles import SessionProfiles, is_page_view
+
+
+class TestSessionProfiles(unittest.TestCase):
+    def setUp(self):
+        self.rows = normalize(sparse.random(10, 40, density=0.2, format="csr", random_state=3), "l2")
+
+    def test_no_profile_without_views(self):
+        profiles = SessionProfiles()
+        self.assertIsNone(profiles.query("a"))
+        self.assertEqual(profiles.views("a"), 0)
+
+    def test_profile_points_at_the_weighted_centroid(self):
+        profiles = SessionProfiles(growth=1.5)
+        for car_id in range(4):
+            profiles.record_view("a", car_id, self.rows[car_id])
+        row, viewed = profiles.query("a")
+        self.assertEqual(row.shape, (1, 40))
+        self.assertEqual(viewed, [0, 1, 2, 3])
+        weights = 1.5 ** np.arange(4)
+        centroid = weights @ self.rows[:4].toarray() / weights.sum()
+        np.testing.assert_allclose(normalize(row).toarray()[0], centroid / np.linalg.norm(centroid))
+
+    def test_reloading_a_page_is_not_a_new_view(self):
+        profiles = SessionProfiles()
+        profiles.record_view("a", 1, self.rows[1])
+        profiles.record_view("a", 1, self.rows[1])
+        self.assertEqual((profiles.views("a"), profiles.stats["repeat_views"]), (1, 1))
+        np.testing.assert_allclose(profiles.query("a")[0].toarray(), self.rows[1].toarray())
+
+    def test_least_recent_session_is_evicted(self):
+        profiles = SessionProfiles(max_sessions=2)
+        profiles.record_view("a", 1, self.rows[1])
+        profiles.record_view("b", 2, self.rows[2])
+        profiles.query("a")
+        profiles.record_view("c", 3, self.rows[3])
+        self.assertIsNone(profiles.query("b"))
+        self.assertIsNotNone(profiles.query("a"))
+        self.assertEqual(profiles.snapshot()["evictions"], 1)
+
+    def test_weights_are_rescaled_before_they_overflow(self):
+        profiles = SessionProfiles(growth=1e100)
+        for car_id in range(6):
+            profiles.record_view("a", car_id, self.rows[car_id])
+        row = profiles.query("a")[0]
+        self.assertTrue(np.isfinite(row.data).all())
+        self.assertLessEqual(profiles._profiles["a"].weight, session_profiles.MAX_WEIGHT)
+        # the last view outweighs the rest by 1e100, the profile is that car
+        np.testing.assert_allclose(normalize(row).toarray(), self.rows[5].toarray(), atol=1e-12)
+
+    def test_new_feature_space_resets_the_profile(self):
+        profiles = SessionProfiles()
+        profiles.record_view("a", 1, self.rows[1])
+        wider = sparse.csr_matrix(([1.0], ([0], [50])), shape=(1, 60))
+        profiles.record_view("a", 2, wider)
+        row, viewed = profiles.query("a")
+        self.assertEqual((row.shape, viewed, profiles.stats["resets"]), ((1, 60), [2], 1))
+
+
+    def test_only_browser_page_loads_are_views(self):
+        browser = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+        self.assertTrue(is_page_view("GET", browser))
+        self.assertFalse(is_page_view("HEAD", browser))
+        self.assertFalse(is_page_view("GET", ""))
+        for crawler in ["Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+                        "Mozilla/5.0 (compatible; bingbot/2.0)", "curl/8.5.0", "Slackbot-LinkExpanding 1.0 (+https://api.slack.com/robots)"]:
+            self.assertFalse(is_page_view("GET", crawler), crawler)
+
+
+if __name__ == "__main__":
+    unittest.main()
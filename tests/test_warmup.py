@@ -0,0 +1,74 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "FastApi_app"))
+
+import models
+import prediction
+import warmup
+
+
+class StubModel:
+    def predict(self, frame):
+        return [20000.0] * len(frame)
+
+
+class TestWarmup(unittest.TestCase):
+    def setUp(self):
+        self.initial = dict(warmup.readiness)
+        warmup.readiness.update(ready=False, model_loaded=False, artifacts_loaded=False, attempts=0, error=None, warmup_seconds=None)
+        self.engine = create_engine("sqlite://")
+        models.Car.__table__.create(self.engine)
+        db = sessionmaker(bind=self.engine)()
+        db.add(models.Car(id=1, Brand_Name="Toyota", Model_Name="Camry", Price=20000, Model_Year=2020))
+        db.commit()
+        db.close()
+        self.recommended = []
+        patches = [
+            mock.patch.object(prediction, "PREDICTION_ENGINE", "sklearn"),
+            mock.patch.object(warmup, "load_model", StubModel),
+            mock.patch.object(warmup, "get_artifacts", lambda: None),
+            mock.patch.object(warmup, "recommend_car_idx", lambda car: self.recommended.append(car.id)),
+            mock.patch.object(warmup, "SessionLocal", sessionmaker(bind=self.engine)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        warmup.readiness.update(self.initial)
+        self.engine.dispose()
+
+    def test_not_ready_before_warmup(self):
+        status_code, body = warmup.readiness_status()
+        self.assertEqual(status_code, 503)
+        self.assertFalse(body["ready"])
+
+    def test_ready_after_warmup(self):
+        self.assertTrue(warmup.warmup(max_attempts=1))
+        status_code, body = warmup.readiness_status()
+        self.assertEqual(status_code, 200)
+        self.assertTrue(body["model_loaded"] and body["artifacts_loaded"])
+        self.assertIsNotNone(body["warmup_seconds"])
+        self.assertEqual(self.recommended, [1])
+
+    def test_failed_warmup_stays_not_ready_until_a_retry_succeeds(self):
+        with mock.patch.object(warmup, "get_artifacts", mock.Mock(side_effect=ConnectionError("s3 unreachable"))):
+            self.assertFalse(warmup.warmup(max_attempts=1))
+        status_code, body = warmup.readiness_status()
+        self.assertEqual(status_code, 503)
+        self.assertTrue(body["model_loaded"])
+        self.assertEqual(body["error"], "ConnectionError: s3 unreachable")
+
+        self.assertTrue(warmup.warmup(max_attempts=2))
+        self.assertEqual(warmup.readiness_status()[0], 200)
+        self.assertIsNone(warmup.readiness["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()